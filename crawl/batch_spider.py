@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+批量爬虫 - 在同一进程中爬取spider_configs中的所有商品
+使用方法: python3 batch_spider.py [--workers 4] [--rps 2]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from checkpoint import CheckpointStore
+from database_reader import DatabaseReader
+from image_store import ImageFetcher
+from metrics import metrics
+from rate_limiter import AdaptiveRateLimiter, RateLimiter
+from session_pool import load_session_pool
+from sku_classifier import load_classifier
+from spider import TmallCommentSpider, crawl_product
+
+
+class _WorkerQuietStdout:
+    """屏蔽工作线程的输出，只保留创建它的线程（进度汇报线程）的输出"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.owner = threading.current_thread()
+
+    def write(self, text):
+        if threading.current_thread() is self.owner:
+            return self.stream.write(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class BatchCrawler:
+    """多商品批量爬虫：共享数据库连接配置和全局限速器"""
+
+    def __init__(self, db_reader, max_workers=4, requests_per_second=2.0,
+                 concurrency=1, base_url=None, quiet=True, incremental=False, adaptive=False,
+                 max_requests_per_second=10.0, session_pool=None, pipeline=0):
+        self.db_reader = db_reader
+        self.max_workers = max(1, max_workers)
+        # 全局限速器，所有商品的所有请求共享；自适应模式下从requests_per_second起步按响应调整
+        if adaptive:
+            self.rate_limiter = AdaptiveRateLimiter(rate=requests_per_second, max_rate=max_requests_per_second,
+                                                    burst=self.max_workers)
+        else:
+            self.rate_limiter = RateLimiter(requests_per_second, burst=self.max_workers)
+        # 启用会话池时所有商品共享账号池，每个账号各自限速，不再使用全局限速器
+        self.session_pool = session_pool
+        self.concurrency = concurrency
+        self.base_url = base_url
+        self.quiet = quiet
+        self.incremental = incremental
+        # 本地情感打分器只读，所有工作线程共享一个；默认关闭，LOCAL_SENTIMENT=true时才导入NumPy
+        self.sentiment = None
+        if os.getenv('LOCAL_SENTIMENT', 'false').lower() == 'true':
+            from sentiment import SentimentScorer
+            self.sentiment = SentimentScorer.from_env()
+        # 设置IMAGE_DIR时所有工作线程共享一个图片下载器（总并发和单主机并发对所有商品生效）
+        self.images = ImageFetcher.from_env()
+        # 中断的批量任务重新运行时，每个商品从各自的断点继续
+        self.checkpoints = CheckpointStore.from_env()
+        # 大于0时单个商品内抓取、分析、写入重叠执行，值为相邻阶段之间的队列长度
+        self.pipeline = pipeline
+        self._lock = threading.Lock()
+        self._done = 0
+
+    def load_configs(self, include_inactive=False):
+        """加载所有爬虫配置，每个商品只保留最新的一条"""
+        configs = []
+        seen = set()
+        for config in self.db_reader.get_all_spider_configs():
+            product_id = str(config.get('product_id') or '')
+            if not product_id or product_id in seen:
+                continue
+            if not include_inactive and config.get('is_active') is not None and not config.get('is_active'):
+                continue
+            seen.add(product_id)
+            configs.append(config)
+        return configs
+
+    def crawl_one(self, config):
+        """爬取单个商品，返回该商品的执行结果"""
+        product_id = str(config['product_id'])
+        started = time.time()
+        spider = TmallCommentSpider(cookies=config.get('cookies', ''), base_url=self.base_url,
+                                    rate_limiter=None if self.session_pool else self.rate_limiter,
+                                    session_pool=self.session_pool)
+        data = crawl_product(
+            spider, product_id,
+            product_name=config.get('product_name'),
+            max_pages=config.get('max_pages') or 3,
+            page_size=config.get('page_size') or 20,
+            # 批量模式下由全局限速器控制节奏，不再固定休眠
+            delay=0,
+            concurrency=self.concurrency,
+            db_reader=self.db_reader,
+            incremental=self.incremental,
+            sentiment=self.sentiment,
+            classifier=load_classifier(self.db_reader),
+            images=self.images,
+            checkpoints=self.checkpoints,
+            pipeline=self.pipeline
+        )
+        result = {
+            'product_id': product_id,
+            'product_name': data['product_info']['product_name'],
+            'success': data['success'],
+            'comments': data['total'],
+            'elapsed': round(time.time() - started, 2)
+        }
+        if not data['success']:
+            result['error'] = data.get('error', '未知错误')
+        return result
+
+    def _report(self, total, result):
+        """输出单个商品的进度"""
+        with self._lock:
+            self._done += 1
+            if result['success']:
+                if result['comments']:
+                    fetched = f"获取 {result['comments']} 条{'新' if self.incremental else ''}评论"
+                else:
+                    fetched = '没有新评论' if self.incremental else '暂无评论'
+                print(f"✅ [{self._done}/{total}] {result['product_id']} {fetched}，耗时 {result['elapsed']}s")
+            else:
+                print(f"❌ [{self._done}/{total}] {result['product_id']} 失败: {result.get('error', '未知错误')}")
+
+    def run(self, configs):
+        """并发爬取所有商品，返回每个商品的执行结果"""
+        total = len(configs)
+        self._done = 0
+        results = []
+        # 单商品爬取的详细日志较多，批量模式下默认只输出进度
+        quiet = contextlib.redirect_stdout(_WorkerQuietStdout(sys.stdout)) if self.quiet else contextlib.nullcontext()
+        with quiet, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.crawl_one, config): config for config in configs}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {
+                        'product_id': str(futures[future].get('product_id')),
+                        'success': False,
+                        'comments': 0,
+                        'error': str(e)
+                    }
+                self._report(total, result)
+                results.append(result)
+        return results
+
+
+def main():
+    """批量爬虫主程序"""
+    parser = argparse.ArgumentParser(description='批量爬取spider_configs中的所有商品')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('BATCH_WORKERS', '4')),
+                        help='同时爬取的商品数上限')
+    parser.add_argument('--rps', type=float, default=float(os.getenv('BATCH_RPS', '2')),
+                        help='全局每秒请求数上限')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('CONCURRENCY', '1')),
+                        help='单个商品内的翻页并发数')
+    parser.add_argument('--adaptive', action='store_true',
+                        default=os.getenv('ADAPTIVE_RATE', 'false').lower() == 'true',
+                        help='根据响应延迟和限流情况自适应调整全局请求速率')
+    parser.add_argument('--max-rps', type=float, default=float(os.getenv('MAX_RATE', '10')),
+                        help='自适应模式下的每秒请求数上限')
+    parser.add_argument('--incremental', action='store_true',
+                        default=os.getenv('INCREMENTAL', 'false').lower() == 'true',
+                        help='增量爬取，只获取上次爬取之后的新评论')
+    parser.add_argument('--session-pool', action='store_true',
+                        default=os.getenv('SESSION_POOL', 'false').lower() == 'true',
+                        help='所有商品共享多账号会话池，--rps改为每个账号的每秒请求数')
+    parser.add_argument('--pipeline', type=int, nargs='?', const=2,
+                        default=int(os.getenv('PIPELINE_QUEUE_SIZE', '2'))
+                        if os.getenv('PIPELINE', 'false').lower() == 'true' else 0,
+                        help='单个商品内抓取、分析、写入重叠执行，可指定相邻阶段之间的队列长度（默认2）')
+    parser.add_argument('--include-inactive', action='store_true', help='包含未启用的配置')
+    parser.add_argument('--verbose', action='store_true', help='输出每个商品的详细日志')
+    args = parser.parse_args()
+
+    print("🛒 淘宝/天猫商品评论批量爬虫")
+    print("=" * 50)
+
+    # 每个工作线程至少能拿到一个池化连接
+    db_reader = DatabaseReader(pool_size=args.workers + 1)
+    session_pool = load_session_pool(db_reader, rate=args.rps, enabled=True) if args.session_pool else None
+    crawler = BatchCrawler(db_reader, max_workers=args.workers, requests_per_second=args.rps,
+                           concurrency=args.concurrency, quiet=not args.verbose,
+                           incremental=args.incremental, adaptive=args.adaptive,
+                           max_requests_per_second=args.max_rps, session_pool=session_pool,
+                           pipeline=args.pipeline)
+    configs = crawler.load_configs(include_inactive=args.include_inactive)
+    print(f"📋 共 {len(configs)} 个商品，并发商品数: {args.workers}，全局限速: {args.rps} 请求/秒")
+
+    started = time.time()
+    # 设置了METRICS_FILE时，批量爬取期间每METRICS_INTERVAL秒导出一次指标
+    exporter = metrics.start_exporter()
+    try:
+        results = crawler.run(configs)
+    finally:
+        if exporter:
+            exporter.stop()
+    failed = [r for r in results if not r['success']]
+
+    print(f"\n🎉 批量爬取完成，耗时 {time.time() - started:.1f}s")
+    print(f"   - 成功: {len(results) - len(failed)}")
+    print(f"   - 失败: {len(failed)}")
+    if session_pool:
+        pool_stats = session_pool.stats()
+        print(f"   - 会话池: {pool_stats['healthy']}/{pool_stats['accounts']} 个账号健康，"
+              f"冷却 {pool_stats['cooling']}，失效 {pool_stats['expired']}")
+    else:
+        print(f"   - 限速器: {crawler.rate_limiter.stats()}")
+    if exporter:
+        print(f"   - 指标文件: {metrics.path}")
+    for result in failed:
+        print(f"   ❌ {result['product_id']}: {result.get('error', '未知错误')}")
+
+    summary = {
+        'success': not failed,
+        'total_products': len(results),
+        'failed_products': len(failed),
+        'results': results
+    }
+    print(f"\n📊 JSON_DATA_START")
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    print(f"📊 JSON_DATA_END")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+并发翻页基准测试 - 对比不同并发数下get_multiple_pages的吞吐量（页/秒）
+使用方法: python3 benchmarks/bench_concurrency.py [--pages 50] [--latency 0.2] [--rotate-tokens 10]
+
+--rotate-tokens N 时模拟服务每N个请求轮换一次令牌，检查并发请求同时遇到令牌过期时每一页都能换用新令牌取回。
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spider import TmallCommentSpider
+from mock_mtop_server import start_server
+
+
+def run(base_url, pages, page_size, concurrency):
+    """执行一次爬取，返回(页数, 耗时, 爬虫统计)"""
+    spider = TmallCommentSpider(cookies='_m_h5_tk=abc_123', base_url=base_url)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        comments = spider.get_multiple_pages('10001', max_pages=pages, page_size=page_size,
+                                             delay=0, concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+    return len(comments) // page_size, elapsed, spider.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发翻页基准测试')
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.2, help='模拟服务的响应延迟（秒）')
+    parser.add_argument('--levels', default='1,4,16', help='并发数列表，逗号分隔')
+    parser.add_argument('--rotate-tokens', type=int, default=0, help='模拟服务每N个请求轮换一次令牌')
+    args = parser.parse_args()
+
+    server, base_url = start_server(total=args.pages * args.page_size, latency=args.latency,
+                                    rotate_tokens=args.rotate_tokens)
+    print(f"📊 {args.pages}页 × {args.page_size}条，模拟延迟 {args.latency * 1000:.0f}ms"
+          + (f"，每{args.rotate_tokens}个请求轮换令牌" if args.rotate_tokens else ''))
+    print(f"{'并发数':>6} {'页数':>6} {'耗时(s)':>9} {'页/秒':>8} {'令牌刷新':>8} {'失败':>6}")
+    incomplete = []
+    try:
+        for level in [int(x) for x in args.levels.split(',')]:
+            pages, elapsed, stats = run(base_url, args.pages, args.page_size, level)
+            print(f"{level:>6} {pages:>6} {elapsed:>9.2f} {pages / elapsed:>8.1f} "
+                  f"{stats.get('token_refreshes', 0):>8} {stats.get('failures', 0):>6}")
+            if pages < args.pages:
+                incomplete.append(level)
+    finally:
+        server.shutdown()
+    if incomplete:
+        print(f"❌ 并发数 {', '.join(map(str, incomplete))} 未取回全部 {args.pages} 页")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
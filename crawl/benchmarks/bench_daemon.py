@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+常驻进程基准测试 - 对比每次spawn spider.py与常驻spider_daemon.py的单次爬取端到端延迟
+使用方法: python3 benchmarks/bench_daemon.py [--runs 10] [--pages 3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CRAWL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CRAWL_DIR)
+
+from mock_mtop_server import start_server
+
+
+def bench_spawn(base_url, runs, pages):
+    """模拟Node.js的spawn('python3', ['spider.py'])路径"""
+    env = dict(os.environ, USE_DATABASE='false', SPIDER_BASE_URL=base_url, PAGE_DELAY='0',
+               MAX_PAGES=str(pages), COOKIES='_m_h5_tk=abc_123', SNAPSHOT_DIR='')
+    latencies = []
+    for i in range(runs):
+        env['PRODUCT_ID'] = str(20000 + i)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'spider.py'], cwd=CRAWL_DIR, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_daemon(base_url, runs, pages):
+    """通过stdin/stdout向常驻进程发送任务，返回(首个任务延迟, 后续任务延迟列表)"""
+    env = dict(os.environ, SPIDER_BASE_URL=base_url)
+    process = subprocess.Popen([sys.executable, 'spider_daemon.py', '--no-database'], cwd=CRAWL_DIR,
+                               env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True, bufsize=1)
+    latencies = []
+    try:
+        for i in range(runs + 1):
+            job = {'id': str(i), 'product_id': str(20000 + i), 'max_pages': pages,
+                   'delay': 0, 'cookies': '_m_h5_tk=abc_123', 'use_database': False}
+            start = time.perf_counter()
+            process.stdin.write(json.dumps(job) + '\n')
+            result = json.loads(process.stdout.readline())
+            latencies.append(time.perf_counter() - start)
+            assert result['success'], result
+    finally:
+        process.stdin.close()
+        process.wait()
+    return latencies[0], latencies[1:]
+
+
+def report(name, latencies):
+    print(f"{name:<24} 平均 {statistics.mean(latencies) * 1000:8.1f}ms   "
+          f"p50 {statistics.median(latencies) * 1000:8.1f}ms   "
+          f"最大 {max(latencies) * 1000:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻进程与spawn模式的延迟对比')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02, help='模拟服务的响应延迟（秒）')
+    args = parser.parse_args()
+
+    server, base_url = start_server(total=args.pages * 20, latency=args.latency)
+    print(f"📊 每次爬取 {args.pages} 页，共 {args.runs} 次，模拟延迟 {args.latency * 1000:.0f}ms")
+    try:
+        report('spawn spider.py', bench_spawn(base_url, args.runs, args.pages))
+        first, warm = bench_daemon(base_url, args.runs, args.pages)
+        print(f"{'daemon 首个任务':<24} {first * 1000:8.1f}ms（不含进程启动）")
+        report('daemon 常驻', warm)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+响应解析微基准 - 用output/下的抓取数据构造mtopjsonp12(...)响应，对比旧版正则+逐字段格式化与新的解析路径
+使用方法: python3 benchmarks/bench_decode.py [--page-size 20] [--rounds 200]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mtop_response
+from mtop_response import decode_jsonp, format_comments
+from mock_mtop_server import load_captures
+
+
+def build_bodies(page_size):
+    """把每个商品的抓取评论按页切分，生成与线上一致的JSONP响应体（bytes）"""
+    bodies = []
+    for rates in load_captures().values():
+        for start in range(0, len(rates), page_size):
+            payload = {
+                'api': 'mtop.taobao.rate.detaillist.get',
+                'ret': ['SUCCESS::调用成功'],
+                'v': '6.0',
+                'data': {'rateList': rates[start:start + page_size], 'total': str(len(rates))}
+            }
+            bodies.append(f"mtopjsonp12({json.dumps(payload, ensure_ascii=False)})".encode('utf-8'))
+    return bodies
+
+
+def legacy_parse(body):
+    """改造前的路径：response.text解码、正则截取JSON片段、json.loads、逐字段格式化"""
+    match = re.search(r'mtopjsonp\d+\((.*)\)', body.decode('utf-8'))
+    raw_data = json.loads(match.group(1))
+    comments = []
+    for rate in raw_data['data'].get('rateList', []):
+        comment = {
+            'user_nick': rate.get('userNick', rate.get('reduceUserNick', '')),
+            'content': rate.get('feedback', ''),
+            'rating': int(rate.get('userStar', 0)),
+            'date': rate.get('feedbackDate', rate.get('createTime', '')),
+            'useful_count': 0,
+            'reply': rate.get('reply', ''),
+            'sku_info': rate.get('skuValueStr', ''),
+            'pics': []
+        }
+        if 'interactInfo' in rate and isinstance(rate['interactInfo'], dict):
+            comment['useful_count'] = int(rate['interactInfo'].get('likeCount', 0))
+        if 'feedPicPathList' in rate and isinstance(rate['feedPicPathList'], list):
+            comment['pics'] = rate['feedPicPathList']
+        comments.append(comment)
+    return comments
+
+
+def fast_parse(body):
+    return format_comments(decode_jsonp(body)['data'].get('rateList', []))
+
+
+def measure(parse, bodies, rounds):
+    """返回(每页耗时微秒, MB/秒)"""
+    size = sum(len(body) for body in bodies)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for body in bodies:
+            parse(body)
+    elapsed = time.perf_counter() - start
+    return elapsed * 1e6 / (rounds * len(bodies)), size * rounds / elapsed / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='响应解析微基准')
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    bodies = build_bodies(args.page_size)
+    if not bodies:
+        raise SystemExit('output/目录下没有可用的抓取文件')
+    for body in bodies:
+        assert fast_parse(body) == legacy_parse(body)
+    print(f"📊 {len(bodies)}页响应，平均 {sum(map(len, bodies)) / len(bodies) / 1024:.1f}KB/页，{args.rounds}轮")
+
+    print(f"{'路径':<22} {'每页(µs)':>10} {'MB/秒':>8}")
+    # 先强制走标准库路径，再恢复orjson
+    orjson = mtop_response.orjson
+    mtop_response.orjson = None
+    try:
+        per_page, throughput = measure(legacy_parse, bodies, args.rounds)
+        print(f"{'旧版 正则+json.loads':<22} {per_page:>10.1f} {throughput:>8.1f}")
+        per_page, throughput = measure(fast_parse, bodies, args.rounds)
+        print(f"{'新版 raw_decode':<22} {per_page:>10.1f} {throughput:>8.1f}")
+    finally:
+        mtop_response.orjson = orjson
+    if orjson is not None:
+        per_page, throughput = measure(fast_parse, bodies, args.rounds)
+        print(f"{'新版 orjson':<22} {per_page:>10.1f} {throughput:>8.1f}")
+    else:
+        print("未安装orjson，跳过orjson路径（pip install orjson）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+评论图片下载基准 - 本地静态文件服务模拟图片CDN，对比逐张下载和有界并发下载，并检查去重与单主机并发上限
+使用方法: python3 benchmarks/bench_images.py [--images 200] [--latency 0.05] [--workers 16] [--per-host 4]
+
+静态服务同时以127.0.0.1和localhost两个主机名提供图片，评论中的URL为协议相对地址并带CDN尺寸后缀；
+一部分图片内容相同、URL不同，用于验证按内容哈希只保存一份。第二轮下载应全部命中URL索引，不再请求服务。
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_store import ImageFetcher, ImageStore, pil_image
+
+Image = pil_image()
+
+
+class StaticHandler(SimpleHTTPRequestHandler):
+    """带固定延迟的静态文件服务，按Host统计同时在途的请求数"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        host = self.headers.get('Host', '')
+        with server.lock:
+            server.requests += 1
+            server.in_flight[host] = server.in_flight.get(host, 0) + 1
+            server.max_in_flight[host] = max(server.max_in_flight.get(host, 0), server.in_flight[host])
+        try:
+            time.sleep(server.latency)
+            super().do_GET()
+        finally:
+            with server.lock:
+                server.in_flight[host] -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_static_server(directory, latency):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(StaticHandler, directory=directory))
+    server.daemon_threads = True
+    server.latency = latency
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.in_flight = {}
+    server.max_in_flight = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_images(directory, count, duplicate_ratio, rng):
+    """生成count张图片文件，其中duplicate_ratio比例的文件复制已有图片的内容，返回文件名列表"""
+    os.makedirs(os.path.join(directory, 'imgextra'), exist_ok=True)
+    names = []
+    contents = []
+    for i in range(count):
+        if contents and rng.random() < duplicate_ratio:
+            data = rng.choice(contents)
+        elif Image is not None:
+            image = Image.new('RGB', (800, 600), tuple(rng.randrange(256) for _ in range(3)))
+            path = os.path.join(directory, 'tmp.jpg')
+            image.save(path, 'JPEG')
+            with open(path, 'rb') as f:
+                data = f.read()
+        else:
+            data = b'\xff\xd8\xff\xe0' + rng.randbytes(60 * 1024)
+        contents.append(data)
+        name = f"O1CN01{i:06d}_!!rate.jpg"
+        with open(os.path.join(directory, 'imgextra', name), 'wb') as f:
+            f.write(data)
+        names.append(name)
+    return names
+
+
+def make_comments(names, port, per_comment):
+    """按每条评论per_comment张图构造评论，URL交替使用两个主机名"""
+    comments = []
+    for start in range(0, len(names), per_comment):
+        pics = []
+        for i, name in enumerate(names[start:start + per_comment], start):
+            host = '127.0.0.1' if i % 2 else 'localhost'
+            pics.append(f"//{host}:{port}/imgextra/{name}_400x400.jpg")
+        comments.append({'content': '好评', 'pics': pics})
+    return comments
+
+
+def run(comments, image_dir, workers, per_host):
+    fetcher = ImageFetcher(ImageStore(image_dir), max_workers=workers, per_host=per_host, scheme='http')
+    start = time.perf_counter()
+    try:
+        stored = fetcher.attach(comments)
+    finally:
+        fetcher.close()
+    return stored, time.perf_counter() - start, fetcher.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评论图片下载基准')
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--per-comment', type=int, default=3, help='每条评论的图片数')
+    parser.add_argument('--duplicates', type=float, default=0.2, help='内容重复的图片比例')
+    parser.add_argument('--latency', type=float, default=0.05, help='静态服务每个请求的延迟（秒）')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--per-host', type=int, default=4)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_images_')
+    try:
+        names = make_images(os.path.join(work_dir, 'cdn'), args.images, args.duplicates, random.Random(0))
+        server = start_static_server(os.path.join(work_dir, 'cdn'), args.latency)
+        port = server.server_address[1]
+        print(f"📊 {args.images}张图片（内容重复比例 {args.duplicates:.0%}），服务延迟 {args.latency * 1000:.0f}ms，"
+              f"Pillow {'已安装' if Image is not None else '未安装'}")
+        print(f"{'模式':<22} {'保存':>6} {'耗时(s)':>9} {'张/秒':>8} {'请求数':>7} {'单主机最大并发':>14}")
+
+        for label, workers, per_host, image_dir in (
+                ('逐张下载', 1, 1, 'serial'),
+                (f'并发{args.workers}/单主机{args.per_host}', args.workers, args.per_host, 'concurrent'),
+                ('再次下载（命中索引）', args.workers, args.per_host, 'concurrent')):
+            with server.lock:
+                server.requests = 0
+                server.max_in_flight = {}
+            stored, elapsed, stats = run(make_comments(names, port, args.per_comment),
+                                         os.path.join(work_dir, image_dir), workers, per_host)
+            with server.lock:
+                requests_made = server.requests
+                peak = max(server.max_in_flight.values(), default=0)
+            assert peak <= per_host, f'单主机并发 {peak} 超过上限 {per_host}'
+            print(f"{label:<22} {stored:>6} {elapsed:>9.2f} {stored / elapsed:>8.1f} {requests_made:>7} {peak:>14}")
+
+        store = ImageStore(os.path.join(work_dir, 'concurrent'))
+        stats = store.stats()
+        print(f"🗄️ {stats['urls']}个URL，{stats['objects']}个文件（按内容哈希去重），{stats['bytes'] / 1024:.0f}KB")
+        if Image is not None:
+            keys = sorted({key for key in store._urls.values()})[:20]
+            start = time.perf_counter()
+            for key in keys:
+                store.thumbnail(key)
+            first = time.perf_counter() - start
+            start = time.perf_counter()
+            for key in keys:
+                store.thumbnail(key)
+            print(f"🖼️ 缩略图首次生成 {first / len(keys) * 1000:.1f}ms/张，"
+                  f"再次读取 {(time.perf_counter() - start) / len(keys) * 1000:.3f}ms/张")
+        server.shutdown()
+    finally:
+        with contextlib.suppress(OSError):
+            shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+任务队列扩展性基准 - 需要本地MySQL 8.0+（DatabaseReader的连接配置，已执行database/crawl_jobs.sql）
+使用方法: python3 benchmarks/bench_job_queue.py [--workers 1,2,4,8] [--jobs 48] [--pages 3] [--latency 0.1]
+
+在独立的任务表（默认crawl_jobs_bench，结构同crawl_jobs，每轮清空）中排队--jobs个任务，
+启动 crawl_worker.py --processes N --drain 爬取回放服务直到队列清空，报告任务/秒和相对单进程的扩展效率。
+每轮结束后检查每个任务恰好完成一次（状态为done且只领取过一次）。
+默认任务不写comments表（use_database=false），--save 时评论写入本地数据库。
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_reader import DatabaseReader
+from job_queue import JobQueue
+from mock_mtop_server import load_captures, start_server
+
+CRAWL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def reset_table(db_reader, table):
+    with db_reader.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} LIKE crawl_jobs")
+        cursor.execute(f"TRUNCATE TABLE {table}")
+        conn.commit()
+        cursor.close()
+
+
+def check_table(db_reader, table):
+    """返回(完成数, 总数, 领取次数大于1的任务数)"""
+    with db_reader.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT SUM(status = 'done'), COUNT(*), SUM(attempts > 1) FROM {table}")
+        done, total, retried = cursor.fetchone()
+        cursor.close()
+    return int(done or 0), int(total or 0), int(retried or 0)
+
+
+def run(db_reader, base_url, table, processes, jobs, pages, save):
+    reset_table(db_reader, table)
+    queue = JobQueue(db_reader, table=table)
+    params = {'delay': 0, 'max_pages': pages, 'use_database': save}
+    for i in range(jobs):
+        queue.enqueue(f"bench{i:05d}", params)
+
+    env = dict(os.environ, JOB_QUEUE_TABLE=table, SPIDER_BASE_URL=base_url, CHECKPOINT_DIR='',
+               METRICS_FILE='', PYTHONUNBUFFERED='1')
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(CRAWL_DIR, 'crawl_worker.py'), '--processes', str(processes),
+                    '--drain', '--poll', '0.2'], env=env, cwd=CRAWL_DIR,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, check_table(db_reader, table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='任务队列扩展性基准')
+    parser.add_argument('--workers', default='1,2,4,8', help='工作进程数列表，逗号分隔')
+    parser.add_argument('--jobs', type=int, default=48)
+    parser.add_argument('--pages', type=int, default=3, help='每个任务爬取的页数')
+    parser.add_argument('--latency', type=float, default=0.1, help='回放服务的响应延迟（秒）')
+    parser.add_argument('--table', default='crawl_jobs_bench', help='基准使用的任务表（每轮清空）')
+    parser.add_argument('--save', action='store_true', help='评论写入本地数据库')
+    args = parser.parse_args()
+
+    db_reader = DatabaseReader()
+    server, base_url = start_server(latency=args.latency, products=load_captures(), repeat=100)
+    print(f"📊 {args.jobs}个任务 × {args.pages}页，接口延迟 {args.latency * 1000:.0f}ms，任务表 {args.table}")
+    print(f"{'进程数':>6} {'完成':>6} {'耗时(s)':>9} {'任务/秒':>9} {'扩展效率':>9} {'重试':>6}")
+    baseline = None
+    try:
+        for processes in [int(x) for x in args.workers.split(',')]:
+            elapsed, (done, total, retried) = run(db_reader, base_url, args.table, processes, args.jobs,
+                                                  args.pages, args.save)
+            assert done == total == args.jobs, f'完成 {done}/{total}，应为 {args.jobs}'
+            rate = done / elapsed
+            baseline = baseline or rate / processes
+            print(f"{processes:>6} {done:>6} {elapsed:>9.2f} {rate:>9.2f} {rate / (baseline * processes):>9.0%} "
+                  f"{retried:>6}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+评论内存占用基准 - 对比每条评论一个dict与CommentRecord（__slots__+字符串驻留）的内存占用
+使用方法: python3 benchmarks/bench_memory.py [--comments 100000]
+
+评论数据来自output/下的抓取文件，按页构造JSONP响应并逐页解码，与真实爬取一样每条评论都是新解码的字符串。
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comment_record import json_default
+from mtop_response import decode_jsonp, format_comments
+from bench_decode import build_bodies
+
+
+def format_as_dicts(rate_list):
+    """改造前的表示：每条评论一个8个键的dict，图片为list"""
+    comments = []
+    for rate in rate_list:
+        interact = rate.get('interactInfo')
+        pics = rate.get('feedPicPathList')
+        comments.append({
+            'user_nick': rate.get('userNick', rate.get('reduceUserNick', '')),
+            'content': rate.get('feedback', ''),
+            'rating': int(rate.get('userStar', 0)),
+            'date': rate.get('feedbackDate', rate.get('createTime', '')),
+            'useful_count': int(interact.get('likeCount', 0)) if isinstance(interact, dict) else 0,
+            'reply': rate.get('reply', ''),
+            'sku_info': rate.get('skuValueStr', ''),
+            'pics': pics if isinstance(pics, list) else []
+        })
+    return comments
+
+
+def measure(formatter, bodies, target):
+    """逐页解码并格式化直到target条评论，返回(评论列表, 常驻字节数, 峰值字节数, 耗时)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    comments = []
+    while len(comments) < target:
+        for body in bodies:
+            comments.extend(formatter(decode_jsonp(body)['data']['rateList']))
+            if len(comments) >= target:
+                break
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return comments, current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评论内存占用基准')
+    parser.add_argument('--comments', type=int, default=100000)
+    args = parser.parse_args()
+
+    bodies = build_bodies(20)
+    if not bodies:
+        raise SystemExit('output/目录下没有可用的抓取文件')
+    print(f"📊 {args.comments}条评论（由{len(bodies)}页抓取响应循环解码）")
+    print(f"{'表示':<22} {'常驻(MB)':>10} {'峰值(MB)':>10} {'字节/条':>9} {'解析(s)':>9} {'JSON输出(s)':>12}")
+    for name, formatter in (('dict', format_as_dicts), ('CommentRecord', format_comments)):
+        comments, current, peak, elapsed = measure(formatter, bodies, args.comments)
+        start = time.perf_counter()
+        json.dumps(comments, ensure_ascii=False, default=json_default)
+        dump_elapsed = time.perf_counter() - start
+        print(f"{name:<22} {current / 1e6:>10.1f} {peak / 1e6:>10.1f} {current / len(comments):>9.0f} "
+              f"{elapsed:>9.2f} {dump_elapsed:>12.2f}")
+        del comments
+
+
+if __name__ == "__main__":
+    main()
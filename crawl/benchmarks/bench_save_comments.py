@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+评论写入基准测试 - 对比逐行INSERT（旧save_comments）与分块批量upsert的写入速度（行/秒）
+使用方法:
+    python3 benchmarks/bench_save_comments.py                 # 使用模拟往返延迟的本地替身连接
+    python3 benchmarks/bench_save_comments.py --mysql         # 使用DatabaseReader配置的本地MySQL
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_reader import DatabaseReader
+
+
+class FakeCursor:
+    """只理解save_comments/upsert_comments所用语句的游标替身，每条语句计一次往返延迟"""
+
+    def __init__(self, db):
+        self.db = db
+        self._result = []
+
+    def execute(self, query, params=()):
+        self.db.round_trip(len(params))
+        sql = ' '.join(query.split())
+        if sql.startswith('DELETE FROM comments'):
+            self.db.rows = {k: v for k, v in self.db.rows.items() if k[0] != params[0]}
+        elif sql.startswith('SELECT comment_key, row_hash'):
+            product_id = params[0]
+            with_images = 'images IS NULL' in sql
+            self._result = [(key,) + row[:3] + ((row[3] is None,) if with_images else ())
+                            for key, row in ((key, self.db.rows.get((product_id, key))) for key in params[1:]) if row]
+        elif sql.startswith('INSERT INTO comments (product_id, comment_key'):
+            columns = [column.strip() for column in sql[sql.index('(') + 1:sql.index(')')].split(',')]
+            width = len(columns)
+            images = columns.index('images') if 'images' in columns else None
+            for i in range(0, len(params), width):
+                key = (params[i], params[i + 1])
+                old_images = self.db.rows[key][3] if key in self.db.rows else None
+                new_images = params[i + images] if images is not None else None
+                self.db.rows[key] = (params[i + 2], params[i + 5], params[i + 10],
+                                     new_images if new_images is not None else old_images)
+        elif sql.startswith('INSERT INTO comment_aggregates'):
+            for i in range(0, len(params), 6):
+                totals = self.db.aggregates.setdefault(tuple(params[i:i + 3]), [0, 0, 0])
+                for j in range(3):
+                    totals[j] += params[i + 3 + j]
+        elif sql.startswith('INSERT INTO comments'):
+            self.db.legacy_id += 1
+            self.db.rows[(params[0], self.db.legacy_id)] = None
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.db)
+
+    def start_transaction(self):
+        self.db.round_trip(0)
+
+    def commit(self):
+        self.db.round_trip(0)
+
+    def rollback(self):
+        self.db.round_trip(0)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeDatabase:
+    """模拟MySQL：每条语句一次网络往返，每个参数一点解析开销"""
+
+    def __init__(self, rtt, per_param):
+        self.rtt = rtt
+        self.per_param = per_param
+        self.rows = {}
+        self.aggregates = {}
+        self.legacy_id = 0
+
+    def round_trip(self, param_count):
+        time.sleep(self.rtt + param_count * self.per_param)
+
+
+class FakeDatabaseReader(DatabaseReader):
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+
+    def get_connection(self):
+        return FakeConnection(self.db)
+
+
+def legacy_save_comments(reader, product_id, comments):
+    """旧实现：先删除再逐行INSERT"""
+    conn = reader.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM comments WHERE product_id = %s", (product_id,))
+    insert_query = """
+    INSERT INTO comments (product_id, user_nick, content, rating, date, useful_count, reply, sku_info, pics)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    for comment in comments:
+        cursor.execute(insert_query, (
+            product_id, comment['user_nick'], comment['content'], comment['rating'], comment['date'],
+            comment['useful_count'], comment['reply'], comment['sku_info'],
+            json.dumps(comment['pics'], ensure_ascii=False)
+        ))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def make_comments(n):
+    return [{
+        'user_nick': f'u**{i % 97}',
+        'content': f'第{i}条评论，质量不错，物流很快，包装完好',
+        'rating': 5 - i % 5,
+        'date': f'2025年{1 + i % 12}月{1 + i % 28}日',
+        'useful_count': i % 3,
+        'reply': '',
+        'sku_info': '官方标配；黑色',
+        'pics': [f'//img.alicdn.com/imgextra/bench/{i}.jpg'] if i % 4 == 0 else []
+    } for i in range(n)]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评论写入基准测试')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='评论条数列表，逗号分隔')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--rtt', type=float, default=0.0002, help='替身连接每条语句的往返延迟（秒）')
+    parser.add_argument('--per-param', type=float, default=0.0000002, help='替身连接每个参数的开销（秒）')
+    parser.add_argument('--mysql', action='store_true', help='使用真实的本地MySQL')
+    parser.add_argument('--skip-legacy', action='store_true', help='跳过旧实现（大数据量时很慢）')
+    args = parser.parse_args()
+
+    reader = DatabaseReader() if args.mysql else FakeDatabaseReader(FakeDatabase(args.rtt, args.per_param))
+    target = '本地MySQL' if args.mysql else f'替身连接（往返 {args.rtt * 1000:.2f}ms）'
+    print(f"📊 写入目标: {target}，批量块大小: {args.chunk_size}")
+    print(f"{'条数':>8} {'旧实现 行/秒':>14} {'upsert 行/秒':>14} {'重复写入 行/秒':>16}  结果统计")
+
+    for size in [int(x) for x in args.sizes.split(',')]:
+        comments = make_comments(size)
+        product_id = f'bench_{size}'
+
+        legacy = '-'
+        if not args.skip_legacy:
+            elapsed, _ = timed(legacy_save_comments, reader, product_id, comments)
+            legacy = f"{size / elapsed:,.0f}"
+            # 清理旧实现写入的数据，保证upsert从空表开始
+            with contextlib.redirect_stdout(io.StringIO()):
+                conn = reader.get_connection()
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM comments WHERE product_id = %s", (product_id,))
+                conn.commit()
+                conn.close()
+
+        first, counts = timed(reader.upsert_comments, product_id, comments, args.chunk_size)
+        again, again_counts = timed(reader.upsert_comments, product_id, comments, args.chunk_size)
+        print(f"{size:>8} {legacy:>14} {size / first:>14,.0f} {size / again:>16,.0f}  "
+              f"首次 {counts}，重复 {again_counts}")
+
+
+if __name__ == "__main__":
+    main()
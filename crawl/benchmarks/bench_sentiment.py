@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+本地情感打分吞吐基准 - 按不同批大小对抓取评论打分，输出评论/秒和需要远程复核的比例
+使用方法: python3 benchmarks/bench_sentiment.py [--comments 100000] [--batch-sizes 1,20,1000,10000]
+
+批大小1相当于逐条打分（与逐条请求远程工作流的调用方式相同），20为流式模式下的一页，更大的批为整商品打分。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mtop_response import format_comments
+from mock_mtop_server import load_captures
+from sentiment import SentimentScorer
+
+
+def load_comments(target):
+    """把抓取评论循环复制到target条（每轮复制都是新的记录对象）"""
+    rates = [rate for product_rates in load_captures().values() for rate in product_rates]
+    if not rates:
+        return []
+    comments = []
+    while len(comments) < target:
+        comments.extend(format_comments(rates[:target - len(comments)]))
+    return comments
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地情感打分吞吐基准')
+    parser.add_argument('--comments', type=int, default=100000)
+    parser.add_argument('--batch-sizes', default='1,20,1000,10000')
+    args = parser.parse_args()
+
+    comments = load_comments(args.comments)
+    if not comments:
+        raise SystemExit('output/目录下没有可用的抓取文件')
+    scorer = SentimentScorer()
+    print(f"📊 {len(comments)}条评论，词典 {len(scorer.terms)} 个词条")
+    print(f"{'批大小':>8} {'评论/秒':>12} {'耗时(s)':>9} {'需复核':>8}")
+    for batch_size in [int(x) for x in args.batch_sizes.split(',')]:
+        # 逐条打分很慢，只取一部分评论计时
+        sample = comments if batch_size >= 20 else comments[:min(len(comments), 20000)]
+        start = time.perf_counter()
+        ambiguous = 0
+        for i in range(0, len(sample), batch_size):
+            ambiguous += scorer.annotate(sample[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>8} {len(sample) / elapsed:>12,.0f} {elapsed:>9.2f} {ambiguous / len(sample):>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+会话池吞吐基准 - 回放服务按账号限流，对比不同账号数下的总吞吐（页/秒）
+使用方法: python3 benchmarks/bench_session_pool.py [--accounts 1,2,4,8] [--account-rate 5] [--pages 60] [--rotate-tokens 10]
+
+每个账号在客户端按略低于服务端上限的速率限速，吞吐应随账号数线性增长；
+--expired N 让前N个账号的令牌失效（服务端对其返回令牌过期码），观察失效账号被移出轮转后其余账号继续工作；
+--rotate-tokens N 让服务端每个账号每N个请求轮换一次令牌，检查并发请求遇到令牌过期时不会把健康账号移出轮转。
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_mtop_server import load_captures, start_server
+from session_pool import EXPIRED, SessionPool
+from spider import TmallCommentSpider
+
+
+def account_cookies(index, expired=False):
+    token = f"{'expired' if expired else 'acct'}{index:03d}"
+    return f"_m_h5_tk={token}_1700000000000; _m_h5_tk_enc=enc{index:03d}; cna=bench{index:03d}"
+
+
+def run(base_url, accounts, expired, client_rate, pages, page_size, cooldown):
+    """用accounts个账号爬取pages页，返回(页数, 耗时, 会话池统计)"""
+    pool = SessionPool.from_cookies([account_cookies(i, i < expired) for i in range(accounts)],
+                                    rate=client_rate, cooldown=cooldown)
+    spider = TmallCommentSpider(base_url=base_url, session_pool=pool)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        comments = spider.get_multiple_pages('10001', max_pages=pages, page_size=page_size, delay=0,
+                                             concurrency=max(2, accounts * 2))
+    elapsed = time.perf_counter() - start
+    return len(comments) // page_size, elapsed, pool.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='会话池吞吐基准')
+    parser.add_argument('--accounts', default='1,2,4,8', help='账号数列表，逗号分隔')
+    parser.add_argument('--account-rate', type=float, default=5.0, help='服务端每个账号每秒允许的请求数')
+    parser.add_argument('--client-rate', type=float, help='客户端每个账号的限速，默认为服务端上限的0.9倍')
+    parser.add_argument('--pages', type=int, default=60)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help='回放服务的响应延迟（秒）')
+    parser.add_argument('--expired', type=int, default=0, help='令牌失效的账号数')
+    parser.add_argument('--cooldown', type=float, default=2.0, help='被限流账号的冷却秒数')
+    parser.add_argument('--rotate-tokens', type=int, default=0, help='服务端每个账号每N个请求轮换一次令牌')
+    args = parser.parse_args()
+
+    client_rate = args.client_rate or args.account_rate * 0.9
+    server, base_url = start_server(latency=args.latency, products=load_captures(), repeat=100,
+                                    account_rate=args.account_rate, expired_tokens=('expired',),
+                                    rotate_tokens=args.rotate_tokens)
+    print(f"📊 {args.pages}页 × {args.page_size}条，服务端每账号 {args.account_rate} 请求/秒，"
+          f"客户端每账号 {client_rate:.1f} 请求/秒，失效账号 {args.expired}"
+          + (f"，每{args.rotate_tokens}个请求轮换令牌" if args.rotate_tokens else ''))
+    print(f"{'账号数':>6} {'页数':>6} {'耗时(s)':>9} {'页/秒':>8} {'限流':>6} {'冷却':>6} {'失效':>6}")
+    evicted = []
+    try:
+        for accounts in [int(x) for x in args.accounts.split(',')]:
+            if accounts <= args.expired:
+                continue
+            pages, elapsed, stats = run(base_url, accounts, args.expired, client_rate, args.pages,
+                                        args.page_size, args.cooldown)
+            throttled = sum(account['throttled'] for account in stats['per_account'])
+            expired = sum(1 for account in stats['per_account'] if account['state'] == EXPIRED)
+            print(f"{accounts:>6} {pages:>6} {elapsed:>9.2f} {pages / elapsed:>8.1f} {throttled:>6} "
+                  f"{stats['cooling']:>6} {expired:>6}")
+            if expired > args.expired:
+                evicted.append(accounts)
+    finally:
+        server.shutdown()
+    if evicted:
+        print(f"❌ 账号数 {', '.join(map(str, evicted))} 时有令牌正常的账号被移出轮转")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+快照存储基准 - 对比output/下逐次运行的JSON文件与快照存储的磁盘占用和分析加载耗时
+使用方法: python3 benchmarks/bench_snapshot.py [--rounds 50]
+
+快照迁移到临时目录中进行，不修改output/。
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshot_store import SnapshotStore, _CAPTURE_PATTERN, _read_capture, migrate
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output')
+
+
+def load_from_json(paths):
+    """旧方式：读取该商品的所有JSON文件并按自然字段去重"""
+    seen = set()
+    comments = []
+    for path in paths:
+        for comment in _read_capture(path):
+            key = (comment.get('user_nick'), comment.get('date'), comment.get('content'), comment.get('sku_info'))
+            if key not in seen:
+                seen.add(key)
+                comments.append(comment)
+    return comments
+
+
+def timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return (time.perf_counter() - start) / rounds, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='快照存储基准')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    files = defaultdict(list)
+    for path in sorted(glob.glob(os.path.join(OUTPUT_DIR, 'comments_*.json'))):
+        match = _CAPTURE_PATTERN.search(os.path.basename(path))
+        if match:
+            files[match.group(1)].append(path)
+    if not files:
+        raise SystemExit('output/目录下没有可用的抓取文件')
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(directory)
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                summary = migrate(OUTPUT_DIR, store)
+            finally:
+                sys.stdout = stdout
+        print(f"📊 {summary['files']}个JSON文件 {summary['json_bytes'] / 1024:.1f}KB，"
+              f"{summary['comments']}条评论 → 快照 {summary['snapshot_bytes'] / 1024:.1f}KB，"
+              f"{summary['stored']}条评论（压缩比 {summary['json_bytes'] / summary['snapshot_bytes']:.1f}x）")
+
+        json_total = snapshot_total = range_total = 0.0
+        for product_id, paths in files.items():
+            json_time, json_comments = timed(lambda: load_from_json(paths), args.rounds)
+            # 每轮使用新的存储实例，计入读取索引的耗时
+            snapshot_time, snapshot_comments = timed(lambda: SnapshotStore(directory).load(product_id), args.rounds)
+            assert len(json_comments) == len(snapshot_comments)
+            dates = sorted(entry.date for entry in store.index(product_id))
+            since = str(dates[len(dates) // 2])
+            range_time, _ = timed(lambda: SnapshotStore(directory).load(product_id, since=since), args.rounds)
+            json_total += json_time
+            snapshot_total += snapshot_time
+            range_total += range_time
+
+    print(f"{'加载方式':<24} {'全部商品耗时(ms)':>16}")
+    print(f"{'JSON文件（逐个解析去重）':<24} {json_total * 1000:>16.2f}")
+    print(f"{'快照 全部评论':<24} {snapshot_total * 1000:>16.2f}")
+    print(f"{'快照 按日期取后一半':<24} {range_total * 1000:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
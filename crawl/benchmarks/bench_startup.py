@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准 - 每次爬取都启动一个新的spider.py进程，这里测量每次都要付出的启动开销，超出预算时以非0状态退出
+使用方法: python3 benchmarks/bench_startup.py [--runs 7] [--import-budget-ms 150] [--first-request-budget-ms 300]
+
+报告内容:
+  1. 解释器空启动（python -c pass）的耗时，作为基线
+  2. import spider 的耗时，以及按 -X importtime 统计的spider直接依赖的累计导入耗时（从大到小）
+  3. 新进程中 导入 → 创建TmallCommentSpider → 第一个请求（回放服务）完成 的分阶段耗时
+  4. 端到端运行 spider.py（1页，默认 / LOCAL_SENTIMENT=true开启本地情感打分）的进程总耗时
+预算检查: import spider 和首个请求完成时间的中位数不超过预算（也可用STARTUP_IMPORT_BUDGET_MS、
+STARTUP_FIRST_REQUEST_BUDGET_MS设置），且导入spider、发出第一个请求后都没有加载按需导入的重依赖。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CRAWL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CRAWL_DIR)
+
+from mock_mtop_server import load_captures, start_server
+
+# 只在用到时才导入的重依赖：NumPy（本地情感打分）、mysql.connector（数据库）、fake_useragent、Pillow（缩略图）
+LAZY_MODULES = ('numpy', 'mysql', 'fake_useragent', 'PIL', 'sentiment')
+
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+import spider
+imported = time.perf_counter()
+after_import = sorted(m for m in sys.argv[4].split(',') if m in sys.modules)
+crawler = spider.TmallCommentSpider(cookies='_m_h5_tk=abc_123', base_url=sys.argv[1])
+created = time.perf_counter()
+result = crawler.get_comments(sys.argv[2], page_no=1, page_size=int(sys.argv[3]))
+finished = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'init_ms': (created - imported) * 1000,
+    'request_ms': (finished - created) * 1000,
+    'total_ms': (finished - started) * 1000,
+    'success': bool(result.get('success')),
+    'after_import': after_import,
+    'after_request': sorted(m for m in sys.argv[4].split(',') if m in sys.modules)
+}))
+'''
+
+
+def wall_ms(command, env=None):
+    started = time.perf_counter()
+    subprocess.run(command, cwd=CRAWL_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def import_profile():
+    """运行一次 -X importtime，返回(spider的累计导入耗时ms, [(模块, 累计ms, 自身ms)] spider的直接依赖)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import spider'], cwd=CRAWL_DIR,
+                            capture_output=True, text=True, check=True)
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative_us) / 1000, int(self_us) / 1000))
+        elif depth == 0:
+            # importtime按导入完成的顺序输出，子模块排在父模块之前，遇到顶层模块时收集到的即为它的直接依赖
+            if name.strip() == 'spider':
+                return int(cumulative_us) / 1000, sorted(children, key=lambda item: -item[1])
+            children = []
+    return 0.0, []
+
+
+def median(values):
+    return statistics.median(values) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准')
+    parser.add_argument('--runs', type=int, default=7, help='每项测量的重复次数，取中位数')
+    parser.add_argument('--top', type=int, default=12, help='列出累计导入耗时最大的前N个依赖')
+    parser.add_argument('--latency', type=float, default=0.0, help='回放服务的响应延迟（秒）')
+    parser.add_argument('--import-budget-ms', type=float,
+                        default=float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '150')),
+                        help='import spider 的耗时预算（毫秒）')
+    parser.add_argument('--first-request-budget-ms', type=float,
+                        default=float(os.getenv('STARTUP_FIRST_REQUEST_BUDGET_MS', '300')),
+                        help='新进程从开始导入到第一个请求完成的耗时预算（毫秒）')
+    parser.add_argument('--json', help='把结果追加写入该JSON行文件')
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency, products=load_captures(), repeat=10)
+    product_id = next(iter(server.products))
+    env = dict(os.environ, USE_DATABASE='false', SPIDER_BASE_URL=base_url, PAGE_DELAY='0', MAX_PAGES='1',
+               PRODUCT_ID=product_id, COOKIES='_m_h5_tk=abc_123', SNAPSHOT_DIR='', CHECKPOINT_DIR='',
+               METRICS_FILE='', LOCAL_SENTIMENT='false')
+    try:
+        baseline = median([wall_ms([sys.executable, '-c', 'pass']) for _ in range(args.runs)])
+        profiles = sorted((import_profile() for _ in range(args.runs)), key=lambda profile: profile[0])
+        import_total, children = profiles[len(profiles) // 2]
+        probes = [json.loads(subprocess.run(
+            [sys.executable, '-c', PROBE, base_url, product_id, '20', ','.join(LAZY_MODULES)],
+            cwd=CRAWL_DIR, env=env, capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1])
+            for _ in range(args.runs)]
+        main_default = median([wall_ms([sys.executable, 'spider.py'], env) for _ in range(args.runs)])
+        main_sentiment = median([wall_ms([sys.executable, 'spider.py'], dict(env, LOCAL_SENTIMENT='true'))
+                                 for _ in range(args.runs)])
+    finally:
+        server.shutdown()
+
+    probe = {key: median([p[key] for p in probes]) for key in ('import_ms', 'init_ms', 'request_ms', 'total_ms')}
+    print(f"⏱️ 启动耗时（{args.runs}次取中位数）")
+    print(f"   解释器空启动:            {baseline:>8.1f} ms")
+    print(f"   import spider:           {probe['import_ms']:>8.1f} ms（-X importtime: {import_total:.1f} ms）")
+    print(f"   创建TmallCommentSpider:  {probe['init_ms']:>8.1f} ms")
+    print(f"   第一个请求:              {probe['request_ms']:>8.1f} ms")
+    print(f"   导入到首个请求完成:      {probe['total_ms']:>8.1f} ms")
+    print(f"   spider.py 1页（默认）:   {main_default:>8.1f} ms")
+    print(f"   spider.py 1页（LOCAL_SENTIMENT=true）: {main_sentiment:.1f} ms")
+    print(f"\n📦 spider的直接依赖（累计导入耗时前{args.top}）")
+    print(f"{'模块':<28} {'累计(ms)':>9} {'自身(ms)':>9}")
+    for name, cumulative, self_ms in children[:args.top]:
+        print(f"{name:<28} {cumulative:>9.1f} {self_ms:>9.1f}")
+
+    failures = []
+    if probe['import_ms'] > args.import_budget_ms:
+        failures.append(f"import spider {probe['import_ms']:.1f}ms 超出预算 {args.import_budget_ms:.0f}ms")
+    if probe['total_ms'] > args.first_request_budget_ms:
+        failures.append(f"首个请求完成 {probe['total_ms']:.1f}ms 超出预算 {args.first_request_budget_ms:.0f}ms")
+    if not all(p['success'] for p in probes):
+        failures.append('第一个请求失败')
+    for stage in ('after_import', 'after_request'):
+        loaded = sorted({m for p in probes for m in p[stage]})
+        if loaded:
+            failures.append(f"{'导入spider' if stage == 'after_import' else '第一个请求'}后已加载按需导入的模块: "
+                            f"{', '.join(loaded)}")
+
+    if args.json:
+        from bench_suite import git_commit
+        record = {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'baseline_ms': round(baseline, 1),
+            **{key: round(value, 1) for key, value in probe.items()},
+            'main_ms': round(main_default, 1),
+            'main_sentiment_ms': round(main_sentiment, 1),
+            'imports': {name: round(cumulative, 1) for name, cumulative, _ in children[:args.top]},
+            'passed': not failures
+        }
+        with open(args.json, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    print()
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"✅ 启动耗时在预算内（import ≤ {args.import_budget_ms:.0f}ms，首个请求 ≤ {args.first_request_budget_ms:.0f}ms）")
+
+
+if __name__ == "__main__":
+    main()
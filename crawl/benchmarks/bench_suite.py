@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+爬虫基准测试套件 - 基于回放服务驱动TmallCommentSpider和spider.py的main()
+报告页/秒、请求延迟p50/p95/p99、每页CPU时间和峰值RSS，可追加写入JSON行文件按提交追踪回归
+使用方法: python3 benchmarks/bench_suite.py [--levels 1,4,16] [--latency 0.05] [--runs 5] [--json bench.jsonl]
+
+回放服务运行在独立子进程中，CPU时间和RSS只统计爬虫本身。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+CRAWL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(CRAWL_DIR, 'benchmarks')
+sys.path.insert(0, CRAWL_DIR)
+
+from spider import TmallCommentSpider
+from mock_mtop_server import load_captures
+
+COOKIES = '_m_h5_tk=abc_123'
+
+
+def start_replay(args):
+    """以子进程启动回放服务，返回(process, base_url)"""
+    command = [sys.executable, os.path.join(BENCH_DIR, 'mock_mtop_server.py'), '--replay', '--port', '0',
+               '--latency', str(args.latency), '--jitter', str(args.jitter),
+               '--error-rate', str(args.error_rate), '--throttle-rate', str(args.throttle_rate),
+               '--repeat', str(args.repeat), '--seed', '42']
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise RuntimeError('回放服务启动失败')
+    return process, line.strip().split(': ', 1)[1]
+
+
+def percentiles(values):
+    """返回(p50, p95, p99)，单位毫秒"""
+    if not values:
+        return 0.0, 0.0, 0.0
+    if len(values) == 1:
+        return (values[0] * 1000,) * 3
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """峰值RSS（MB），Linux上ru_maxrss单位为KB，macOS上为字节"""
+    maxrss = resource.getrusage(who).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def cpu_seconds(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_spider(base_url, product_ids, max_pages, page_size, concurrency):
+    """进程内驱动TmallCommentSpider逐个爬取商品，记录每个HTTP请求的延迟"""
+    spider = TmallCommentSpider(cookies=COOKIES, base_url=base_url)
+    latencies = []
+    session_get = spider.session.get
+
+    def timed_get(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return session_get(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    spider.session.get = timed_get
+    pages = 0
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for product_id in product_ids:
+            for page in spider.iter_pages(product_id, max_pages=max_pages, page_size=page_size,
+                                          delay=0, concurrency=concurrency):
+                pages += 1
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    spider.session.close()
+    return {
+        'scenario': f'spider c={concurrency}',
+        'pages': pages,
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'cpu': cpu,
+        'rss_mb': peak_rss_mb(),
+        'stats': spider.get_stats()
+    }
+
+
+def bench_main(base_url, product_ids, max_pages, concurrency, runs):
+    """以子进程运行spider.py的main()，统计每次运行的端到端延迟和子进程资源占用"""
+    env = dict(os.environ, USE_DATABASE='false', SPIDER_BASE_URL=base_url, PAGE_DELAY='0', RATE_LIMIT='0',
+               MAX_PAGES=str(max_pages), CONCURRENCY=str(concurrency), COOKIES=COOKIES,
+               OUTPUT_FORMAT='ndjson', NDJSON_UNIT='page', SNAPSHOT_DIR='')
+    latencies = []
+    pages = 0
+    cpu_start = cpu_seconds(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    for i in range(runs):
+        env['PRODUCT_ID'] = product_ids[i % len(product_ids)]
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, 'spider.py'], cwd=CRAWL_DIR, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+        latencies.append(time.perf_counter() - started)
+        pages += sum(1 for line in result.stdout.splitlines() if line.startswith('{"type":"page"'))
+    elapsed = time.perf_counter() - start
+    return {
+        'scenario': f'main() c={concurrency}',
+        'pages': pages,
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'cpu': cpu_seconds(resource.RUSAGE_CHILDREN) - cpu_start,
+        'rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN)
+    }
+
+
+def summarize(result):
+    """把原始测量结果整理成报告行"""
+    pages = result['pages']
+    p50, p95, p99 = percentiles(result['latencies'])
+    summary = {
+        'scenario': result['scenario'],
+        'pages': pages,
+        'pages_per_sec': round(pages / result['elapsed'], 1) if result['elapsed'] else 0.0,
+        'p50_ms': round(p50, 1),
+        'p95_ms': round(p95, 1),
+        'p99_ms': round(p99, 1),
+        'cpu_ms_per_page': round(result['cpu'] * 1000 / pages, 2) if pages else 0.0,
+        'peak_rss_mb': round(result['rss_mb'], 1)
+    }
+    if 'stats' in result:
+        summary['stats'] = result['stats']
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=CRAWL_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='爬虫基准测试套件')
+    parser.add_argument('--levels', default='1,4,16', help='进程内爬虫的并发数列表，逗号分隔')
+    parser.add_argument('--max-pages', type=int, default=10, help='每个商品最多爬取的页数')
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--products', type=int, default=0, help='参与测试的商品数，0表示全部抓取商品')
+    parser.add_argument('--runs', type=int, default=5, help='main()子进程运行次数，0表示跳过')
+    parser.add_argument('--latency', type=float, default=0.05, help='回放服务的固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.02, help='回放服务的随机延迟上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='回放服务返回503的概率')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='回放服务返回限流码的概率')
+    parser.add_argument('--repeat', type=int, default=10, help='每个商品的评论重复次数（抓取文件较小）')
+    parser.add_argument('--json', help='把结果追加写入该JSON行文件')
+    args = parser.parse_args()
+
+    product_ids = sorted(load_captures())
+    if args.products:
+        product_ids = product_ids[:args.products]
+    if not product_ids:
+        raise SystemExit('output/目录下没有可回放的抓取文件')
+
+    process, base_url = start_replay(args)
+    print(f"📊 {len(product_ids)}个商品，每个最多{args.max_pages}页 × {args.page_size}条，"
+          f"延迟 {args.latency * 1000:.0f}ms±{args.jitter * 1000:.0f}ms，"
+          f"错误率 {args.error_rate:.0%}，限流率 {args.throttle_rate:.0%}")
+    results = []
+    try:
+        for level in [int(x) for x in args.levels.split(',')]:
+            results.append(summarize(bench_spider(base_url, product_ids, args.max_pages, args.page_size, level)))
+        if args.runs > 0:
+            results.append(summarize(bench_main(base_url, product_ids, args.max_pages, 1, args.runs)))
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"{'场景':<14} {'页数':>6} {'页/秒':>8} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} "
+          f"{'CPU/页(ms)':>11} {'峰值RSS(MB)':>12}")
+    for r in results:
+        print(f"{r['scenario']:<14} {r['pages']:>6} {r['pages_per_sec']:>8.1f} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['cpu_ms_per_page']:>11.2f} {r['peak_rss_mb']:>12.1f}")
+    print("注: spider行的延迟为单个HTTP请求延迟，main()行为每次进程运行的端到端延迟")
+
+    if args.json:
+        record = {
+            'commit': git_commit(),
+            'timestamp': int(time.time()),
+            'params': {k: v for k, v in vars(args).items() if k != 'json'},
+            'results': results
+        }
+        with open(args.json, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        print(f"💾 结果已追加到 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+本地mtop接口模拟服务 - 以mtopjsonp12(...)格式返回评论数据，可模拟延迟、错误和限流，用于测试和基准测试
+使用方法:
+    python3 benchmarks/mock_mtop_server.py --port 8765 --total 1000 --latency 0.2         # 生成的模拟评论
+    python3 benchmarks/mock_mtop_server.py --port 8766 --replay --latency 0.05 --error-rate 0.05 --throttle-rate 0.02
+
+评论来源:
+    默认按商品ID和页码生成--total条模拟评论；
+    --replay 回放output/目录下抓取到的真实评论：已抓取过的商品ID返回该商品的评论，其他商品ID返回全部抓取评论的合集，
+    --repeat N 把每个商品的评论重复N遍，用于构造更大的数据集。
+故障注入:
+    --latency/--jitter 固定延迟和随机延迟，--error-rate 返回HTTP 503的概率，--throttle-rate 返回mtop限流码的概率；
+    --account-rate R 模拟按账号限流：每个账号（按请求中的_m_h5_tk cookie区分）每秒超过R个请求时返回mtop限流码；
+    --expired-token P 对_m_h5_tk以P开头的账号返回令牌过期码，模拟登录态失效；
+    --rotate-tokens N 每个账号每N个请求轮换一次令牌：用旧令牌签名的请求返回令牌过期码，并通过Set-Cookie下发新令牌。
+"""
+
+import argparse
+import glob
+import hashlib
+import http.cookies
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CRAWL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CRAWL_DIR)
+
+OUTPUT_DIR = os.path.join(CRAWL_DIR, 'output')
+_CAPTURE_PATTERN = re.compile(r'comments_(\d+)_(\d+)\.json$')
+
+THROTTLE_RET = 'FAIL_SYS_USER_VALIDATE::哎哟喂,被挤爆啦,请稍后重试'
+TOKEN_EXPIRED_RET = 'FAIL_SYS_TOKEN_EXOIRED::令牌过期'
+
+
+def make_rate(product_id, page_no, index):
+    """生成一条模拟的原始评论数据"""
+    return {
+        'userNick': f'u**{index % 10}',
+        'feedback': f'商品{product_id} 第{page_no}页 第{index}条评论，质量不错，物流很快',
+        'userStar': str(5 - index % 5),
+        'feedbackDate': f'2025年{1 + index % 12}月{1 + index % 28}日',
+        'reply': '',
+        'skuValueStr': '官方标配；黑色',
+        'interactInfo': {'likeCount': str(index % 3)},
+        'feedPicPathList': [f'//img.alicdn.com/imgextra/mock/{product_id}_{page_no}_{index}.jpg'] if index % 4 == 0 else []
+    }
+
+
+def to_raw_rate(comment):
+    """把_format_comments输出的评论还原成接口返回的rateList条目"""
+    return {
+        'userNick': comment.get('user_nick', ''),
+        'feedback': comment.get('content', ''),
+        'userStar': str(comment.get('rating', 5)),
+        'feedbackDate': comment.get('date', ''),
+        'reply': comment.get('reply', ''),
+        'skuValueStr': comment.get('sku_info', ''),
+        'interactInfo': {'likeCount': str(comment.get('useful_count', 0))},
+        'feedPicPathList': list(comment.get('pics') or [])
+    }
+
+
+def load_captures(output_dir=OUTPUT_DIR):
+    """读取comments_<id>_<ts>.json抓取文件，返回{商品ID: [原始评论, ...]}
+
+    同一商品的多次抓取按时间从新到旧合并，按(用户, 日期, 内容, SKU)去重。
+    抓取文件有两种格式：评论列表，或包含comments字段的完整输出；没有抓取文件的商品从快照存储读取。
+    """
+    captures = []
+    for path in glob.glob(os.path.join(output_dir, 'comments_*.json')):
+        match = _CAPTURE_PATTERN.search(os.path.basename(path))
+        if match:
+            captures.append((int(match.group(2)), match.group(1), path))
+
+    products = {}
+    seen = {}
+    for _, product_id, path in sorted(captures, reverse=True):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        comments = data.get('comments', []) if isinstance(data, dict) else data
+        rates = products.setdefault(product_id, [])
+        keys = seen.setdefault(product_id, set())
+        for comment in comments:
+            key = (comment.get('user_nick'), comment.get('date'), comment.get('content'), comment.get('sku_info'))
+            if key not in keys:
+                keys.add(key)
+                rates.append(to_raw_rate(comment))
+
+    # 抓取文件迁移到快照存储（snapshot_store.py migrate --remove）后从快照读取
+    snapshot_dir = os.path.join(output_dir, 'snapshots')
+    if os.path.isdir(snapshot_dir):
+        from snapshot_store import SnapshotStore
+        store = SnapshotStore(snapshot_dir)
+        for product_id in store.products():
+            if product_id not in products:
+                products[product_id] = [to_raw_rate(comment) for comment in store.load(product_id)]
+    return {product_id: rates for product_id, rates in products.items() if rates}
+
+
+class MockMtopHandler(BaseHTTPRequestHandler):
+    """模拟mtop.taobao.rate.detaillist.get接口"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        callback = query.get('callback', ['mtopjsonp12'])[0]
+        try:
+            data = json.loads(query.get('data', ['{}'])[0])
+        except json.JSONDecodeError:
+            data = {}
+        product_id = str(data.get('auctionNumId', ''))
+        page_no = max(1, int(data.get('pageNo', 1)))
+        page_size = max(1, int(data.get('pageSize', 20)))
+
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            delay = server.latency + server.rng.uniform(0, server.jitter) if server.jitter else server.latency
+            roll = server.rng.random()
+        account = self._account()
+        over_limit = server.account_over_limit(account)
+        if delay > 0:
+            time.sleep(delay)
+
+        if account and account.startswith(server.expired_tokens):
+            self._send_payload(callback, TOKEN_EXPIRED_RET)
+            return
+
+        if server.rotate_tokens:
+            fresh = server.verify_token(account, query)
+            if fresh:
+                self._send_payload(callback, TOKEN_EXPIRED_RET, cookies={
+                    '_m_h5_tk': fresh, '_m_h5_tk_enc': hashlib.md5(fresh.encode('utf-8')).hexdigest()})
+                return
+
+        if roll < server.error_rate:
+            with server.lock:
+                server.error_count += 1
+            self._send(503, b'Service Unavailable', 'text/plain; charset=utf-8')
+            return
+
+        if over_limit or roll < server.error_rate + server.throttle_rate:
+            with server.lock:
+                server.throttle_count += 1
+            self._send_payload(callback, THROTTLE_RET)
+            return
+
+        rate_list, total = server.page(product_id, page_no, page_size)
+        self._send_payload(callback, 'SUCCESS::调用成功', {'rateList': rate_list, 'total': str(total)})
+
+    def _account(self):
+        """请求所属的账号：_m_h5_tk cookie的值，没有时为空字符串"""
+        cookie = http.cookies.SimpleCookie()
+        try:
+            cookie.load(self.headers.get('Cookie', ''))
+        except http.cookies.CookieError:
+            return ''
+        morsel = cookie.get('_m_h5_tk')
+        return morsel.value if morsel else ''
+
+    def _send_payload(self, callback, ret, data=None, cookies=None):
+        payload = {'api': 'mtop.taobao.rate.detaillist.get', 'ret': [ret], 'v': '6.0', 'data': data or {}}
+        self._send(200, f"{callback}({json.dumps(payload, ensure_ascii=False)})".encode('utf-8'),
+                   'application/javascript; charset=utf-8', cookies)
+
+    def _send(self, status, body, content_type, cookies=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in (cookies or {}).items():
+            self.send_header('Set-Cookie', f'{name}={value}; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockMtopServer(ThreadingHTTPServer):
+    """模拟服务，保存评论来源、故障注入参数和请求计数；products为None时生成total条模拟评论"""
+
+    daemon_threads = True
+
+    def __init__(self, address, total=1000, products=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 throttle_rate=0.0, repeat=1, seed=None, account_rate=None, expired_tokens=(), rotate_tokens=0):
+        super().__init__(address, MockMtopHandler)
+        self.total = total
+        self.products = products or {}
+        self.corpus = [rate for rates in self.products.values() for rate in rates]
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.repeat = max(1, int(repeat))
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+        self.throttle_count = 0
+        # 按账号的令牌桶：{账号: [令牌数, 上次补充时间]}
+        self.account_rate = account_rate
+        self.expired_tokens = tuple(expired_tokens)
+        self.account_buckets = {}
+        self.account_requests = {}
+        # 令牌轮换：{令牌: 账号}，{账号: 当前_m_h5_tk}，账号以首次出现的令牌标识
+        self.rotate_tokens = rotate_tokens
+        self.token_accounts = {}
+        self.current_tokens = {}
+        self.token_requests = {}
+        self.rotation_count = 0
+
+    def page(self, product_id, page_no, page_size):
+        """返回(第page_no页的评论, 评论总数)"""
+        start = (page_no - 1) * page_size
+        if not self.corpus:
+            end = min(self.total, start + page_size)
+            return [make_rate(product_id, page_no, i) for i in range(start, end)], self.total
+        rates = self.products.get(product_id, self.corpus)
+        total = len(rates) * self.repeat
+        return [self.rate_at(rates, i) for i in range(start, min(total, start + page_size))], total
+
+    def account_over_limit(self, account):
+        """记录账号的一次请求，超过account_rate时返回True"""
+        with self.lock:
+            self.account_requests[account] = self.account_requests.get(account, 0) + 1
+            if not self.account_rate:
+                return False
+            now = time.monotonic()
+            bucket = self.account_buckets.setdefault(account, [1.0, now])
+            bucket[0] = min(1.0, bucket[0] + (now - bucket[1]) * self.account_rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                return True
+            bucket[0] -= 1
+            return False
+
+    def verify_token(self, account, query):
+        """按账号当前令牌校验请求签名：通过时返回None并计数（每rotate_tokens个请求轮换一次令牌），
+        签名使用的不是当前令牌时返回应通过Set-Cookie下发的_m_h5_tk"""
+        token = account.split('_')[0]
+        timestamp = query.get('t', [''])[0]
+        data = query.get('data', [''])[0]
+        with self.lock:
+            owner = self.token_accounts.setdefault(token, token)
+            current = self.current_tokens.setdefault(owner, account)
+            current_token = current.split('_')[0]
+            sign_str = f"{current_token}&{timestamp}&12574478&{data}" if current_token else f"{timestamp}&12574478&{data}"
+            if hashlib.md5(sign_str.encode('utf-8')).hexdigest() != query.get('sign', [''])[0]:
+                return current
+            self.token_requests[owner] = self.token_requests.get(owner, 0) + 1
+            if self.token_requests[owner] % self.rotate_tokens == 0:
+                fresh = uuid.uuid4().hex
+                self.token_accounts[fresh] = owner
+                self.current_tokens[owner] = f"{fresh}_{int(time.time() * 1000) + 3600000}"
+                self.rotation_count += 1
+            return None
+
+    @staticmethod
+    def rate_at(rates, index):
+        """第index条评论；重复轮次中改写用户昵称，保证自然键不重复"""
+        rate = rates[index % len(rates)]
+        cycle = index // len(rates)
+        if cycle == 0:
+            return rate
+        return dict(rate, userNick=f"{rate['userNick']}#{cycle}")
+
+
+def start_server(total=1000, latency=0.0, host='127.0.0.1', port=0, products=None, jitter=0.0, error_rate=0.0,
+                 throttle_rate=0.0, repeat=1, seed=None, account_rate=None, expired_tokens=(), rotate_tokens=0):
+    """在后台线程中启动模拟服务，返回(server, base_url)；传入products（load_captures()的结果）时回放抓取评论"""
+    if products is not None and not products:
+        raise ValueError(f'没有可回放的抓取数据: {OUTPUT_DIR}')
+    server = MockMtopServer((host, port), total, products, latency, jitter, error_rate, throttle_rate, repeat,
+                            seed, account_rate, expired_tokens, rotate_tokens)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}/h5/mtop.taobao.rate.detaillist.get/6.0/"
+    return server, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地mtop接口模拟服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口，0表示随机端口')
+    parser.add_argument('--total', type=int, default=1000, help='生成的模拟评论总数（未使用--replay时）')
+    parser.add_argument('--replay', action='store_true', help='回放抓取文件中的真实评论')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='抓取文件目录')
+    parser.add_argument('--repeat', type=int, default=1, help='回放时每个商品的评论重复次数')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='在固定延迟上叠加的随机延迟上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回HTTP 503的概率')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='返回mtop限流码的概率')
+    parser.add_argument('--seed', type=int, help='故障注入的随机种子')
+    parser.add_argument('--account-rate', type=float, help='每个账号每秒允许的请求数，超过时返回限流码')
+    parser.add_argument('--expired-token', action='append', default=[], help='令牌过期的_m_h5_tk前缀，可重复')
+    parser.add_argument('--rotate-tokens', type=int, default=0, help='每个账号每N个请求轮换一次令牌，0表示不轮换')
+    args = parser.parse_args()
+
+    products = load_captures(args.output_dir) if args.replay else None
+    server, base_url = start_server(args.total, args.latency, args.host, args.port, products, args.jitter,
+                                    args.error_rate, args.throttle_rate, args.repeat, args.seed,
+                                    args.account_rate, args.expired_token, args.rotate_tokens)
+    # 第一行输出服务地址，基准测试脚本以子进程启动时从这里读取
+    print(f"🧪 模拟服务已启动: {base_url}", flush=True)
+    if products:
+        print(f"📦 {len(products)}个商品，{len(server.corpus)}条评论", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+爬取断点 - 每获取一页就把该页评论和令牌状态落盘，进程被杀或崩溃后重新爬取同一商品时从最后完成的页继续
+使用方法:
+    python3 checkpoint.py list              # 查看未完成的断点
+    python3 checkpoint.py clear [商品ID]     # 删除断点
+    python3 checkpoint.py purge             # 删除过期断点
+
+目录结构（CHECKPOINT_DIR，默认output/checkpoints）:
+    <商品ID>/page_00001.json  每页一个文件，先写临时文件再原子替换
+    <商品ID>/state.json       已连续完成的页数、评论总数、令牌状态，每页文件写完后原子替换
+爬取正常结束时删除断点；超过CHECKPOINT_TTL秒（默认86400）未更新的断点视为过期，不再恢复。
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from comment_record import CommentRecord, json_default
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output', 'checkpoints')
+STATE_FILE = 'state.json'
+
+
+def write_atomic(path: str, data: bytes):
+    """先写同目录下的临时文件并fsync，再原子替换目标文件，读者只会看到完整的旧文件或新文件"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CrawlCheckpoint:
+    """单个商品一次爬取的断点：按页记录，恢复时重放已完成的页"""
+
+    def __init__(self, store: 'CheckpointStore', product_id: str, page_size: int, order_type: str = ''):
+        self.store = store
+        self.product_id = str(product_id)
+        self.page_size = page_size
+        self.order_type = order_type
+        self.directory = os.path.join(store.directory, self.product_id)
+        self.state = None
+        # iter_pages因请求失败停止时写入failed_page，爬取结束时据此决定保留还是删除断点
+        self.progress = {}
+
+    @property
+    def completed(self) -> int:
+        """已连续完成的页数"""
+        return self.state['completed'] if self.state else 0
+
+    def load(self) -> bool:
+        """读取断点，参数一致且未过期时返回True；过期或参数不一致的断点直接删除"""
+        state = self.store.read_state(self.product_id)
+        if not state or not state.get('completed'):
+            return False
+        if self.store.is_expired(state):
+            print(f"⌛ 商品 {self.product_id} 的断点已过期，重新开始爬取")
+            self.discard()
+            return False
+        if state.get('page_size') != self.page_size or state.get('order_type', '') != self.order_type:
+            print(f"⚠️ 商品 {self.product_id} 的断点参数不一致（页大小或排序），重新开始爬取")
+            self.discard()
+            return False
+        self.state = state
+        return True
+
+    @property
+    def tokens(self) -> Dict:
+        return (self.state or {}).get('tokens') or {}
+
+    def _page_path(self, page: int) -> str:
+        return os.path.join(self.directory, f"page_{page:05d}.json")
+
+    def load_page(self, page: int) -> List[CommentRecord]:
+        with open(self._page_path(page), 'rb') as f:
+            return [CommentRecord.from_dict(comment) for comment in json.loads(f.read())]
+
+    def first_page(self) -> Dict:
+        """按get_comments的返回格式重建第1页结果，用于规划页数和推断商品信息"""
+        return {'success': True, 'comments': self.load_page(1), 'total': self.state.get('total', 0)}
+
+    def saved_pages(self) -> Iterator[Tuple[int, List[CommentRecord]]]:
+        """逐页读取已完成的页"""
+        for page in range(1, self.completed + 1):
+            yield page, self.load_page(page)
+
+    def record(self, page: int, comments: List, total=None, tokens: Optional[Dict] = None):
+        """页面按顺序完成后调用：先原子写入该页，再原子更新state.json"""
+        os.makedirs(self.directory, exist_ok=True)
+        write_atomic(self._page_path(page),
+                     json.dumps(comments, ensure_ascii=False, separators=(',', ':'), default=json_default).encode('utf-8'))
+        now = time.time()
+        state = self.state or {
+            'product_id': self.product_id,
+            'page_size': self.page_size,
+            'order_type': self.order_type,
+            'created_at': now,
+            'comments': 0
+        }
+        state.update({
+            'completed': page,
+            'comments': state.get('comments', 0) + len(comments),
+            'updated_at': now
+        })
+        if total is not None:
+            state['total'] = total
+        if tokens:
+            state['tokens'] = tokens
+        write_atomic(os.path.join(self.directory, STATE_FILE),
+                     json.dumps(state, ensure_ascii=False).encode('utf-8'))
+        self.state = state
+
+    def wrap(self, pages: Iterable, replay: Iterable = (), total=None, tokens=None) -> Iterator:
+        """先产出replay中已完成的页（不再写入），再逐页记录并产出pages中新获取的页；tokens为返回令牌状态的函数"""
+        yield from replay
+        for page, comments in pages:
+            self.record(page, comments, total, tokens() if tokens else None)
+            yield page, comments
+
+    def finish(self) -> bool:
+        """爬取结束：正常结束时删除断点并返回True；因请求失败停止时保留断点供下次恢复"""
+        failed_page = self.progress.get('failed_page')
+        if failed_page:
+            if self.state:
+                print(f"💾 断点已保存: 已完成 {self.completed} 页，下次从第 {self.completed + 1} 页继续")
+            return False
+        self.discard()
+        return True
+
+    def discard(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.state = None
+
+
+class CheckpointStore:
+    """断点目录，每个商品一个子目录"""
+
+    def __init__(self, directory: str = DEFAULT_CHECKPOINT_DIR, ttl: float = 86400):
+        self.directory = directory
+        self.ttl = ttl
+
+    @classmethod
+    def from_env(cls) -> Optional['CheckpointStore']:
+        """CHECKPOINT_DIR设为空字符串时不保存断点"""
+        directory = os.getenv('CHECKPOINT_DIR', DEFAULT_CHECKPOINT_DIR)
+        if not directory:
+            return None
+        store = cls(directory, float(os.getenv('CHECKPOINT_TTL', '86400')))
+        store.purge_expired()
+        return store
+
+    def open(self, product_id: str, page_size: int, order_type: str = '') -> CrawlCheckpoint:
+        return CrawlCheckpoint(self, product_id, page_size, order_type)
+
+    def read_state(self, product_id: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.directory, str(product_id), STATE_FILE), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_expired(self, state: Dict) -> bool:
+        return bool(self.ttl) and time.time() - state.get('updated_at', 0) > self.ttl
+
+    def products(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)))
+
+    def clear(self, product_id: str):
+        shutil.rmtree(os.path.join(self.directory, str(product_id)), ignore_errors=True)
+
+    def purge_expired(self) -> int:
+        """删除过期（或没有有效state.json）的断点，返回删除的个数"""
+        removed = 0
+        for product_id in self.products():
+            state = self.read_state(product_id)
+            if state is None or self.is_expired(state):
+                self.clear(product_id)
+                removed += 1
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='爬取断点管理')
+    parser.add_argument('--dir', default=os.getenv('CHECKPOINT_DIR') or DEFAULT_CHECKPOINT_DIR, help='断点目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='查看未完成的断点')
+    clear_parser = subparsers.add_parser('clear', help='删除断点')
+    clear_parser.add_argument('product_id', nargs='?', help='商品ID，省略时删除全部')
+    subparsers.add_parser('purge', help='删除过期断点')
+    args = parser.parse_args()
+
+    store = CheckpointStore(args.dir, float(os.getenv('CHECKPOINT_TTL', '86400')))
+    if args.command == 'list':
+        for product_id in store.products():
+            state = store.read_state(product_id) or {}
+            updated = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state.get('updated_at', 0)))
+            print(f"📌 {product_id}: 已完成 {state.get('completed', 0)} 页，{state.get('comments', 0)} 条评论，"
+                  f"更新于 {updated}{'（已过期）' if store.is_expired(state) else ''}")
+    elif args.command == 'clear':
+        for product_id in [args.product_id] if args.product_id else store.products():
+            store.clear(product_id)
+        print("✅ 断点已删除")
+    else:
+        print(f"🧹 删除 {store.purge_expired()} 个过期断点")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+紧凑评论记录 - 用__slots__代替每条评论一个dict，重复率高的昵称、SKU、日期字符串做驻留
+兼容dict的读取方式（comment['content']、comment.get('pics', [])），JSON输出时通过json_default转换
+"""
+
+import sys
+from typing import Any, Dict, Iterable
+
+_intern = sys.intern
+
+
+class CommentRecord:
+    """单条评论，字段与原先的评论dict一致"""
+
+    FIELDS = ('user_nick', 'content', 'rating', 'date', 'useful_count', 'reply', 'sku_info', 'pics')
+    # 可选的派生字段（本地情感打分结果、已保存图片的引用），未设置时不出现在to_dict和JSON输出中
+    OPTIONAL_FIELDS = ('sentiment', 'images')
+
+    __slots__ = FIELDS + OPTIONAL_FIELDS
+
+    def __init__(self, user_nick: str = '', content: str = '', rating: int = 0, date: str = '',
+                 useful_count: int = 0, reply: str = '', sku_info: str = '', pics: Iterable[str] = ()):
+        # 匿名买家昵称、SKU组合和日期在同一商品内大量重复，驻留后所有评论共享同一个字符串对象
+        self.user_nick = _intern(user_nick or '')
+        self.content = content
+        self.rating = rating
+        self.date = _intern(date or '')
+        self.useful_count = useful_count
+        self.reply = reply
+        self.sku_info = _intern(sku_info or '')
+        # 大多数评论没有图片，空元组是全局共享的单例
+        self.pics = tuple(pics) if pics else ()
+        self.sentiment = None
+        self.images = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CommentRecord':
+        if isinstance(data, cls):
+            return data
+        record = cls(data.get('user_nick', ''), data.get('content', ''), data.get('rating', 0),
+                     data.get('date', ''), data.get('useful_count', 0), data.get('reply', ''),
+                     data.get('sku_info', ''), data.get('pics') or ())
+        record.sentiment = data.get('sentiment')
+        record.images = data.get('images')
+        return record
+
+    def to_dict(self) -> Dict:
+        data = {
+            'user_nick': self.user_nick,
+            'content': self.content,
+            'rating': self.rating,
+            'date': self.date,
+            'useful_count': self.useful_count,
+            'reply': self.reply,
+            'sku_info': self.sku_info,
+            'pics': list(self.pics)
+        }
+        if self.sentiment is not None:
+            data['sentiment'] = self.sentiment
+        if self.images is not None:
+            data['images'] = self.images
+        return data
+
+    # dict兼容接口，已有代码按comment['key']和comment.get('key')读取评论
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS or (key in self.OPTIONAL_FIELDS and getattr(self, key) is not None):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, tuple(value) if key == 'pics' else value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if key in self.OPTIONAL_FIELDS and getattr(self, key) is not None:
+            return getattr(self, key)
+        return default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def keys(self):
+        if self.sentiment is None and self.images is None:
+            return self.FIELDS
+        return self.FIELDS + tuple(key for key in self.OPTIONAL_FIELDS if getattr(self, key) is not None)
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, CommentRecord):
+            return all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"CommentRecord({self.to_dict()!r})"
+
+
+def json_default(obj: Any) -> Any:
+    """json.dumps的default参数：把CommentRecord转换为普通dict"""
+    if isinstance(obj, CommentRecord):
+        return obj.to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
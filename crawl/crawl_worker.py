@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+分布式爬取工作进程 - 从crawl_jobs任务队列（job_queue.py）领取任务并爬取，可在多台机器上同时运行
+使用方法:
+    python3 crawl_worker.py                    # 单个工作进程，持续领取任务
+    python3 crawl_worker.py --processes 4      # 本机启动4个工作进程
+    python3 crawl_worker.py --drain            # 队列中没有未完成的任务时退出
+
+任务参数（params）与spider_daemon.py的任务字段相同：max_pages, page_size, delay, concurrency,
+rate_limit, incremental, pipeline 等；未指定的参数使用spider_configs中的配置。
+收到SIGTERM或Ctrl-C时执行完当前任务再退出；进程被强制杀死时，任务在租约（JOB_LEASE秒）过期后由其他工作进程重新领取。
+情感打分、图片下载、断点续爬、流水线和会话池等开关与spider_daemon.py相同，均通过环境变量配置。
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from job_queue import JobQueue, LeaseKeeper
+from metrics import metrics
+from spider_daemon import SpiderDaemon
+
+
+class CrawlWorker:
+    """单个工作进程：循环领取任务，执行期间续约，按结果标记完成或失败"""
+
+    def __init__(self, queue: JobQueue, daemon: SpiderDaemon, worker_id: str = None, poll_interval: float = 2.0):
+        self.queue = queue
+        self.daemon = daemon
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.stats = {'done': 0, 'failed': 0, 'lease_lost': 0}
+
+    def run_job(self, job):
+        """执行一个已领取的任务"""
+        task = dict(job['params'])
+        task.update({'id': job['id'], 'product_id': job['product_id']})
+        print(f"🔧 [{self.worker_id}] 任务 {job['id']}: 商品 {job['product_id']}（第 {job['attempts']} 次领取）")
+        with LeaseKeeper(self.queue, job) as lease:
+            data = self.daemon.handle_job(task)
+        if lease.lost.is_set():
+            # 租约已被其他工作进程接手，由它负责结果；评论按自然键幂等写入，重复爬取不会产生重复数据
+            self.stats['lease_lost'] += 1
+            return
+        if data.get('type') == 'error':
+            self.queue.fail(job, data.get('error', '未知错误'))
+            self.stats['failed'] += 1
+        elif not data.get('success'):
+            # 翻页请求失败而中断；增量爬取没有新评论时success为True，按完成处理（total为0）
+            self.queue.fail(job, data.get('error', '未知错误'))
+            self.stats['failed'] += 1
+        elif self.queue.complete(job, {
+            'total': data.get('total', 0),
+            'product_name': data['product_info']['product_name'],
+            'elapsed': data.get('elapsed'),
+            'worker_id': self.worker_id
+        }):
+            self.stats['done'] += 1
+        else:
+            self.stats['lease_lost'] += 1
+
+    def _drained(self) -> bool:
+        stats = self.queue.stats()
+        return stats['queued'] == 0 and stats['running'] == 0
+
+    def run(self, stop: threading.Event, drain: bool = False):
+        """循环领取并执行任务，直到stop被设置；drain为True时队列中没有未完成的任务即退出"""
+        last_reap = 0.0
+        while not stop.is_set():
+            try:
+                # 每个租约周期清理一次租约过期且重试次数用完的任务，释放商品的唯一约束
+                if time.monotonic() - last_reap >= self.queue.lease_seconds:
+                    self.queue.reap()
+                    last_reap = time.monotonic()
+                jobs = self.queue.claim(self.worker_id)
+                if not jobs and drain and self._drained():
+                    break
+            except Exception as e:
+                print(f"❌ [{self.worker_id}] 访问任务队列失败: {e}")
+                metrics.inc('job_queue_errors_total')
+                stop.wait(self.poll_interval)
+                continue
+            if not jobs:
+                stop.wait(self.poll_interval)
+                continue
+            for job in jobs:
+                try:
+                    self.run_job(job)
+                except Exception as e:
+                    # 标记失败本身出错时不做处理，租约过期后任务会被重新领取
+                    print(f"❌ [{self.worker_id}] 任务 {job['id']} 处理失败: {e}")
+        print(f"👋 [{self.worker_id}] 退出: {self.stats}")
+
+
+def run_worker(index: int, args):
+    """工作进程入口：在本进程内创建数据库连接池和爬虫实例"""
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    if args.processes > 1 and metrics.path:
+        # 每个进程导出到各自的指标文件，避免互相覆盖
+        metrics.path = f"{metrics.path}.{index}"
+    daemon = SpiderDaemon(use_database=True, base_url=os.getenv('SPIDER_BASE_URL') or None)
+    if daemon.db_reader is None:
+        return
+    worker = CrawlWorker(JobQueue.from_env(daemon.db_reader), daemon, poll_interval=args.poll)
+    exporter = metrics.start_exporter()
+    try:
+        worker.run(stop, drain=args.drain)
+    finally:
+        if exporter:
+            exporter.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分布式爬取工作进程')
+    parser.add_argument('--processes', type=int, default=int(os.getenv('WORKER_PROCESSES', '1')),
+                        help='本机启动的工作进程数')
+    parser.add_argument('--poll', type=float, default=float(os.getenv('WORKER_POLL', '2')),
+                        help='队列为空时的轮询间隔（秒）')
+    parser.add_argument('--drain', action='store_true', help='队列中没有未完成的任务时退出')
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(0, args)
+        return
+
+    processes = [multiprocessing.Process(target=run_worker, args=(i, args), name=f'crawl-worker-{i}')
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    print(f"🚀 已启动 {len(processes)} 个工作进程")
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
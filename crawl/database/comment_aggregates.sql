@@ -0,0 +1,17 @@
+-- 评论聚合表
+-- 每个商品按维度预计算评论数、带图评论数和评分和，save_comments在写入评论的同一事务中按增量维护，
+-- 读取评分分布、带图占比、SKU和每日统计时无需扫描comments表。
+-- dimension: total（bucket为空）/ rating（bucket为评分）/ sku（bucket为SKU信息）/ day（bucket为YYYY-MM-DD）
+-- 已有评论数据时，建表后执行回填: python3 database_reader.py backfill-aggregates
+USE curl_parser_db;
+
+CREATE TABLE IF NOT EXISTS comment_aggregates (
+    product_id VARCHAR(50) NOT NULL COMMENT '商品ID',
+    dimension VARCHAR(16) NOT NULL COMMENT '聚合维度',
+    bucket VARCHAR(255) NOT NULL DEFAULT '' COMMENT '聚合桶',
+    comment_count INT NOT NULL DEFAULT 0 COMMENT '评论数',
+    pic_count INT NOT NULL DEFAULT 0 COMMENT '带图评论数',
+    rating_sum INT NOT NULL DEFAULT 0 COMMENT '评分和',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (product_id, dimension, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='评论聚合表';
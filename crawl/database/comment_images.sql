@@ -0,0 +1,18 @@
+-- 为comments表添加已保存评论图片的引用（image_store.py），由 database_reader.py 的 upsert_comments 随评论一起写入
+-- images 与 pics 一一对应: [{"url": 规范化URL, "key": "<sha256>.jpg"}]，下载失败的图片key为null
+USE curl_parser_db;
+
+-- 添加images字段
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND COLUMN_NAME = 'images') = 0,
+        'ALTER TABLE comments ADD COLUMN images JSON NULL COMMENT ''已保存评论图片的内容哈希引用'' AFTER pics;',
+        'SELECT ''images字段已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
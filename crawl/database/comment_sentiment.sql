@@ -0,0 +1,94 @@
+-- 为comments表添加本地情感打分结果（sentiment.py），由 database_reader.py 的 upsert_comments 随评论一起写入
+-- sentiment_ambiguous = 1 的评论才需要送到远程AI工作流复核（get_ambiguous_comments）
+-- 已有评论执行 python3 sentiment.py backfill 补写分数
+USE curl_parser_db;
+
+-- 添加sentiment_label字段
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND COLUMN_NAME = 'sentiment_label') = 0,
+        'ALTER TABLE comments ADD COLUMN sentiment_label VARCHAR(16) NULL COMMENT ''本地情感标签: positive/neutral/negative'' AFTER pics;',
+        'SELECT ''sentiment_label字段已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 添加sentiment_score字段
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND COLUMN_NAME = 'sentiment_score') = 0,
+        'ALTER TABLE comments ADD COLUMN sentiment_score DECIMAL(5,4) NULL COMMENT ''本地情感分(-1~1)'' AFTER sentiment_label;',
+        'SELECT ''sentiment_score字段已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 添加sentiment_confidence字段
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND COLUMN_NAME = 'sentiment_confidence') = 0,
+        'ALTER TABLE comments ADD COLUMN sentiment_confidence DECIMAL(5,4) NULL COMMENT ''本地情感置信度(0~1)'' AFTER sentiment_score;',
+        'SELECT ''sentiment_confidence字段已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 添加sentiment_ambiguous字段
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND COLUMN_NAME = 'sentiment_ambiguous') = 0,
+        'ALTER TABLE comments ADD COLUMN sentiment_ambiguous TINYINT(1) NULL COMMENT ''是否需要远程模型复核'' AFTER sentiment_confidence;',
+        'SELECT ''sentiment_ambiguous字段已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 添加keywords字段
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND COLUMN_NAME = 'keywords') = 0,
+        'ALTER TABLE comments ADD COLUMN keywords JSON NULL COMMENT ''本地提取的关键词'' AFTER sentiment_ambiguous;',
+        'SELECT ''keywords字段已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 按商品读取待复核评论的索引
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND INDEX_NAME = 'idx_product_ambiguous') = 0,
+        'ALTER TABLE comments ADD INDEX idx_product_ambiguous (product_id, sentiment_ambiguous);',
+        'SELECT ''idx_product_ambiguous索引已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
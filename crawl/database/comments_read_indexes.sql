@@ -0,0 +1,75 @@
+-- comments表的读取索引，配合 database_reader.py 中的 get_comments_page / iter_comments 键集分页
+--
+-- date列保存接口原样返回的"2023年12月7日"，月、日不补零，按字符串排序不是时间顺序
+-- （"12月7日"排在"12月28日"之前，"2024年9月"排在"2024年10月"之前）。
+-- date_key为由date生成的日期整数列（20231207），解析规则与 database_reader.date_key() 一致：
+-- 第一个"4位数字 非数字 1~2位数字 非数字 1~2位数字"片段，无法解析时为0。
+-- 生成列由数据库计算，Node.js端写入的评论同样有值，无需回填。
+--
+-- 分页查询:
+--   SELECT ... FROM comments WHERE product_id = ? [AND (date_key < ? OR (date_key = ? AND id < ?))]
+--   ORDER BY date_key DESC, id DESC LIMIT ?
+-- idx_product_date_id 的前三列与WHERE/ORDER BY一致，查询为索引上的反向范围扫描，
+-- 无需文件排序，每页只读取LIMIT行，耗时与商品评论总数无关。
+-- rating、useful_count附加在索引末尾：只投影 id/product_id/date_key/rating/useful_count 的查询
+-- （列表骨架、评分分布、按日期统计）为仅索引查询（EXPLAIN中Extra为Using index），不回表。
+-- 需要MySQL 8.0+（REGEXP_SUBSTR）。未执行本脚本时 get_comments_page 退回按date字符串排序。
+USE curl_parser_db;
+
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+         WHERE TABLE_SCHEMA = 'curl_parser_db'
+         AND TABLE_NAME = 'comments'
+         AND COLUMN_NAME = 'date_key') = 0,
+        'ALTER TABLE comments ADD COLUMN date_key INT UNSIGNED AS (
+            IF(REGEXP_SUBSTR(`date`, ''[0-9]{4}[^0-9]+[0-9]{1,2}[^0-9]+[0-9]{1,2}'') IS NULL, 0,
+               CAST(LEFT(REGEXP_SUBSTR(`date`, ''[0-9]{4}[^0-9]+[0-9]{1,2}[^0-9]+[0-9]{1,2}''), 4) AS UNSIGNED) * 10000
+               + CAST(REGEXP_SUBSTR(REGEXP_SUBSTR(`date`, ''[0-9]{4}[^0-9]+[0-9]{1,2}[^0-9]+[0-9]{1,2}''),
+                                    ''[0-9]{1,2}'', 5) AS UNSIGNED) * 100
+               + CAST(REGEXP_SUBSTR(REGEXP_SUBSTR(`date`, ''[0-9]{4}[^0-9]+[0-9]{1,2}[^0-9]+[0-9]{1,2}''),
+                                    ''[0-9]{1,2}$'') AS UNSIGNED))
+        ) STORED COMMENT ''评论日期整数YYYYMMDD，由date生成'';',
+        'SELECT ''date_key列已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 早期版本的idx_product_date_id建在date列上，改为建在date_key上
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+         WHERE TABLE_SCHEMA = 'curl_parser_db'
+         AND TABLE_NAME = 'comments'
+         AND INDEX_NAME = 'idx_product_date_id'
+         AND COLUMN_NAME = 'date') > 0,
+        'ALTER TABLE comments DROP INDEX idx_product_date_id;',
+        'SELECT ''无需删除旧索引'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+         WHERE TABLE_SCHEMA = 'curl_parser_db'
+         AND TABLE_NAME = 'comments'
+         AND INDEX_NAME = 'idx_product_date_id') = 0,
+        'ALTER TABLE comments ADD INDEX idx_product_date_id (product_id, date_key, id, rating, useful_count);',
+        'SELECT ''idx_product_date_id索引已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 验证分页查询使用了新索引（key列应为idx_product_date_id，Extra不应出现Using filesort）
+EXPLAIN
+SELECT id, date_key, rating FROM comments
+WHERE product_id = '933910033859'
+ORDER BY date_key DESC, id DESC
+LIMIT 20;
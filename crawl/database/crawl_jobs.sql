@@ -0,0 +1,28 @@
+-- 分布式爬取任务队列表（job_queue.py / crawl_worker.py）
+-- 多台机器上的工作进程用 SELECT ... FOR UPDATE SKIP LOCKED 领取任务（需要MySQL 8.0+），
+-- 领取后持有租约并定期续约；租约过期未续约的任务由其他工作进程重新领取，超过max_attempts次后标记为failed。
+-- active_product 只在排队和运行中时等于product_id，唯一索引保证同一商品同时最多只有一个未完成的任务。
+USE curl_parser_db;
+
+CREATE TABLE IF NOT EXISTS crawl_jobs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '任务ID',
+    product_id VARCHAR(255) NOT NULL COMMENT '商品ID',
+    params JSON NULL COMMENT '爬取参数（max_pages、page_size、incremental等，同spider_daemon.py的任务字段）',
+    status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued' COMMENT '任务状态',
+    priority INT NOT NULL DEFAULT 0 COMMENT '优先级，越大越先领取',
+    attempts INT NOT NULL DEFAULT 0 COMMENT '已领取次数，同时作为租约的版本号',
+    max_attempts INT NOT NULL DEFAULT 3 COMMENT '最多领取次数',
+    run_after DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) COMMENT '最早可领取时间（失败重试时退避）',
+    worker_id VARCHAR(128) NULL COMMENT '持有租约的工作进程（主机名:进程号）',
+    lease_expires_at DATETIME(3) NULL COMMENT '租约到期时间',
+    heartbeat_at DATETIME(3) NULL COMMENT '最近一次续约时间',
+    last_error TEXT NULL COMMENT '最近一次失败原因',
+    result JSON NULL COMMENT '执行结果摘要',
+    active_product VARCHAR(255) AS (IF(status IN ('queued', 'running'), product_id, NULL)) STORED COMMENT '未完成任务的商品ID',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    UNIQUE KEY uk_active_product (active_product),
+    KEY idx_claim (status, run_after, priority),
+    KEY idx_lease (status, lease_expires_at),
+    KEY idx_product (product_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='分布式爬取任务队列表';
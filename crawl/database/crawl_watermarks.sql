@@ -0,0 +1,13 @@
+-- 增量爬取水位线表
+-- 记录每个商品已爬取到的最新评论日期和最近评论的自然键（comment_key），
+-- 增量模式下爬虫遇到已有评论即停止翻页
+USE curl_parser_db;
+
+CREATE TABLE IF NOT EXISTS crawl_watermarks (
+    product_id VARCHAR(255) NOT NULL PRIMARY KEY COMMENT '商品ID',
+    newest_date VARCHAR(64) NOT NULL DEFAULT '' COMMENT '已爬取的最新评论日期',
+    recent_keys JSON COMMENT '最近评论的自然键列表',
+    last_new_count INT DEFAULT 0 COMMENT '最近一次爬取的新评论数',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='增量爬取水位线表';
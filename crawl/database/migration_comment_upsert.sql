@@ -0,0 +1,69 @@
+-- 为comments表添加评论自然键和内容哈希，支持按自然键幂等批量写入（upsert）
+-- comment_key = MD5(product_id|user_nick|date|content|sku_info)
+-- row_hash    = MD5(rating|useful_count|reply|pics)
+-- 计算方式与 database_reader.py 中的 comment_key / comment_row_hash 保持一致
+USE curl_parser_db;
+
+-- 添加comment_key字段
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND COLUMN_NAME = 'comment_key') = 0,
+        'ALTER TABLE comments ADD COLUMN comment_key CHAR(32) NULL COMMENT ''评论自然键'' AFTER product_id;',
+        'SELECT ''comment_key字段已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 添加row_hash字段
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND COLUMN_NAME = 'row_hash') = 0,
+        'ALTER TABLE comments ADD COLUMN row_hash CHAR(32) NULL COMMENT ''可变字段内容哈希'' AFTER comment_key;',
+        'SELECT ''row_hash字段已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 为现有记录回填自然键和内容哈希
+UPDATE comments
+SET comment_key = MD5(CONCAT_WS('|', product_id, IFNULL(user_nick, ''), IFNULL(date, ''), IFNULL(content, ''), IFNULL(sku_info, ''))),
+    row_hash = MD5(CONCAT_WS('|', IFNULL(rating, 0), IFNULL(useful_count, 0), IFNULL(reply, ''), IFNULL(pics, '[]')))
+WHERE comment_key IS NULL;
+
+-- 删除重复评论，每个自然键只保留最新的一条
+DELETE c1 FROM comments c1
+JOIN comments c2
+  ON c1.product_id = c2.product_id
+ AND c1.comment_key = c2.comment_key
+ AND c1.id < c2.id;
+
+-- 添加唯一索引
+SET @sql = (
+    SELECT IF(
+        (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS 
+         WHERE TABLE_SCHEMA = 'curl_parser_db' 
+         AND TABLE_NAME = 'comments' 
+         AND INDEX_NAME = 'uk_product_comment_key') = 0,
+        'ALTER TABLE comments ADD UNIQUE KEY uk_product_comment_key (product_id, comment_key);',
+        'SELECT ''uk_product_comment_key索引已存在'' as message;'
+    )
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 显示更新结果
+SELECT 
+    COUNT(*) as total_records,
+    COUNT(DISTINCT product_id, comment_key) as unique_comments
+FROM comments;
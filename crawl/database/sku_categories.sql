@@ -0,0 +1,87 @@
+-- SKU品类关键词表，sku_classifier.py 优先读取（未设置SKU_CATEGORIES_FILE时）
+-- 每行一个关键词及其权重，同一品类的各行product_name应一致；表为空时使用内置的 sku_categories.json
+-- 修改后最长CONFIG_CACHE_TTL秒生效（或调用DatabaseReader.invalidate_config()立即生效）
+USE curl_parser_db;
+
+CREATE TABLE IF NOT EXISTS sku_categories (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    category VARCHAR(64) NOT NULL COMMENT '品类',
+    product_name VARCHAR(255) NULL COMMENT '推断出的商品名称',
+    keyword VARCHAR(64) NOT NULL COMMENT '关键词',
+    weight DECIMAL(6,2) NOT NULL DEFAULT 1.00 COMMENT '关键词权重',
+    is_active TINYINT(1) NOT NULL DEFAULT 1 COMMENT '是否启用',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    UNIQUE KEY uk_category_keyword (category, keyword)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='SKU品类关键词表';
+
+-- 初始数据与内置的 sku_categories.json 一致
+INSERT IGNORE INTO sku_categories (category, product_name, keyword, weight) VALUES
+('打火机', '打火机商品', '打火机', 3),
+('打火机', '打火机商品', '火石', 2),
+('打火机', '打火机商品', '煤油', 2),
+('打火机', '打火机商品', '砂轮', 1.5),
+('打火机', '打火机商品', '防风', 1.5),
+('打火机', '打火机商品', '火机', 2.5),
+('打火机', '打火机商品', '拉丝', 0.5),
+('礼盒', '礼盒商品', '礼盒', 1),
+('礼盒', '礼盒商品', '礼品', 0.8),
+('礼盒', '礼盒商品', '送礼', 0.8),
+('笔记本', '笔记本商品', '笔记本', 3),
+('笔记本', '笔记本商品', '本子', 3),
+('笔记本', '笔记本商品', '记事本', 3),
+('笔记本', '笔记本商品', '手账', 2.5),
+('笔记本', '笔记本商品', '横线', 1.5),
+('笔记本', '笔记本商品', '方格', 1.5),
+('笔记本', '笔记本商品', '内页', 1.5),
+('笔记本', '笔记本商品', '活页', 2),
+('笔记本', '笔记本商品', 'A5', 1),
+('笔记本', '笔记本商品', 'B5', 1),
+('笔记本', '笔记本商品', '软皮', 1.5),
+('手机', '手机商品', '手机', 3),
+('手机', '手机商品', '全网通', 2.5),
+('手机', '手机商品', '运行内存', 2.5),
+('手机', '手机商品', '存储', 1),
+('手机', '手机商品', 'GB', 0.8),
+('手机', '手机商品', '5G', 1),
+('手机', '手机商品', '合约版', 2.5),
+('服装', '服装商品', '衣服', 3),
+('服装', '服装商品', '服装', 3),
+('服装', '服装商品', '上衣', 2.5),
+('服装', '服装商品', 'T恤', 2.5),
+('服装', '服装商品', '卫衣', 2.5),
+('服装', '服装商品', '外套', 2.5),
+('服装', '服装商品', '衬衫', 2.5),
+('服装', '服装商品', '尺码', 0.8),
+('服装', '服装商品', 'XL', 1),
+('服装', '服装商品', 'M码', 1),
+('服装', '服装商品', '裤子', 2.5),
+('服装', '服装商品', '牛仔裤', 3),
+('服装', '服装商品', '短裤', 2.5),
+('服装', '服装商品', '长裤', 2.5),
+('鞋类', '鞋类商品', '鞋子', 3),
+('鞋类', '鞋类商品', '运动鞋', 3),
+('鞋类', '鞋类商品', '板鞋', 3),
+('鞋类', '鞋类商品', '鞋码', 3),
+('鞋类', '鞋类商品', '码数', 1),
+('鞋类', '鞋类商品', '皮鞋', 3),
+('鞋类', '鞋类商品', '拖鞋', 3),
+('鞋类', '鞋类商品', '帆布鞋', 3),
+('包类', '包类商品', '背包', 3),
+('包类', '包类商品', '双肩包', 3),
+('包类', '包类商品', '挎包', 3),
+('包类', '包类商品', '手提包', 3),
+('包类', '包类商品', '钱包', 3),
+('包类', '包类商品', '书包', 3),
+('包类', '包类商品', '内里', 1.5),
+('鼠标', '鼠标商品', '鼠标', 3),
+('鼠标', '鼠标商品', '无线', 1),
+('鼠标', '鼠标商品', '蓝牙', 1),
+('鼠标', '鼠标商品', '静音', 1),
+('鼠标', '鼠标商品', 'DPI', 2),
+('鼠标', '鼠标商品', '有线', 1),
+('纸巾', '纸巾商品', '纸巾', 3),
+('纸巾', '纸巾商品', '抽纸', 3),
+('纸巾', '纸巾商品', '面巾纸', 3),
+('纸巾', '纸巾商品', '卷纸', 3),
+('纸巾', '纸巾商品', '大包', 1);
@@ -1,17 +1,123 @@
 #!/usr/bin/env python3
 """
 数据库读取模块 - 用于Python爬虫脚本直接读取数据库配置
+mysql.connector在创建DatabaseReader时才导入，只用到comment_key等键计算函数（快照、水位线）
+或USE_DATABASE=false时不加载数据库驱动。
 """
 
-import mysql.connector
+import hashlib
 import json
 import os
-from typing import Dict, List, Optional
+import re
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from metrics import metrics
+from ttl_cache import TTLCache
+
+
+def comment_key(product_id: str, comment: Dict) -> str:
+    """评论的自然键：同一商品下由用户、日期、内容和SKU唯一确定"""
+    parts = (
+        str(product_id),
+        comment.get('user_nick', '') or '',
+        comment.get('date', '') or '',
+        comment.get('content', '') or '',
+        comment.get('sku_info', '') or ''
+    )
+    return hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+_DATE_PATTERN = re.compile(r'(\d{4})\D+(\d{1,2})\D+(\d{1,2})')
+
+
+def date_key(date_str: str) -> int:
+    """把"2025年9月6日"或"2025-09-06"转换为可比较的整数20250906，无法解析时返回0"""
+    match = _DATE_PATTERN.search(date_str or '')
+    if not match:
+        return 0
+    year, month, day = match.groups()
+    return int(year) * 10000 + int(month) * 100 + int(day)
+
+
+def comment_row_hash(comment: Dict) -> str:
+    """评论可变字段（评分、点赞、回复、图片）的哈希，用于判断是否需要更新"""
+    parts = (
+        str(comment.get('rating', 0)),
+        str(comment.get('useful_count', 0)),
+        comment.get('reply', '') or '',
+        json.dumps(comment.get('pics', []), ensure_ascii=False)
+    )
+    return hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _has_pics(pics) -> bool:
+    """评论是否带图：pics可以是列表，也可以是数据库中的JSON字符串"""
+    if isinstance(pics, str):
+        return pics not in ('', '[]')
+    return bool(pics)
+
+
+def aggregate_buckets(rating, date: str, sku_info: str):
+    """评论计入的聚合桶: (维度, 桶)列表，维度为total/rating/sku/day"""
+    key = date_key(date)
+    day = f"{key // 10000:04d}-{key // 100 % 100:02d}-{key % 100:02d}" if key else ''
+    return (
+        ('total', ''),
+        ('rating', str(int(rating or 0))),
+        ('sku', (sku_info or '')[:255]),
+        ('day', day)
+    )
+
+
+def add_aggregate_delta(deltas: Dict, sign: int, rating, date: str, sku_info: str, pics) -> None:
+    """把一条评论的增减（sign为1或-1）累加到deltas: {(维度, 桶): [评论数, 带图数, 评分和]}"""
+    with_pics = sign if _has_pics(pics) else 0
+    rating_value = sign * int(rating or 0)
+    for bucket in aggregate_buckets(rating, date, sku_info):
+        delta = deltas.get(bucket)
+        if delta is None:
+            delta = deltas[bucket] = [0, 0, 0]
+        delta[0] += sign
+        delta[1] += with_pics
+        delta[2] += rating_value
+
+
+def sentiment_values(sentiment: Optional[Dict]) -> Tuple:
+    """把评论的sentiment字段转换为SENTIMENT_COLUMNS对应的列值，未打分时全部为None"""
+    if not sentiment:
+        return (None, None, None, None, None)
+    return (
+        sentiment.get('label'),
+        sentiment.get('score'),
+        sentiment.get('confidence'),
+        int(bool(sentiment.get('ambiguous'))),
+        json.dumps(sentiment.get('keywords', []), ensure_ascii=False)
+    )
+
+
+# upsert_comments写入的comments字段
+COMMENT_WRITE_COLUMNS = ('product_id', 'comment_key', 'row_hash', 'user_nick', 'content', 'rating', 'date',
+                         'useful_count', 'reply', 'sku_info', 'pics')
+# 本地情感打分结果的列（见database/comment_sentiment.sql）
+SENTIMENT_COLUMNS = ('sentiment_label', 'sentiment_score', 'sentiment_confidence', 'sentiment_ambiguous',
+                     'keywords')
+
+# 已保存评论图片的引用列（见database/comment_images.sql）
+IMAGE_COLUMN = 'images'
+
+# 可按列投影读取的comments字段
+COMMENT_COLUMNS = ('id', 'product_id', 'comment_key', 'user_nick', 'content', 'rating', 'date',
+                   'useful_count', 'reply', 'sku_info', 'pics', 'created_at') + SENTIMENT_COLUMNS + (IMAGE_COLUMN,)
+
 
 class DatabaseReader:
     """数据库读取器"""
     
-    def __init__(self):
+    def __init__(self, pool_size: Optional[int] = None):
+        import mysql.connector.pooling
+        
         self.db_config = {
             'host': 'localhost',
             'user': 'huangkaihao',
@@ -20,72 +126,189 @@ class DatabaseReader:
             'charset': 'utf8mb4',
             'autocommit': True
         }
+        # 批量写入评论时每条INSERT语句包含的行数
+        self.chunk_size = int(os.getenv('DB_CHUNK_SIZE', '500'))
+        # 写入评论时在同一事务中维护comment_aggregates聚合表（需先执行database/comment_aggregates.sql，未执行时自动关闭）
+        self.maintain_aggregates = os.getenv('DB_AGGREGATES', 'true').lower() == 'true'
+        # 写入评论时一并保存本地情感打分结果（需先执行database/comment_sentiment.sql，未执行时自动关闭）
+        self.store_sentiment = os.getenv('DB_SENTIMENT', 'true').lower() == 'true'
+        # 评论带有图片引用（image_store.py）时写入images列（需先执行database/comment_images.sql）
+        self.store_images = os.getenv('DB_IMAGES', 'true').lower() == 'true'
+        
+        # 连接池在第一次获取连接时创建，连接用完close()即归还到池中
+        pool_size = pool_size or int(os.getenv('DB_POOL_SIZE', '5'))
+        self.pool_size = max(1, min(pool_size, mysql.connector.pooling.CNX_POOL_MAXSIZE))
+        self.pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # 键集分页的排序列：date_key为database/comments_read_indexes.sql添加的日期整数生成列，
+        # 未执行该迁移时退回按date字符串排序（"2024年9月"会排在"2024年10月"之后）
+        self.date_order = 'date_key'
+        # 可选迁移是否已执行，第一次读写评论时检查一次
+        self._schema_checked = False
+        self._schema_lock = threading.Lock()
+        
+        # 已解析的爬虫配置缓存
+        self.config_cache = TTLCache(
+            maxsize=int(os.getenv('CONFIG_CACHE_SIZE', '1024')),
+            ttl=float(os.getenv('CONFIG_CACHE_TTL', '300'))
+        )
+    
+    def _get_pool(self):
+        """获取（必要时创建）连接池"""
+        if self._pool is None:
+            import mysql.connector.pooling
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = mysql.connector.pooling.MySQLConnectionPool(
+                        pool_name=f"spider_pool_{id(self)}",
+                        pool_size=self.pool_size,
+                        **self.db_config
+                    )
+        return self._pool
     
     def get_connection(self):
-        """获取数据库连接"""
-        return mysql.connector.connect(**self.db_config)
+        """从连接池获取数据库连接，池中连接耗尽时等待其他线程归还"""
+        import mysql.connector.errors
+        
+        pool = self._get_pool()
+        deadline = time.monotonic() + self.pool_timeout
+        while True:
+            try:
+                return pool.get_connection()
+            except mysql.connector.errors.PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+    
+    def _check_schema(self):
+        """第一次读写评论前检查一次可选迁移是否已执行，缺少对应的列或表时关闭该功能并给出提示"""
+        if self._schema_checked:
+            return
+        with self._schema_lock:
+            if self._schema_checked:
+                return
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                               "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'comments'")
+                columns = {row[0].lower() for row in cursor.fetchall()}
+                cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES "
+                               "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'comment_aggregates'")
+                has_aggregates = cursor.fetchone()[0] > 0
+                cursor.close()
+            if self.maintain_aggregates and not has_aggregates:
+                # 聚合增量与评论在同一事务中写入，缺表会让整块评论回滚
+                self.maintain_aggregates = False
+                print("⚠️ 缺少comment_aggregates表（未执行database/comment_aggregates.sql），写入评论时不维护聚合统计")
+            if 'date_key' not in columns:
+                self.date_order = 'date'
+                print("⚠️ comments表缺少date_key列（未执行database/comments_read_indexes.sql），评论按日期字符串排序，顺序可能不准确")
+            if self.store_sentiment and not set(SENTIMENT_COLUMNS) <= columns:
+                self.store_sentiment = False
+                print("⚠️ comments表缺少情感列（未执行database/comment_sentiment.sql），情感打分结果不写入数据库")
+            self._schema_checked = True
+    
+    def invalidate_config(self, product_id: Optional[str] = None):
+        """使缓存的爬虫配置失效，product_id为None时清空全部"""
+        self.config_cache.invalidate(None if product_id is None else str(product_id))
     
     def get_spider_config_by_product_id(self, product_id: str) -> Optional[Dict]:
-        """根据商品ID获取爬虫配置"""
+        """根据商品ID获取爬虫配置（优先读取缓存）"""
+        cached = self.config_cache.get(str(product_id))
+        if cached is not None:
+            return dict(cached)
+        
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            query = """
-            SELECT sc.*, cp.url, cp.method, cp.headers, cp.query_params
-            FROM spider_configs sc 
-            LEFT JOIN curl_parses cp ON sc.curl_parse_id = cp.id 
-            WHERE sc.product_id = %s 
-            ORDER BY sc.created_at DESC 
-            LIMIT 1
-            """
-            
-            cursor.execute(query, (product_id,))
-            result = cursor.fetchone()
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                
+                query = """
+                SELECT sc.*, cp.url, cp.method, cp.headers, cp.query_params
+                FROM spider_configs sc 
+                LEFT JOIN curl_parses cp ON sc.curl_parse_id = cp.id 
+                WHERE sc.product_id = %s 
+                ORDER BY sc.created_at DESC 
+                LIMIT 1
+                """
+                
+                cursor.execute(query, (product_id,))
+                result = cursor.fetchone()
+                
+                if result:
+                    # 解析JSON字段
+                    if result.get('headers'):
+                        result['headers'] = json.loads(result['headers'])
+                    if result.get('query_params'):
+                        result['query_params'] = json.loads(result['query_params'])
+                
+                cursor.close()
             
             if result:
-                # 解析JSON字段
-                if result.get('headers'):
-                    result['headers'] = json.loads(result['headers'])
-                if result.get('query_params'):
-                    result['query_params'] = json.loads(result['query_params'])
-            
-            cursor.close()
-            conn.close()
-            
+                self.config_cache.set(str(product_id), result)
+                return dict(result)
             return result
             
         except Exception as e:
             print(f"❌ 数据库读取失败: {e}")
             return None
     
+    def get_sku_categories(self) -> List[Dict]:
+        """读取SKU品类关键词配置（sku_categories表），表不存在或为空时返回空列表；结果随配置缓存过期"""
+        cached = self.config_cache.get('__sku_categories__')
+        if cached is not None:
+            return cached
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(
+                    "SELECT category, product_name, keyword, weight FROM sku_categories "
+                    "WHERE is_active = 1 ORDER BY category, keyword"
+                )
+                rows = cursor.fetchall()
+                cursor.close()
+        except Exception as e:
+            print(f"⚠️ 读取SKU品类配置失败，使用内置配置: {e}")
+            rows = []
+        
+        self.config_cache.set('__sku_categories__', rows)
+        return rows
+    
     def get_all_spider_configs(self) -> List[Dict]:
         """获取所有爬虫配置"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            query = """
-            SELECT sc.*, cp.url, cp.method, cp.headers, cp.query_params, cp.api_params
-            FROM spider_configs sc 
-            LEFT JOIN curl_parses cp ON sc.curl_parse_id = cp.id 
-            ORDER BY sc.created_at DESC
-            """
-            
-            cursor.execute(query)
-            results = cursor.fetchall()
-            
-            # 解析JSON字段
-            for result in results:
-                if result.get('headers'):
-                    result['headers'] = json.loads(result['headers'])
-                if result.get('query_params'):
-                    result['query_params'] = json.loads(result['query_params'])
-                if result.get('api_params'):
-                    result['api_params'] = json.loads(result['api_params'])
-            
-            cursor.close()
-            conn.close()
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                
+                query = """
+                SELECT sc.*, cp.url, cp.method, cp.headers, cp.query_params, cp.api_params
+                FROM spider_configs sc 
+                LEFT JOIN curl_parses cp ON sc.curl_parse_id = cp.id 
+                ORDER BY sc.created_at DESC
+                """
+                
+                cursor.execute(query)
+                results = cursor.fetchall()
+                
+                # 解析JSON字段
+                for result in results:
+                    if result.get('headers'):
+                        result['headers'] = json.loads(result['headers'])
+                    if result.get('query_params'):
+                        result['query_params'] = json.loads(result['query_params'])
+                    if result.get('api_params'):
+                        result['api_params'] = json.loads(result['api_params'])
+                
+                # 顺便填充缓存，结果按创建时间倒序，每个商品取第一条即最新配置
+                seen = set()
+                for result in results:
+                    product_id = str(result.get('product_id'))
+                    if product_id not in seen:
+                        seen.add(product_id)
+                        self.config_cache.set(product_id, dict(result))
+                
+                cursor.close()
             
             return results
             
@@ -93,70 +316,404 @@ class DatabaseReader:
             print(f"❌ 数据库读取失败: {e}")
             return []
     
-    def save_comments(self, product_id: str, comments: List[Dict]) -> bool:
-        """保存评论数据到数据库"""
+    def save_comments(self, product_id: str, comments: List[Dict], chunk_size: Optional[int] = None) -> bool:
+        """保存评论数据到数据库（按评论自然键幂等写入，不再先删除旧评论）"""
+        product_label = str(product_id)
+        with metrics.timer('db_save_comments_seconds', product=product_label):
+            counts = self.upsert_comments(product_id, comments, chunk_size)
+        if counts is None:
+            metrics.inc('db_save_errors_total', product=product_label)
+            return False
+        for result, count in counts.items():
+            metrics.inc('db_comments_written_total', count, product=product_label, result=result)
+        return True
+    
+    def upsert_comments(self, product_id: str, comments: List[Dict],
+                        chunk_size: Optional[int] = None) -> Optional[Dict[str, int]]:
+        """分块批量写入评论，按(product_id, comment_key)去重更新
+        
+        每块在一个事务中完成：锁定并读取已存在评论，写入新增和变化的评论，按增量更新comment_aggregates。
+        返回 {'inserted': 新增数, 'updated': 更新数, 'unchanged': 未变化数}，失败时返回None
+        """
+        chunk_size = chunk_size or self.chunk_size
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        
+        # 计算自然键和内容哈希，同一批次内重复的评论以最后一条为准
+        rows = {}
+        for comment in comments:
+            key = comment_key(product_id, comment)
+            rows[key] = (key, comment_row_hash(comment), comment)
+        rows = list(rows.values())
+        
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            self._check_schema()
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                for start in range(0, len(rows), chunk_size):
+                    chunk = rows[start:start + chunk_size]
+                    conn.start_transaction()
+                    try:
+                        self._upsert_chunk(cursor, product_id, chunk, counts)
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                
+                cursor.close()
             
-            # 先删除该商品的旧评论
-            cursor.execute("DELETE FROM comments WHERE product_id = %s", (product_id,))
+            print(f"✅ 成功保存 {len(rows)} 条评论到数据库"
+                  f"（新增 {counts['inserted']}，更新 {counts['updated']}，未变化 {counts['unchanged']}）")
+            return counts
             
-            # 插入新评论
-            insert_query = """
-            INSERT INTO comments (product_id, user_nick, content, rating, date, useful_count, reply, sku_info, pics)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            for comment in comments:
-                cursor.execute(insert_query, (
-                    product_id,
-                    comment.get('user_nick', ''),
-                    comment.get('content', ''),
-                    comment.get('rating', 0),
-                    comment.get('date', ''),
-                    comment.get('useful_count', 0),
-                    comment.get('reply', ''),
-                    comment.get('sku_info', ''),
-                    json.dumps(comment.get('pics', []), ensure_ascii=False)
-                ))
+        except Exception as e:
+            print(f"❌ 保存评论数据失败: {e}")
+            return None
+    
+    def _upsert_chunk(self, cursor, product_id: str, chunk: List, counts: Dict[str, int]):
+        """在当前事务中写入一块评论，并把新增/变化带来的聚合增量写入comment_aggregates"""
+        # 一次查询取回本块已存在评论的内容哈希和旧的可变字段，加锁避免并发写入重复计数；
+        # 本块带有图片引用时一并查询images是否为空，未变化的评论也要补写首次拿到的图片引用
+        with_images = self.store_images and any(comment.get('images') for _, _, comment in chunk)
+        key_placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(
+            f"SELECT comment_key, row_hash, rating, pics{', images IS NULL' if with_images else ''} FROM comments "
+            f"WHERE product_id = %s AND comment_key IN ({key_placeholders}) FOR UPDATE",
+            [product_id] + [key for key, _, _ in chunk]
+        )
+        existing = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+        
+        pending = []
+        deltas = {}
+        for key, row_hash, comment in chunk:
+            old = existing.get(key)
+            if old is None:
+                counts['inserted'] += 1
+            elif old[0] != row_hash:
+                counts['updated'] += 1
+                # sku_info和date属于自然键，更新时不变；评分和图片可能变化
+                add_aggregate_delta(deltas, -1, old[1], comment.get('date', ''), comment.get('sku_info', ''), old[2])
+            else:
+                counts['unchanged'] += 1
+                if with_images and old[3] and comment.get('images'):
+                    pending.append((key, row_hash, comment))
+                continue
+            add_aggregate_delta(deltas, 1, comment.get('rating', 0), comment.get('date', ''),
+                                comment.get('sku_info', ''), comment.get('pics', []))
+            pending.append((key, row_hash, comment))
+        
+        if not pending:
+            return
+                
+        # 多行INSERT，已存在的评论只更新可变字段
+        columns = (COMMENT_WRITE_COLUMNS + (SENTIMENT_COLUMNS if self.store_sentiment else ())
+                   + ((IMAGE_COLUMN,) if with_images else ()))
+        values = []
+        for key, row_hash, comment in pending:
+            values.extend((
+                product_id,
+                key,
+                row_hash,
+                comment.get('user_nick', ''),
+                comment.get('content', ''),
+                comment.get('rating', 0),
+                comment.get('date', ''),
+                comment.get('useful_count', 0),
+                comment.get('reply', ''),
+                comment.get('sku_info', ''),
+                json.dumps(comment.get('pics', []), ensure_ascii=False)
+            ))
+            if self.store_sentiment:
+                values.extend(sentiment_values(comment.get('sentiment')))
+            if with_images:
+                images = comment.get('images')
+                values.append(json.dumps(images, ensure_ascii=False) if images is not None else None)
+        row_placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(pending))
+        updates = ''
+        if self.store_sentiment:
+            # 未打分的评论（未开启LOCAL_SENTIMENT）不覆盖已有的分数
+            updates = ''.join(f",\n            {column} = COALESCE(VALUES({column}), {column})"
+                              for column in SENTIMENT_COLUMNS)
+        if with_images:
+            updates += f",\n            {IMAGE_COLUMN} = COALESCE(VALUES({IMAGE_COLUMN}), {IMAGE_COLUMN})"
+        cursor.execute(f"""
+        INSERT INTO comments ({', '.join(columns)})
+        VALUES {row_placeholders}
+        ON DUPLICATE KEY UPDATE
+            row_hash = VALUES(row_hash),
+            rating = VALUES(rating),
+            useful_count = VALUES(useful_count),
+            reply = VALUES(reply),
+            pics = VALUES(pics){updates}
+        """, values)
+        
+        if self.maintain_aggregates:
+            self._apply_aggregate_deltas(cursor, product_id, deltas)
+    
+    def _apply_aggregate_deltas(self, cursor, product_id: str, deltas: Dict):
+        """把聚合增量累加到comment_aggregates（多行INSERT ... ON DUPLICATE KEY UPDATE）"""
+        values = []
+        for (dimension, bucket), (count, with_pics, rating_sum) in deltas.items():
+            if count or with_pics or rating_sum:
+                values.extend((product_id, dimension, bucket, count, with_pics, rating_sum))
+        if not values:
+            return
+        row_placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * (len(values) // 6))
+        cursor.execute(f"""
+        INSERT INTO comment_aggregates (product_id, dimension, bucket, comment_count, pic_count, rating_sum)
+        VALUES {row_placeholders}
+        ON DUPLICATE KEY UPDATE
+            comment_count = comment_count + VALUES(comment_count),
+            pic_count = pic_count + VALUES(pic_count),
+            rating_sum = rating_sum + VALUES(rating_sum)
+        """, values)
+    
+    def get_watermark(self, product_id: str) -> Optional[Dict]:
+        """获取商品的增量爬取水位线"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(
+                    "SELECT newest_date, recent_keys FROM crawl_watermarks WHERE product_id = %s",
+                    (product_id,)
+                )
+                result = cursor.fetchone()
+                cursor.close()
             
-            conn.commit()
-            cursor.close()
-            conn.close()
+            if result and result.get('recent_keys'):
+                result['recent_keys'] = json.loads(result['recent_keys'])
+            return result
             
-            print(f"✅ 成功保存 {len(comments)} 条评论到数据库")
+        except Exception as e:
+            print(f"❌ 获取水位线失败: {e}")
+            return None
+    
+    def save_watermark(self, product_id: str, newest_date: str, recent_keys: List[str], new_count: int = 0) -> bool:
+        """保存商品的增量爬取水位线"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                INSERT INTO crawl_watermarks (product_id, newest_date, recent_keys, last_new_count)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    newest_date = VALUES(newest_date),
+                    recent_keys = VALUES(recent_keys),
+                    last_new_count = VALUES(last_new_count)
+                """, (product_id, newest_date, json.dumps(recent_keys), new_count))
+                conn.commit()
+                cursor.close()
             return True
             
         except Exception as e:
-            print(f"❌ 保存评论数据失败: {e}")
+            print(f"❌ 保存水位线失败: {e}")
             return False
     
-    def get_comments_by_product_id(self, product_id: str) -> List[Dict]:
-        """根据商品ID获取评论数据"""
+    def _projection(self, columns: Optional[Iterable[str]]) -> Optional[List[str]]:
+        """校验并补全要读取的列，键集分页需要的date和id总是包含在内；未指定时返回None表示全部列"""
+        if not columns:
+            return None
+        unknown = [column for column in columns if column not in COMMENT_COLUMNS]
+        if unknown:
+            raise ValueError(f"未知的评论列: {', '.join(unknown)}")
+        selected = list(dict.fromkeys(columns))
+        for column in ('date', 'id'):
+            if column not in selected:
+                selected.append(column)
+        return selected
+    
+    def get_comments_page(self, product_id: str, limit: int = 20, after: Optional[Tuple] = None,
+                          columns: Optional[Iterable[str]] = None) -> Tuple[List[Dict], Optional[Tuple]]:
+        """按评论日期从新到旧（同一天按id倒序）读取一页评论，返回(评论列表, 下一页游标)
+        
+        after为上一页返回的游标(日期整数date_key, id)，None表示第一页；没有更多数据时下一页游标为None。
+        date列是未补零的字符串（"2024年9月6日"），按date_key（20240906）排序才是时间顺序。
+        columns为要读取的列（默认全部）。查询沿idx_product_date_id索引做范围扫描，
+        只读取limit行，耗时与商品评论总数无关；只投影索引内的列时为仅索引查询。
+        """
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            query = "SELECT * FROM comments WHERE product_id = %s ORDER BY date DESC"
-            cursor.execute(query, (product_id,))
-            results = cursor.fetchall()
-            
-            # 解析pics字段
-            for result in results:
-                if result.get('pics'):
-                    result['pics'] = json.loads(result['pics'])
-                else:
-                    result['pics'] = []
-            
-            cursor.close()
-            conn.close()
-            
-            return results
-            
+            self._check_schema()
+        except Exception as e:
+            print(f"❌ 获取评论数据失败: {e}")
+            return [], None
+        order = self.date_order
+        selected = self._projection(columns)
+        if selected is not None and order not in selected:
+            selected.append(order)
+        where = "product_id = %s"
+        params = [product_id]
+        if after:
+            where += f" AND ({order} < %s OR ({order} = %s AND id < %s))"
+            params += [after[0], after[0], after[1]]
+        params.append(int(limit))
+        select = ', '.join(f'`{column}`' for column in selected) if selected else '*'
+        query = f"SELECT {select} FROM comments WHERE {where} ORDER BY {order} DESC, id DESC LIMIT %s"
+        try:
+            with self.get_connection() as conn:
+                # 非缓冲游标：行从服务端直接流式读取，LIMIT保证每页只有limit行
+                cursor = conn.cursor(dictionary=True, buffered=False)
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                cursor.close()
         except Exception as e:
             print(f"❌ 获取评论数据失败: {e}")
+            return [], None
+        
+        if selected is None or 'pics' in selected:
+            for row in rows:
+                row['pics'] = json.loads(row['pics']) if row.get('pics') else []
+        if (selected is None and self.store_sentiment) or (selected and 'keywords' in selected):
+            for row in rows:
+                row['keywords'] = json.loads(row['keywords']) if row.get('keywords') else []
+        for row in rows:
+            if isinstance(row.get(IMAGE_COLUMN), str):
+                row[IMAGE_COLUMN] = json.loads(row[IMAGE_COLUMN])
+        next_cursor = (rows[-1][order], rows[-1]['id']) if rows and len(rows) == limit else None
+        return rows, next_cursor
+    
+    def iter_comments(self, product_id: str, columns: Optional[Iterable[str]] = None,
+                      batch_size: Optional[int] = None, after: Optional[Tuple] = None) -> Iterator[Dict]:
+        """逐条产出商品的评论（按日期、id倒序），内部按batch_size行一页做键集分页
+        
+        每页单独借用并归还连接，调用方处理速度慢或中途停止都不会占住连接，内存占用只与batch_size有关。
+        """
+        batch_size = batch_size or self.chunk_size
+        cursor = after
+        while True:
+            rows, cursor = self.get_comments_page(product_id, batch_size, cursor, columns)
+            yield from rows
+            if cursor is None:
+                return
+    
+    def get_comments_by_product_id(self, product_id: str, columns: Optional[Iterable[str]] = None,
+                                   limit: Optional[int] = None) -> List[Dict]:
+        """根据商品ID获取评论数据（按日期、id倒序），limit限制条数，columns限制读取的列"""
+        if limit:
+            rows, _ = self.get_comments_page(product_id, limit, columns=columns)
+            return rows
+        return list(self.iter_comments(product_id, columns))
+    
+    def update_comment_sentiment(self, comments: List[Dict], scorer) -> int:
+        """对带id和content的评论行打分并按id写回情感列，返回更新的条数"""
+        if not comments:
+            return 0
+        scorer.annotate(comments)
+        assignments = ', '.join(f"{column} = %s" for column in SENTIMENT_COLUMNS)
+        params = [sentiment_values(comment['sentiment']) + (comment['id'],) for comment in comments]
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(f"UPDATE comments SET {assignments} WHERE id = %s", params)
+            conn.commit()
+            cursor.close()
+        return len(comments)
+    
+    def get_ambiguous_comments(self, product_id: str, limit: int = 100,
+                               columns: Optional[Iterable[str]] = None) -> List[Dict]:
+        """读取本地打分标记为需要复核、且尚无远程分析结果的评论，供远程AI情感分析使用"""
+        selected = self._projection(columns) or list(COMMENT_COLUMNS)
+        select = ', '.join(f'`{column}`' for column in selected)
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(
+                    f"SELECT {select} FROM comments WHERE product_id = %s AND sentiment_ambiguous = 1 "
+                    f"AND analysis IS NULL ORDER BY id DESC LIMIT %s",
+                    (product_id, int(limit))
+                )
+                rows = cursor.fetchall()
+                cursor.close()
+        except Exception as e:
+            print(f"❌ 获取待复核评论失败: {e}")
             return []
+        for row in rows:
+            if 'pics' in row:
+                row['pics'] = json.loads(row['pics']) if row.get('pics') else []
+            if 'keywords' in row:
+                row['keywords'] = json.loads(row['keywords']) if row.get('keywords') else []
+        return rows
+    
+    def get_comment_aggregates(self, product_id: str) -> Optional[Dict]:
+        """读取商品的预计算聚合：总数、带图占比、平均评分、评分分布、各SKU和每日统计
+        
+        只读取comment_aggregates中该商品的行（按主键范围扫描），耗时与评论总数无关。
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT dimension, bucket, comment_count, pic_count, rating_sum "
+                    "FROM comment_aggregates WHERE product_id = %s",
+                    (product_id,)
+                )
+                rows = cursor.fetchall()
+                cursor.close()
+        except Exception as e:
+            print(f"❌ 获取评论聚合失败: {e}")
+            return None
+        
+        def summary(count, with_pics, rating_sum):
+            return {
+                'comments': count,
+                'with_pics': with_pics,
+                'pic_ratio': round(with_pics / count, 4) if count else 0.0,
+                'avg_rating': round(rating_sum / count, 2) if count else 0.0
+            }
+        
+        result = {'product_id': product_id, 'total': summary(0, 0, 0), 'ratings': {}, 'skus': [], 'daily': []}
+        for dimension, bucket, count, with_pics, rating_sum in rows:
+            if count <= 0:
+                continue
+            if dimension == 'total':
+                result['total'] = summary(count, with_pics, rating_sum)
+            elif dimension == 'rating':
+                result['ratings'][int(bucket)] = count
+            elif dimension == 'sku':
+                result['skus'].append(dict(sku_info=bucket, **summary(count, with_pics, rating_sum)))
+            elif dimension == 'day':
+                result['daily'].append(dict(date=bucket, **summary(count, with_pics, rating_sum)))
+        result['skus'].sort(key=lambda item: item['comments'], reverse=True)
+        result['daily'].sort(key=lambda item: item['date'])
+        return result
+    
+    def rebuild_aggregates(self, product_id: Optional[str] = None) -> Dict[str, int]:
+        """按comments表全量重算聚合（回填或修复），product_id为None时处理全部商品
+        
+        评论按键集分页流式读取，每个商品的旧聚合在一个事务中替换。返回{商品ID: 评论数}。
+        """
+        if product_id:
+            product_ids = [product_id]
+        else:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT DISTINCT product_id FROM comments")
+                product_ids = [row[0] for row in cursor.fetchall()]
+                cursor.close()
+        
+        rebuilt = {}
+        for pid in product_ids:
+            deltas = {}
+            count = 0
+            for comment in self.iter_comments(pid, ['rating', 'date', 'sku_info', 'pics']):
+                add_aggregate_delta(deltas, 1, comment.get('rating'), comment.get('date'),
+                                    comment.get('sku_info'), comment.get('pics'))
+                count += 1
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                conn.start_transaction()
+                try:
+                    cursor.execute("DELETE FROM comment_aggregates WHERE product_id = %s", (pid,))
+                    items = list(deltas.items())
+                    for start in range(0, len(items), self.chunk_size):
+                        self._apply_aggregate_deltas(cursor, pid, dict(items[start:start + self.chunk_size]))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+            rebuilt[pid] = count
+            print(f"📊 {pid}: {count} 条评论，{len(deltas)} 个聚合桶")
+        return rebuilt
 
 
 # 测试函数
@@ -176,8 +733,19 @@ def test_database_connection():
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='数据库模块')
+    subparsers = parser.add_subparsers(dest='command')
+    backfill_parser = subparsers.add_parser('backfill-aggregates', help='按comments表重算comment_aggregates')
+    backfill_parser.add_argument('--product-id', help='只重算指定商品，默认全部商品')
+    args = parser.parse_args()
+    
+    if args.command == 'backfill-aggregates':
+        rebuilt = DatabaseReader().rebuild_aggregates(args.product_id)
+        print(f"✅ 聚合回填完成: {len(rebuilt)} 个商品，{sum(rebuilt.values())} 条评论")
     # 测试数据库连接
-    if test_database_connection():
+    elif test_database_connection():
         print("数据库模块测试通过")
     else:
         print("数据库模块测试失败")
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+评论图片存储 - 规范化评论图片URL，按主机限制并发下载，按内容哈希只保存一份，缩略图按需生成
+使用方法:
+    python3 image_store.py fetch 842926327290           # 下载快照中某商品评论的图片
+    python3 image_store.py thumb <图片键> [--size 200]   # 生成（或取出已有的）缩略图
+    python3 image_store.py stats
+
+目录结构（IMAGE_DIR，默认output/images）:
+    objects/ab/<sha256>.jpg      原图，按内容哈希命名，相同内容只保存一份
+    thumbs/<尺寸>/ab/<sha256>.jpg 缩略图，第一次请求时才生成（需要可选依赖Pillow）
+    urls.tsv                     URL到图片键的只追加索引，已下载过的URL不会再次请求
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+
+DEFAULT_IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output', 'images')
+
+# 阿里CDN在原图URL后追加的尺寸/格式后缀，如 xxx.jpg_400x400.jpg、xxx.jpg_.webp
+_CDN_SUFFIX = re.compile(r'(\.(?:jpe?g|png|gif|webp))_[^/]*$', re.IGNORECASE)
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+def pil_image():
+    """按需导入Pillow的Image模块（导入较慢，只在生成缩略图时需要），未安装时返回None"""
+    try:
+        from PIL import Image
+    except ImportError:  # Pillow为可选依赖，未安装时不生成缩略图
+        return None
+    return Image
+
+
+def normalize_image_url(url: str, scheme: str = 'https') -> str:
+    """把协议相对的//img.alicdn.com/...补全为完整URL，并去掉CDN尺寸后缀，无效URL返回空字符串"""
+    url = (url or '').strip()
+    if not url:
+        return ''
+    if url.startswith('//'):
+        url = f"{scheme}:{url}"
+    elif not urllib.parse.urlsplit(url).scheme:
+        url = f"{scheme}://{url.lstrip('/')}"
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+        return ''
+    path = _CDN_SUFFIX.sub(r'\1', parsed.path)
+    return urllib.parse.urlunsplit((parsed.scheme, parsed.netloc.lower(), path, parsed.query, ''))
+
+
+def _image_ext(data: bytes, url: str) -> str:
+    """按文件头判断图片格式，无法识别时按URL扩展名"""
+    for signature, ext in _SIGNATURES:
+        if data.startswith(signature):
+            return ext
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    ext = os.path.splitext(urllib.parse.urlsplit(url).path)[1].lower().lstrip('.')
+    return 'jpg' if ext == 'jpeg' else (ext or 'bin')
+
+
+class ImageStore:
+    """按内容哈希保存图片的目录，维护URL到图片键（<sha256>.<扩展名>）的索引"""
+
+    def __init__(self, directory: str = DEFAULT_IMAGE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'urls.tsv')
+        self._lock = threading.Lock()
+        self._urls = {}
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    url, _, key = line.rstrip('\n').partition('\t')
+                    if url and key:
+                        self._urls[url] = key
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, 'objects', key[:2], key)
+
+    def lookup(self, url: str) -> Optional[str]:
+        """已下载过的URL对应的图片键，文件被删除时视为未下载"""
+        key = self._urls.get(url)
+        if key and os.path.exists(self.path(key)):
+            return key
+        return None
+
+    def put(self, url: str, data: bytes) -> str:
+        """保存图片内容并记录URL，返回图片键；内容已存在时只记录URL"""
+        key = f"{hashlib.sha256(data).hexdigest()}.{_image_ext(data, url)}"
+        path = self.path(key)
+        created = False
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，并发下载同一内容时不会读到半个文件
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            created = True
+        with self._lock:
+            if self._urls.get(url) != key:
+                self._urls[url] = key
+                with open(self.index_path, 'a', encoding='utf-8') as f:
+                    f.write(f"{url}\t{key}\n")
+        metrics.inc('image_store_objects_total' if created else 'image_store_dedup_total')
+        return key
+
+    def thumbnail(self, key: str, size: int = 200) -> Optional[str]:
+        """返回图片的缩略图路径，第一次请求时生成；未安装Pillow或原图不存在时返回None"""
+        source = self.path(key)
+        target = os.path.join(self.directory, 'thumbs', str(size), key[:2], f"{key.rsplit('.', 1)[0]}.jpg")
+        if os.path.exists(target):
+            return target
+        Image = pil_image()
+        if Image is None or not os.path.exists(source):
+            return None
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{threading.get_ident()}.tmp"
+        with metrics.timer('image_thumbnail_seconds'):
+            with Image.open(source) as image:
+                image.thumbnail((size, size))
+                image.convert('RGB').save(tmp_path, 'JPEG', quality=85)
+        os.replace(tmp_path, target)
+        return target
+
+    def stats(self) -> Dict:
+        objects = 0
+        size = 0
+        for root, _, files in os.walk(os.path.join(self.directory, 'objects')):
+            for name in files:
+                objects += 1
+                size += os.path.getsize(os.path.join(root, name))
+        return {'urls': len(self._urls), 'objects': objects, 'bytes': size}
+
+
+class ImageFetcher:
+    """并发下载评论图片：线程池限制总并发，每个主机再用信号量限制同时在途的请求数"""
+
+    def __init__(self, store: ImageStore, max_workers: int = 8, per_host: int = 4, timeout: float = 10,
+                 retries: int = 2, scheme: str = 'https', max_bytes: int = 10 * 1024 * 1024):
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.retries = retries
+        self.scheme = scheme
+        self.max_bytes = max_bytes
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'referer': 'https://detail.tmall.com/',
+            'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36'
+        })
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image')
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self.stats = {'downloaded': 0, 'cached': 0, 'failed': 0, 'bytes': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['ImageFetcher']:
+        """设置了IMAGE_DIR时启用，IMAGE_WORKERS为总并发（默认8），IMAGE_PER_HOST为单主机并发（默认4）"""
+        directory = os.getenv('IMAGE_DIR')
+        if not directory:
+            return None
+        return cls(ImageStore(directory),
+                   max_workers=int(os.getenv('IMAGE_WORKERS', '8')),
+                   per_host=int(os.getenv('IMAGE_PER_HOST', '4')))
+
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self.stats[name] += value
+
+    def _read_body(self, response) -> Optional[bytes]:
+        """流式读取响应体，超过max_bytes立即放弃，返回None；Content-Length已超限时不读取"""
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            return None
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > self.max_bytes:
+                return None
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def _download(self, url: str) -> Optional[str]:
+        """下载单张图片并保存，返回图片键，失败时返回None"""
+        slot = self._host_slot(url)
+        for attempt in range(self.retries + 1):
+            try:
+                with slot, metrics.timer('image_fetch_seconds'):
+                    response = self.session.get(url, timeout=self.timeout, stream=True)
+                    try:
+                        status = response.status_code
+                        content = self._read_body(response) if status == 200 else None
+                    finally:
+                        response.close()
+                if content:
+                    self._count('downloaded')
+                    self._count('bytes', len(content))
+                    return self.store.put(url, content)
+                # 4xx和超过大小上限的图片不会因重试而改变
+                if status < 500:
+                    break
+            except requests.RequestException:
+                pass
+            if attempt < self.retries:
+                time.sleep(0.2 * (2 ** attempt))
+        self._count('failed')
+        metrics.inc('image_fetch_failures_total')
+        return None
+
+    def fetch_all(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """下载一批图片（原始或已规范化的URL），返回{规范化URL: 图片键或None}，已下载过的URL直接取索引"""
+        results = {}
+        futures = {}
+        for raw in urls:
+            url = normalize_image_url(raw, self.scheme)
+            if not url or url in results or url in futures:
+                continue
+            key = self.store.lookup(url)
+            if key:
+                results[url] = key
+                self._count('cached')
+            else:
+                futures[url] = self._executor.submit(self._download, url)
+        for url, future in futures.items():
+            results[url] = future.result()
+        return results
+
+    def attach(self, comments: List) -> int:
+        """下载一批评论的全部图片，把引用写回每条评论的images字段，返回成功保存的图片数
+
+        images与pics一一对应：[{"url": 规范化URL, "key": 图片键}]，下载失败的图片key为None。
+        """
+        with_pics = [comment for comment in comments if comment.get('pics')]
+        if not with_pics:
+            return 0
+        keys = self.fetch_all(url for comment in with_pics for url in comment['pics'])
+        stored = 0
+        for comment in with_pics:
+            images = []
+            for raw in comment['pics']:
+                url = normalize_image_url(raw, self.scheme)
+                key = keys.get(url)
+                stored += key is not None
+                images.append({'url': url, 'key': key})
+            comment['images'] = images
+        return stored
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评论图片存储')
+    parser.add_argument('--dir', default=os.getenv('IMAGE_DIR') or DEFAULT_IMAGE_DIR, help='图片目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    fetch_parser = subparsers.add_parser('fetch', help='下载快照中某商品评论的图片')
+    fetch_parser.add_argument('product_id')
+    fetch_parser.add_argument('--workers', type=int, default=int(os.getenv('IMAGE_WORKERS', '8')))
+    fetch_parser.add_argument('--per-host', type=int, default=int(os.getenv('IMAGE_PER_HOST', '4')))
+    thumb_parser = subparsers.add_parser('thumb', help='生成缩略图')
+    thumb_parser.add_argument('key')
+    thumb_parser.add_argument('--size', type=int, default=200)
+    subparsers.add_parser('stats', help='查看存储统计')
+    args = parser.parse_args()
+
+    store = ImageStore(args.dir)
+    if args.command == 'fetch':
+        from snapshot_store import DEFAULT_SNAPSHOT_DIR, SnapshotStore
+        comments = SnapshotStore(os.getenv('SNAPSHOT_DIR') or DEFAULT_SNAPSHOT_DIR).load(args.product_id)
+        fetcher = ImageFetcher(store, max_workers=args.workers, per_host=args.per_host)
+        started = time.time()
+        try:
+            stored = fetcher.attach(comments)
+        finally:
+            fetcher.close()
+        print(f"🖼️ {len(comments)}条评论，保存 {stored} 张图片，耗时 {time.time() - started:.1f}s: {fetcher.stats}")
+    elif args.command == 'thumb':
+        path = store.thumbnail(args.key, args.size)
+        print(path or '❌ 原图不存在或未安装Pillow（pip install Pillow）')
+    else:
+        print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+分布式爬取任务队列 - 基于MySQL的crawl_jobs表（database/crawl_jobs.sql），多台机器上的工作进程共享
+使用方法:
+    python3 job_queue.py enqueue 933910033859 842926327290 [--max-pages 5] [--priority 10]
+    python3 job_queue.py enqueue-all            # 为spider_configs中所有启用的商品排队
+    python3 job_queue.py stats                  # 各状态的任务数
+    python3 job_queue.py retry                  # 把失败的任务重新排队
+    python3 job_queue.py reap                   # 把租约过期且重试次数用完的任务标记为失败
+
+领取任务用 SELECT ... FOR UPDATE SKIP LOCKED，多个工作进程同时领取时互不等待、不会领到同一任务；
+领取后持有租约（JOB_LEASE秒，默认120），执行期间由LeaseKeeper定期续约。进程崩溃或失联导致租约过期后，
+任务被其他工作进程重新领取；续约、完成和失败都以(任务ID, 工作进程, 领取次数)为条件，
+租约已被他人接手的旧进程无法再修改任务。所有时间比较都使用数据库时钟，不受各机器时钟偏差影响。
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from database_reader import DatabaseReader
+from metrics import metrics
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """crawl_jobs表上的任务队列，任务以dict表示: {'id', 'product_id', 'params', 'attempts', 'max_attempts', 'worker_id'}"""
+
+    def __init__(self, db_reader: DatabaseReader, lease_seconds: float = 120, max_attempts: int = 3,
+                 retry_delay: float = 30, table: str = 'crawl_jobs'):
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', table):
+            raise ValueError(f'无效的任务表名: {table}')
+        self.db_reader = db_reader
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # 失败后第n次重试前等待 retry_delay * 2^(n-1) 秒
+        self.retry_delay = retry_delay
+        self.table = table
+
+    @classmethod
+    def from_env(cls, db_reader: DatabaseReader) -> 'JobQueue':
+        """JOB_LEASE为租约秒数，JOB_MAX_ATTEMPTS为最多领取次数，JOB_RETRY_DELAY为首次重试的退避秒数，
+        JOB_QUEUE_TABLE可指定任务表（如基准测试使用的独立表）"""
+        return cls(db_reader,
+                   lease_seconds=float(os.getenv('JOB_LEASE', '120')),
+                   max_attempts=int(os.getenv('JOB_MAX_ATTEMPTS', '3')),
+                   retry_delay=float(os.getenv('JOB_RETRY_DELAY', '30')),
+                   table=os.getenv('JOB_QUEUE_TABLE', 'crawl_jobs'))
+
+    def enqueue(self, product_id: str, params: Optional[Dict] = None, priority: int = 0,
+                max_attempts: Optional[int] = None) -> bool:
+        """为商品排队一个任务，返回是否新建；该商品已有排队或运行中的任务时不重复创建，只提升其优先级"""
+        with self.db_reader.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+            INSERT INTO {self.table} (product_id, params, priority, max_attempts)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE priority = GREATEST(priority, VALUES(priority))
+            """, (str(product_id), json.dumps(params or {}, ensure_ascii=False), priority,
+                  max_attempts or self.max_attempts))
+            # ON DUPLICATE KEY UPDATE: 新插入时rowcount为1，更新已有行时为2，未变化时为0
+            created = cursor.rowcount == 1
+            conn.commit()
+            cursor.close()
+        if created:
+            metrics.inc('job_queue_enqueued_total')
+        return created
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[Dict]:
+        """领取最多limit个可执行的任务（排队中且已到重试时间，或租约已过期），返回任务列表
+
+        被其他事务锁定的行直接跳过，多个工作进程并发领取时既不会阻塞也不会领到同一任务。
+        """
+        with metrics.timer('job_queue_claim_seconds'):
+            with self.db_reader.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                conn.start_transaction()
+                try:
+                    cursor.execute(f"""
+                    SELECT id, product_id, params, attempts, max_attempts FROM {self.table}
+                    WHERE ((status = 'queued' AND run_after <= NOW(3))
+                           OR (status = 'running' AND lease_expires_at < NOW(3)))
+                      AND attempts < max_attempts
+                    ORDER BY priority DESC, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                    """, (limit,))
+                    jobs = cursor.fetchall()
+                    if jobs:
+                        ids = [job['id'] for job in jobs]
+                        cursor.execute(f"""
+                        UPDATE {self.table}
+                        SET status = 'running', worker_id = %s, attempts = attempts + 1,
+                            lease_expires_at = NOW(3) + INTERVAL %s MICROSECOND, heartbeat_at = NOW(3)
+                        WHERE id IN ({', '.join(['%s'] * len(ids))})
+                        """, [worker_id, int(self.lease_seconds * 1e6)] + ids)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+
+        for job in jobs:
+            job['attempts'] += 1
+            job['worker_id'] = worker_id
+            job['params'] = json.loads(job['params']) if job.get('params') else {}
+        if jobs:
+            metrics.inc('job_queue_claimed_total', len(jobs))
+            # 领取次数大于1说明之前失败过或租约过期
+            retried = sum(1 for job in jobs if job['attempts'] > 1)
+            if retried:
+                metrics.inc('job_queue_retried_total', retried)
+        return jobs
+
+    def _update_owned(self, job: Dict, assignments: str, params: tuple = ()) -> bool:
+        """仅当任务仍由job的领取者持有（同一工作进程、同一领取次数、运行中）时更新，返回是否更新成功"""
+        with self.db_reader.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+            UPDATE {self.table} SET {assignments}
+            WHERE id = %s AND worker_id = %s AND attempts = %s AND status = 'running'
+            """, tuple(params) + (job['id'], job['worker_id'], job['attempts']))
+            owned = cursor.rowcount == 1
+            conn.commit()
+            cursor.close()
+        return owned
+
+    def heartbeat(self, job: Dict) -> bool:
+        """续约，返回False表示租约已过期并被其他工作进程接手"""
+        return self._update_owned(job, "lease_expires_at = NOW(3) + INTERVAL %s MICROSECOND, heartbeat_at = NOW(3)",
+                                  (int(self.lease_seconds * 1e6),))
+
+    def complete(self, job: Dict, result: Optional[Dict] = None) -> bool:
+        """标记任务完成并记录结果摘要"""
+        owned = self._update_owned(job, "status = 'done', lease_expires_at = NULL, result = %s",
+                                   (json.dumps(result or {}, ensure_ascii=False),))
+        metrics.inc('job_queue_jobs_total', status=DONE if owned else 'lease_lost')
+        return owned
+
+    def fail(self, job: Dict, error: str, retry: bool = True) -> bool:
+        """标记任务失败：未超过最多领取次数且retry为True时按指数退避重新排队，否则标记为failed"""
+        retry = retry and job['attempts'] < job.get('max_attempts', self.max_attempts)
+        delay = self.retry_delay * (2 ** (job['attempts'] - 1)) if retry else 0
+        owned = self._update_owned(
+            job,
+            "status = %s, run_after = NOW(3) + INTERVAL %s MICROSECOND, lease_expires_at = NULL, last_error = %s",
+            (QUEUED if retry else FAILED, int(delay * 1e6), str(error)[:2000])
+        )
+        metrics.inc('job_queue_jobs_total', status=('retry' if retry else FAILED) if owned else 'lease_lost')
+        return owned
+
+    def reap(self) -> int:
+        """把租约已过期且领取次数用完的任务标记为失败，返回标记的任务数"""
+        with self.db_reader.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+            UPDATE {self.table}
+            SET status = 'failed', lease_expires_at = NULL, last_error = '租约过期且重试次数已用完'
+            WHERE status = 'running' AND lease_expires_at < NOW(3) AND attempts >= max_attempts
+            """)
+            reaped = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        if reaped:
+            metrics.inc('job_queue_jobs_total', reaped, status='lease_expired')
+        return reaped
+
+    def retry_failed(self, product_id: Optional[str] = None) -> int:
+        """把失败的任务重新排队（领取次数清零），同一商品已有未完成任务时跳过，返回重新排队的任务数"""
+        where = "status = 'failed'" + (" AND product_id = %s" if product_id else "")
+        with self.db_reader.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+            UPDATE IGNORE {self.table}
+            SET status = 'queued', attempts = 0, run_after = NOW(3), worker_id = NULL
+            WHERE {where}
+            """, (str(product_id),) if product_id else ())
+            requeued = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        return requeued
+
+    def stats(self) -> Dict[str, int]:
+        """各状态的任务数，以及已过期未续约的运行中任务数"""
+        with self.db_reader.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT status, COUNT(*) FROM {self.table} GROUP BY status")
+            stats = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            stats.update({status: count for status, count in cursor.fetchall()})
+            cursor.execute(f"SELECT COUNT(*) FROM {self.table} WHERE status = 'running' AND lease_expires_at < NOW(3)")
+            stats['expired_leases'] = cursor.fetchone()[0]
+            cursor.close()
+        return stats
+
+
+class LeaseKeeper:
+    """任务执行期间在后台线程中定期续约，续约失败（租约被接手）时设置lost"""
+
+    def __init__(self, queue: JobQueue, job: Dict, interval: Optional[float] = None):
+        self.queue = queue
+        self.job = job
+        # 默认每1/3个租约时长续约一次，允许连续两次续约失败（如数据库短暂不可用）而不丢失租约
+        self.interval = interval or max(1.0, queue.lease_seconds / 3)
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{job['id']}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.job):
+                    print(f"⚠️ 任务 {self.job['id']}（商品 {self.job['product_id']}）的租约已被其他工作进程接手")
+                    self.lost.set()
+                    return
+            except Exception as e:
+                # 暂时无法续约时继续尝试，租约到期前恢复即可
+                print(f"⚠️ 任务 {self.job['id']} 续约失败: {e}")
+                metrics.inc('job_queue_heartbeat_errors_total')
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分布式爬取任务队列')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    enqueue_parser = subparsers.add_parser('enqueue', help='为商品排队爬取任务')
+    enqueue_parser.add_argument('product_ids', nargs='+')
+    enqueue_all_parser = subparsers.add_parser('enqueue-all', help='为spider_configs中的所有商品排队')
+    enqueue_all_parser.add_argument('--include-inactive', action='store_true', help='包含未启用的配置')
+    for sub in (enqueue_parser, enqueue_all_parser):
+        sub.add_argument('--max-pages', type=int, help='最大页数，默认使用spider_configs中的配置')
+        sub.add_argument('--page-size', type=int)
+        sub.add_argument('--incremental', action='store_true', help='增量爬取')
+        sub.add_argument('--priority', type=int, default=0)
+    subparsers.add_parser('stats', help='查看各状态的任务数')
+    retry_parser = subparsers.add_parser('retry', help='把失败的任务重新排队')
+    retry_parser.add_argument('product_id', nargs='?', help='商品ID，省略时重试全部')
+    subparsers.add_parser('reap', help='把租约过期且重试次数用完的任务标记为失败')
+    args = parser.parse_args()
+
+    db_reader = DatabaseReader()
+    queue = JobQueue.from_env(db_reader)
+    if args.command in ('enqueue', 'enqueue-all'):
+        params = {'delay': 0}
+        if args.max_pages:
+            params['max_pages'] = args.max_pages
+        if args.page_size:
+            params['page_size'] = args.page_size
+        if args.incremental:
+            params['incremental'] = True
+        if args.command == 'enqueue':
+            product_ids = args.product_ids
+        else:
+            # 复用批量爬虫的配置筛选：每个商品只取最新一条，默认跳过未启用的配置
+            from batch_spider import BatchCrawler
+            configs = BatchCrawler(db_reader).load_configs(include_inactive=args.include_inactive)
+            product_ids = [str(config['product_id']) for config in configs]
+        created = sum(queue.enqueue(product_id, params, args.priority) for product_id in product_ids)
+        print(f"📥 新排队 {created} 个任务，{len(product_ids) - created} 个商品已有未完成的任务")
+    elif args.command == 'stats':
+        print(queue.stats())
+    elif args.command == 'retry':
+        print(f"🔁 重新排队 {queue.retry_failed(args.product_id)} 个失败任务")
+    else:
+        print(f"🧹 标记 {queue.reap()} 个租约过期的任务为失败")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+运行指标模块 - 记录热点路径的耗时直方图和计数器，导出为Prometheus文本格式或JSON
+通过环境变量启用:
+    METRICS_FILE      指标文件路径，未设置时不采集（所有记录调用立即返回）
+    METRICS_FORMAT    prometheus 或 json，默认按文件扩展名判断
+    METRICS_INTERVAL  常驻/批量模式下定期导出的间隔秒数，默认15
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# 直方图分桶上界（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+def _format_labels(label_key: Tuple, extra: str = '') -> str:
+    parts = [f'{k}="{v}"' for k, v in label_key]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, size: int):
+        self.counts = [0] * (size + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class _Timer:
+    """计时上下文，退出时把耗时记入直方图"""
+
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class _NullTimer:
+    """未启用指标时使用的空计时上下文"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """线程安全的指标注册表：计数器和直方图，均可带标签（如product）"""
+
+    def __init__(self, enabled: bool = False, path: Optional[str] = None, fmt: Optional[str] = None,
+                 interval: float = 15.0, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.path = path
+        self.fmt = fmt or ('json' if path and path.endswith('.json') else 'prometheus')
+        self.interval = interval
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    @classmethod
+    def from_env(cls) -> 'Metrics':
+        path = os.getenv('METRICS_FILE') or None
+        return cls(enabled=bool(path), path=path, fmt=os.getenv('METRICS_FORMAT') or None,
+                   interval=float(os.getenv('METRICS_INTERVAL', '15')))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """累加计数器"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """记录一次观测值（秒）到直方图"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets))
+            histogram.counts[index] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def timer(self, name: str, **labels):
+        """计时上下文：with metrics.timer('spider_parse_seconds'): ..."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict:
+        """当前指标的JSON结构"""
+        with self._lock:
+            counters = {}
+            for (name, label_key), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append({'labels': dict(label_key), 'value': value})
+            histograms = {}
+            for (name, label_key), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    buckets['+Inf' if bound == float('inf') else repr(bound)] = cumulative
+                histograms.setdefault(name, []).append({
+                    'labels': dict(label_key),
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'buckets': buckets
+                })
+        return {
+            'timestamp': int(time.time()),
+            'uptime': round(time.time() - self.started_at, 3),
+            'counters': counters,
+            'histograms': histograms
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus文本格式（可供node_exporter的textfile collector读取）"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in snapshot['counters'].items():
+            lines.append(f'# TYPE {name} counter')
+            for item in series:
+                lines.append(f"{name}{_format_labels(_label_key(item['labels']))} {item['value']}")
+        for name, series in snapshot['histograms'].items():
+            lines.append(f'# TYPE {name} histogram')
+            for item in series:
+                label_key = _label_key(item['labels'])
+                for bound, count in item['buckets'].items():
+                    le = f'le="{bound}"'
+                    lines.append(f"{name}_bucket{_format_labels(label_key, le)} {count}")
+                lines.append(f"{name}_sum{_format_labels(label_key)} {item['sum']}")
+                lines.append(f"{name}_count{_format_labels(label_key)} {item['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: Optional[str] = None, fmt: Optional[str] = None) -> bool:
+        """把当前指标原子地写入文件（先写临时文件再重命名），未启用或未指定路径时返回False"""
+        path = path or self.path
+        if not self.enabled or not path:
+            return False
+        fmt = fmt or self.fmt
+        if fmt == 'json':
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        else:
+            content = self.render_prometheus()
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return True
+
+    def start_exporter(self, interval: Optional[float] = None) -> Optional['MetricsExporter']:
+        """启动后台定期导出线程，未启用时返回None"""
+        if not self.enabled or not self.path:
+            return None
+        exporter = MetricsExporter(self, interval or self.interval)
+        exporter.start()
+        return exporter
+
+
+class MetricsExporter(threading.Thread):
+    """后台线程：每隔interval秒导出一次指标，stop()时再导出最后一次"""
+
+    def __init__(self, metrics: Metrics, interval: float):
+        super().__init__(name='metrics-exporter', daemon=True)
+        self.metrics = metrics
+        self.interval = max(0.1, interval)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.metrics.export()
+            except OSError as e:
+                print(f"⚠️ 指标导出失败: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.metrics.export()
+
+
+# 进程内共享的指标注册表
+metrics = Metrics.from_env()
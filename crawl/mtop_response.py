@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+mtop响应解析 - 从mtopjsonp12({...})响应中定位JSON片段并解码，一次遍历把rateList转换为紧凑评论记录
+安装了orjson时优先使用orjson解码
+"""
+
+import json
+from typing import Dict, List, Optional, Union
+
+from comment_record import CommentRecord
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时使用标准库
+    orjson = None
+
+_JSONP_PREFIX = 'mtopjsonp'
+_DECODER = json.JSONDecoder()
+
+
+def _json_span(body: Union[str, bytes]):
+    """返回JSONP回调括号内JSON片段的(起, 止)下标，找不到时返回None"""
+    if isinstance(body, str):
+        prefix, open_paren, close_paren = _JSONP_PREFIX, '(', ')'
+    else:
+        prefix, open_paren, close_paren = _JSONP_PREFIX.encode(), b'(', b')'
+    start = body.find(prefix)
+    if start < 0:
+        return None
+    start = body.find(open_paren, start + len(prefix))
+    end = body.rfind(close_paren)
+    if start < 0 or end <= start:
+        return None
+    return start + 1, end
+
+
+def decode_jsonp(body: Union[str, bytes]) -> Optional[Dict]:
+    """解析JSONP响应体，body可以是str或bytes（如response.content）
+
+    bytes响应体优先用orjson直接解码memoryview切片，其余情况用标准库raw_decode从下标处开始解码，
+    两者都不会把JSON片段复制成新字符串。响应体不是JSONP时返回None，JSON非法时抛出ValueError。
+    """
+    span = _json_span(body)
+    if span is None:
+        return None
+    start, end = span
+    if orjson is not None and not isinstance(body, str):
+        return orjson.loads(memoryview(body)[start:end])
+    if not isinstance(body, str):
+        body = bytes(body).decode('utf-8')
+        start, end = _json_span(body)
+    while start < end and body[start].isspace():
+        start += 1
+    data, _ = _DECODER.raw_decode(body, start)
+    return data
+
+
+def format_comments(rate_list: List[Dict]) -> List[CommentRecord]:
+    """把接口返回的rateList一次遍历转换为紧凑评论记录列表"""
+    comments = []
+    append = comments.append
+    for rate in rate_list:
+        get = rate.get
+        interact = get('interactInfo')
+        pics = get('feedPicPathList')
+        append(CommentRecord(
+            rate['userNick'] if 'userNick' in rate else get('reduceUserNick', ''),
+            get('feedback', ''),
+            int(get('userStar', 0)),
+            rate['feedbackDate'] if 'feedbackDate' in rate else get('createTime', ''),
+            int(interact.get('likeCount', 0)) if isinstance(interact, dict) else 0,
+            get('reply', ''),
+            get('skuValueStr', ''),
+            pics if isinstance(pics, list) else ()
+        ))
+    return comments
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+分阶段流水线 - 数据源和每个处理阶段各占一个线程，阶段之间用有界队列连接
+下游处理不过来时上游在put处阻塞（背压），队列长度上限决定了在途数据量；
+统计每个阶段的忙碌、等待输入和等待下游的时间，用于找出瓶颈阶段。
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from metrics import metrics
+
+_DONE = object()
+
+
+class StageStats:
+    """单个阶段的计时：busy为处理耗时，starved为等待上游的时间，blocked为等待下游（背压）的时间"""
+
+    __slots__ = ('name', 'items', 'busy', 'starved', 'blocked')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+    def to_dict(self, elapsed: float) -> Dict:
+        return {
+            'items': self.items,
+            'busy': round(self.busy, 3),
+            'starved': round(self.starved, 3),
+            'blocked': round(self.blocked, 3),
+            'utilization': round(self.busy / elapsed, 3) if elapsed > 0 else 0.0
+        }
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class Pipeline:
+    """source → stage1 → stage2 → ... → 迭代方
+
+    source在"source_name"线程中迭代，每个(名称, 函数)阶段在自己的线程中按顺序处理，保持数据顺序；
+    迭代Pipeline得到最后一个阶段的输出，迭代方的处理耗时计为"sink_name"阶段。
+    任一阶段抛出异常时停止全部线程，并在迭代方重新抛出；迭代方提前停止时同样停止全部线程。
+    """
+
+    def __init__(self, source: Iterable, stages: List[Tuple[str, Callable]], maxsize: int = 2,
+                 source_name: str = 'fetch', sink_name: str = 'output'):
+        self.source = source
+        self.stages = stages
+        self.maxsize = max(1, maxsize)
+        self.stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages] + [StageStats(sink_name)]
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _put(self, q: queue.Queue, item, stats: StageStats) -> bool:
+        """带背压的put：队列满时阻塞，计入blocked；流水线停止时返回False"""
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                stats.blocked += time.perf_counter() - started
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue, stats: StageStats):
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                stats.starved += time.perf_counter() - started
+                return item
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _run_source(self, out: queue.Queue, stats: StageStats):
+        iterator = iter(self.source)
+        try:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stats.busy += time.perf_counter() - started
+                stats.items += 1
+                if not self._put(out, item, stats):
+                    return
+            self._put(out, _DONE, stats)
+        except BaseException as e:
+            self._put(out, _Failure(e), stats)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    def _run_stage(self, func: Callable, inbox: queue.Queue, out: queue.Queue, stats: StageStats):
+        while True:
+            item = self._get(inbox, stats)
+            if item is _DONE or isinstance(item, _Failure):
+                self._put(out, item, stats)
+                return
+            started = time.perf_counter()
+            try:
+                result = func(item)
+            except BaseException as e:
+                self._put(out, _Failure(e), stats)
+                return
+            finally:
+                stats.busy += time.perf_counter() - started
+            stats.items += 1
+            if not self._put(out, result, stats):
+                return
+
+    def __iter__(self) -> Iterator:
+        queues = [queue.Queue(self.maxsize) for _ in range(len(self.stages) + 1)]
+        self._threads = [threading.Thread(target=self._run_source, args=(queues[0], self.stats[0]),
+                                          name=f'pipeline-{self.stats[0].name}', daemon=True)]
+        for index, (name, func) in enumerate(self.stages):
+            self._threads.append(threading.Thread(
+                target=self._run_stage, args=(func, queues[index], queues[index + 1], self.stats[index + 1]),
+                name=f'pipeline-{name}', daemon=True))
+        started = time.perf_counter()
+        for thread in self._threads:
+            thread.start()
+        sink = self.stats[-1]
+        try:
+            while True:
+                item = self._get(queues[-1], sink)
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                sink.items += 1
+                resumed = time.perf_counter()
+                yield item
+                sink.busy += time.perf_counter() - resumed
+        finally:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join()
+            self.elapsed = time.perf_counter() - started
+            for stage in self.stats:
+                metrics.observe('pipeline_stage_busy_seconds', stage.busy, stage=stage.name)
+                metrics.observe('pipeline_stage_blocked_seconds', stage.blocked, stage=stage.name)
+
+    def utilization(self) -> Dict[str, Dict]:
+        """各阶段的处理条数、忙碌/等待时间和利用率（忙碌时间 / 流水线总耗时）"""
+        return {stage.name: stage.to_dict(self.elapsed) for stage in self.stats}
+
+    def report(self) -> str:
+        """一行利用率摘要，如 "fetch 92% | analyze 10% | write 35% | output 1%"，利用率最高的阶段即瓶颈"""
+        parts = [f"{stage.name} {stage.busy / self.elapsed:.0%}" if self.elapsed > 0 else f"{stage.name} -"
+                 for stage in self.stats]
+        return f"⏱️ 流水线 {self.elapsed:.2f}s: " + ' | '.join(parts)
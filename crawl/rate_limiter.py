@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+请求限速模块 - 多线程共享的令牌桶限速器，以及按响应情况自适应调整速率的AIMD限速器
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RateLimiter:
+    """线程安全的令牌桶限速器"""
+
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        # rate: 每秒允许的请求数，None或<=0表示不限速
+        self.rate = rate if rate and rate > 0 else None
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        if self.rate is None:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def record_success(self, latency: float):
+        """记录一次成功请求（固定速率限速器不做调整）"""
+
+    def record_throttle(self):
+        """记录一次被限流的请求（固定速率限速器不做调整）"""
+
+    def record_error(self):
+        """记录一次失败的请求（固定速率限速器不做调整）"""
+
+    def stats(self) -> Dict:
+        return {'rate': self.rate}
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """AIMD自适应限速器：响应正常时线性提速，被限流或出错时按比例降速"""
+
+    def __init__(self, rate: float = 1.0, min_rate: float = 0.2, max_rate: float = 20.0,
+                 increase: float = 0.2, throttle_factor: float = 0.5, error_factor: float = 0.8,
+                 target_latency: float = 1.0, burst: int = 1):
+        super().__init__(rate, burst)
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.throttle_factor = throttle_factor
+        self.error_factor = error_factor
+        # 响应延迟超过目标值时不再提速
+        self.target_latency = target_latency
+        self.successes = 0
+        self.throttles = 0
+        self.errors = 0
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.successes += 1
+            if latency <= self.target_latency:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def record_throttle(self):
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate * self.throttle_factor)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+            self.rate = max(self.min_rate, self.rate * self.error_factor)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'successes': self.successes,
+                'throttles': self.throttles,
+                'errors': self.errors
+            }
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+本地情感与关键词打分 - 基于情感词典和短语n-gram，对一批评论用NumPy向量化计算情感分、置信度和关键词
+使用方法:
+    python3 sentiment.py score 933910033859 [--ambiguous]   # 对快照存储中的评论打分并输出统计
+    python3 sentiment.py backfill [--product-id ID]          # 为数据库中已有评论补写情感分
+
+作为远程AI情感分析的快速初筛：只有标记为ambiguous（置信度低或正负面混杂）的评论才需要送到远程模型。
+词典可通过环境变量SENTIMENT_LEXICON指定的JSON文件扩充，格式见load_lexicon。
+"""
+
+import argparse
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# 情感词与短语（1~4字的n-gram）及权重，匹配时长词优先，"不错"不会被拆成否定词"不"
+POSITIVE_TERMS = {
+    '好': 1.0, '很好': 1.5, '非常好': 2.0, '挺好': 1.2, '不错': 1.2, '很不错': 1.6, '好用': 1.3,
+    '好看': 1.3, '漂亮': 1.3, '喜欢': 1.3, '满意': 1.5, '很满意': 1.8, '非常满意': 2.0, '推荐': 1.2,
+    '值得': 1.2, '值得购买': 1.8, '物超所值': 2.0, '物美价廉': 1.8, '性价比高': 1.8, '划算': 1.3,
+    '便宜': 0.8, '实惠': 1.2, '舒服': 1.3, '舒适': 1.3, '透气': 0.8, '轻巧': 0.8, '结实': 1.0,
+    '厚实': 1.0, '耐用': 1.2, '精致': 1.2, '细腻': 1.0, '质感': 0.6, '正品': 1.0, '给力': 1.4,
+    '完美': 1.8, '惊艳': 1.6, '贴心': 1.3, '热情': 1.0, '耐心': 1.0, '周到': 1.0, '及时': 0.8,
+    '很快': 1.0, '速度快': 1.2, '发货快': 1.2, '到货快': 1.2, '合适': 1.0, '合身': 1.0,
+    '流畅': 1.2, '灵敏': 1.0, '清晰': 1.0, '方便': 1.0, '实用': 1.0, '好评': 1.2, '五星': 1.2,
+    '回购': 1.2, '还会再来': 1.5, '下次还会': 1.4, '无可挑剔': 2.0, '没毛病': 1.4, '没问题': 1.0,
+    '完好': 0.8, '放心': 1.0, '赞': 1.3, '棒': 1.4, '很棒': 1.6, '绝了': 1.4, '喜爱': 1.3, '值': 0.8,
+    '新颖': 0.8, '高级': 1.0, '大气': 1.0, '可以': 0.5, '还行': 0.3, '符合': 0.8, '满分': 1.8,
+    '没有问题': 1.0, '没什么问题': 1.0, '不影响': 0.5, '差不多': 0.3,
+    # 平台默认评价模板，没有实际内容，按弱正面处理即可，不必送远程模型
+    '系统默认好评': 1.5, '未及时主动评价': 0.0,
+}
+NEGATIVE_TERMS = {
+    '差': -1.5, '很差': -2.0, '太差': -2.0, '差评': -2.0, '失望': -1.8, '很失望': -2.0, '后悔': -1.8,
+    '垃圾': -2.0, '坑': -1.5, '骗': -1.8, '假货': -2.0, '假的': -1.5, '退货': -1.2, '退款': -1.0,
+    '破损': -1.5, '坏了': -1.5, '损坏': -1.5, '瑕疵': -1.2, '划痕': -1.0, '脏': -1.2, '异味': -1.3,
+    '味道大': -1.3, '难闻': -1.5, '掉色': -1.3, '起球': -1.2, '开线': -1.2, '掉屑': -1.0, '卡顿': -1.3,
+    '不灵': -1.3, '失灵': -1.5, '漏': -1.0, '松': -0.5, '粗糙': -1.2, '廉价': -1.2, '劣质': -2.0,
+    '偏小': -0.6, '偏大': -0.6, '太小': -1.0, '太大': -0.8, '太薄': -1.0, '太贵': -1.2, '贵': -0.6,
+    '慢': -0.8, '太慢': -1.3, '很慢': -1.3, '不值': -1.5, '一般': -0.4, '凑合': -0.6, '麻烦': -0.8,
+    '噪音': -0.8, '吵': -0.8, '难用': -1.5, '难看': -1.5, '不好用': -1.6, '不好看': -1.5, '敷衍': -1.3,
+    '态度差': -1.8, '不理人': -1.5, '问题': -0.5, '毛病': -0.8, '不推荐': -1.8, '别买': -2.0,
+    '硌脚': -1.2, '磨脚': -1.2, '断了': -1.3, '没用': -1.2, '鸡肋': -1.2, '无语': -1.3, '生气': -1.5,
+}
+# 否定词：作用于紧随其后的情感词（中间至多隔一个程度副词）
+NEGATORS = ('不', '没', '没有', '不太', '不是', '并不', '毫不', '别', '无', '未', '不会', '不怎么')
+# 程度副词：放大紧随其后的情感词；位于否定词之后时减弱否定（"不太好"弱于"不好"）
+INTENSIFIERS = {'很': 1.3, '非常': 1.6, '特别': 1.5, '太': 1.5, '超': 1.5, '超级': 1.6, '真': 1.2,
+                '挺': 1.1, '比较': 0.9, '有点': 0.8, '有些': 0.8, '十分': 1.5, '相当': 1.4, '好': 1.2}
+# 评论维度：命中的维度作为关键词输出，便于按维度筛选和统计
+ASPECTS = {
+    '物流': ('物流', '快递', '发货', '到货', '送货', '配送'),
+    '质量': ('质量', '做工', '材质', '用料', '品质', '质感'),
+    '价格': ('价格', '性价比', '价钱', '便宜', '贵', '划算', '实惠'),
+    '包装': ('包装', '盒子', '外包装'),
+    '服务': ('客服', '服务', '卖家', '商家', '售后', '态度'),
+    '外观': ('外观', '颜值', '颜色', '款式', '样子', '好看', '难看'),
+    '尺码': ('尺码', '码数', '尺寸', '大小', '偏大', '偏小'),
+    '手感': ('手感', '触感', '脚感', '上脚'),
+}
+
+_SENTIMENT, _NEGATOR, _INTENSIFIER, _ASPECT = 0, 1, 2, 3
+LABELS = ('negative', 'neutral', 'positive')
+
+
+def load_lexicon(path: Optional[str] = None) -> Dict:
+    """读取内置词典，path指向的JSON文件可追加或覆盖词条:
+    {"positive": {"词": 权重}, "negative": {"词": 权重}, "negators": [...], "intensifiers": {...}, "aspects": {"维度": [...]}}
+    """
+    lexicon = {
+        'positive': dict(POSITIVE_TERMS),
+        'negative': dict(NEGATIVE_TERMS),
+        'negators': list(NEGATORS),
+        'intensifiers': dict(INTENSIFIERS),
+        'aspects': {name: list(terms) for name, terms in ASPECTS.items()},
+    }
+    if path:
+        with open(path, encoding='utf-8') as f:
+            extra = json.load(f)
+        lexicon['positive'].update(extra.get('positive', {}))
+        lexicon['negative'].update({term: -abs(weight) for term, weight in extra.get('negative', {}).items()})
+        lexicon['negators'].extend(extra.get('negators', []))
+        lexicon['intensifiers'].update(extra.get('intensifiers', {}))
+        for name, terms in extra.get('aspects', {}).items():
+            lexicon['aspects'].setdefault(name, []).extend(terms)
+    return lexicon
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """把词条编译成前缀树形状的正则（如"好(?:用|看|评)?"），长词优先且每个位置只需比较首字"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if '' in node:
+            # 当前位置已是完整词条：贪婪的可选组先尝试更长的词条，失败再回退
+            return '(?:' + '|'.join(branches) + ')?'
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return build(trie)
+
+
+class SentimentScorer:
+    """批量情感打分器（线程安全：打分过程不修改实例状态）
+
+    一批评论拼接成一个字符串，用一个长词优先的正则一次扫描出所有词典命中，
+    之后的否定/程度修饰、按评论求和、打分和分类都在NumPy数组上完成。
+    """
+
+    def __init__(self, lexicon: Optional[Dict] = None, threshold: float = 0.2, ambiguous_below: float = 0.25,
+                 max_keywords: int = 5):
+        lexicon = lexicon or load_lexicon()
+        # threshold: |情感分|低于该值为neutral；ambiguous_below: 置信度低于该值需要远程模型复核
+        self.threshold = threshold
+        self.ambiguous_below = ambiguous_below
+        self.max_keywords = max_keywords
+
+        # 同一个词可能同时是情感词和维度词（如"便宜"），词条表中每个词只出现一次
+        terms = {}
+        for term, weight in lexicon['positive'].items():
+            terms[term] = [_SENTIMENT, float(weight), 1.0, '']
+        for term, weight in lexicon['negative'].items():
+            terms[term] = [_SENTIMENT, float(weight), 1.0, '']
+        for term in lexicon['negators']:
+            terms.setdefault(term, [_NEGATOR, 0.0, 1.0, ''])
+        for term, factor in lexicon['intensifiers'].items():
+            terms.setdefault(term, [_INTENSIFIER, 0.0, float(factor), ''])
+        for name, aspect_terms in lexicon['aspects'].items():
+            for term in aspect_terms:
+                terms.setdefault(term, [_ASPECT, 0.0, 1.0, ''])[3] = name
+
+        self.terms = sorted(terms, key=len, reverse=True)
+        self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        self._kind = np.array([terms[t][0] for t in self.terms], dtype=np.int8)
+        self._weight = np.array([terms[t][1] for t in self.terms], dtype=np.float64)
+        self._factor = np.array([terms[t][2] for t in self.terms], dtype=np.float64)
+        self._aspect = [terms[t][3] for t in self.terms]
+        # "好"既是情感词也是程度副词（"好舒服"），按情感词处理，后面紧跟情感词时再视为程度副词
+        self._also_intensifier = np.array([t in lexicon['intensifiers'] for t in self.terms], dtype=bool)
+        self._pattern = re.compile(_trie_pattern(self.terms))
+
+    @classmethod
+    def from_env(cls) -> Optional['SentimentScorer']:
+        """按环境变量创建：本地打分是可选的初筛阶段，设置LOCAL_SENTIMENT=true时才开启，否则返回None"""
+        if os.getenv('LOCAL_SENTIMENT', 'false').lower() != 'true':
+            return None
+        return cls(load_lexicon(os.getenv('SENTIMENT_LEXICON') or None),
+                   threshold=float(os.getenv('SENTIMENT_THRESHOLD', '0.2')),
+                   ambiguous_below=float(os.getenv('SENTIMENT_AMBIGUOUS_BELOW', '0.25')))
+
+    def _match(self, texts: Sequence[str]):
+        """扫描一批文本，返回所有命中的(评论下标, 词条ID, 起, 止)数组，按评论和位置排序"""
+        # 用换行符拼接，词条中不含换行符，命中不会跨越两条评论
+        lengths = np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts))
+        row_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        joined = '\n'.join(texts)
+        term_ids = self._term_ids
+        hits = [(m.start(), m.end(), term_ids[m.group()]) for m in self._pattern.finditer(joined)]
+        if not hits:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty
+        hits = np.array(hits, dtype=np.int64)
+        starts, ends, ids = hits[:, 0], hits[:, 1], hits[:, 2]
+        rows = np.searchsorted(row_starts, starts, side='right') - 1
+        return rows, ids, starts, ends
+
+    def score_texts(self, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        """对一批文本打分，返回等长的NumPy数组:
+        score（-1~1）、label（0负面/1中性/2正面）、confidence（0~1）、ambiguous、hits（情感词命中数），
+        以及关键词命中明细keyword_rows/keyword_ids
+        """
+        n = len(texts)
+        rows, ids, starts, ends = self._match(texts)
+        kind = self._kind[ids]
+        sentiment = kind == _SENTIMENT
+
+        # 前一个/前两个命中与当前命中在同一条评论且紧邻（间隔不超过1个字）时才起修饰作用
+        near1 = np.zeros(len(ids), dtype=bool)
+        near1[1:] = (rows[1:] == rows[:-1]) & (starts[1:] - ends[:-1] <= 1)
+        near2 = np.zeros(len(ids), dtype=bool)
+        near2[2:] = near1[2:] & near1[1:-1]
+        prev1 = np.concatenate(([0], ids[:-1]))[:len(ids)]
+        prev2 = np.concatenate(([0, 0], ids[:-2]))[:len(ids)]
+        # 前一个命中作为程度副词：真正的程度副词，或兼作程度副词的情感词（如"好舒服"里的"好"）
+        intensified = near1 & ((self._kind[prev1] == _INTENSIFIER) | (self._also_intensifier[prev1] & sentiment))
+        negated = near1 & (self._kind[prev1] == _NEGATOR)
+        # 否定词+程度副词+情感词（"不太满意"、"不是很好"）：否定减弱
+        weak_negated = near2 & intensified & (self._kind[prev2] == _NEGATOR)
+        # 被后一个情感词当作程度副词使用的情感词本身不计分
+        consumed = np.zeros(len(ids), dtype=bool)
+        consumed[:-1] = self._also_intensifier[ids[:-1]] & sentiment[:-1] & intensified[1:] & sentiment[1:]
+
+        factor = np.where(intensified, self._factor[prev1], 1.0)
+        factor = np.where(negated, -0.8, factor)
+        factor = np.where(weak_negated, -0.5, factor)
+        scored = sentiment & ~consumed
+        contribution = np.where(scored, self._weight[ids] * factor, 0.0)
+
+        positive = np.bincount(rows, weights=np.maximum(contribution, 0.0), minlength=n)
+        negative = -np.bincount(rows, weights=np.minimum(contribution, 0.0), minlength=n)
+        hits = np.bincount(rows, weights=scored.astype(np.float64), minlength=n)
+
+        score = np.tanh((positive - negative) / 2.0)
+        label = np.where(score >= self.threshold, 2, np.where(score <= -self.threshold, 0, 1)).astype(np.int8)
+        # 置信度：分数越极端、证据越多越高；正负面混杂时按混杂比例降低
+        mixed = np.minimum(positive, negative) / np.maximum(np.maximum(positive, negative), 1e-9)
+        confidence = np.abs(score) * (1.0 - 0.5 ** hits) * (1.0 - mixed)
+        lengths = np.fromiter((len(text.strip()) for text in texts), dtype=np.int64, count=n)
+        ambiguous = (lengths > 0) & ((confidence < self.ambiguous_below) | (mixed >= 0.5))
+
+        keyword = scored | (kind == _ASPECT)
+        return {
+            'score': score,
+            'label': label,
+            'confidence': confidence,
+            'ambiguous': ambiguous,
+            'hits': hits.astype(np.int64),
+            'keyword_rows': rows[keyword],
+            'keyword_ids': ids[keyword],
+        }
+
+    def keywords(self, result: Dict[str, np.ndarray], n: int) -> List[List[str]]:
+        """每条评论的关键词：命中的评论维度在前，其后为情感词，去重后最多max_keywords个"""
+        aspects = [[] for _ in range(n)]
+        words = [[] for _ in range(n)]
+        for row, term_id in zip(result['keyword_rows'].tolist(), result['keyword_ids'].tolist()):
+            aspect = self._aspect[term_id]
+            if aspect and aspect not in aspects[row]:
+                aspects[row].append(aspect)
+            if self._kind[term_id] == _SENTIMENT and self.terms[term_id] not in words[row]:
+                words[row].append(self.terms[term_id])
+        return [(aspects[i] + words[i])[:self.max_keywords] for i in range(n)]
+
+    def annotate(self, comments: Sequence) -> int:
+        """为一批评论（CommentRecord或dict）写入sentiment字段，返回需要远程复核的条数"""
+        if not comments:
+            return 0
+        texts = [comment.get('content') or '' for comment in comments]
+        result = self.score_texts(texts)
+        keywords = self.keywords(result, len(texts))
+        score = np.round(result['score'], 4).tolist()
+        confidence = np.round(result['confidence'], 4).tolist()
+        label = result['label'].tolist()
+        ambiguous = result['ambiguous'].tolist()
+        for i, comment in enumerate(comments):
+            comment['sentiment'] = {
+                'label': LABELS[label[i]],
+                'score': score[i],
+                'confidence': confidence[i],
+                'ambiguous': ambiguous[i],
+                'keywords': keywords[i]
+            }
+        return int(result['ambiguous'].sum())
+
+    def top_keywords(self, texts: Sequence[str], k: int = 20) -> List[tuple]:
+        """一批文本中出现最多的维度和情感词: [(词, 次数), ...]"""
+        result = self.score_texts(texts)
+        counts = np.bincount(result['keyword_ids'], minlength=len(self.terms))
+        totals = {}
+        for term_id in np.nonzero(counts)[0].tolist():
+            word = self._aspect[term_id] or self.terms[term_id]
+            totals[word] = totals.get(word, 0) + int(counts[term_id])
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def frequent_ngrams(texts: Iterable[str], n: int = 2, k: int = 20) -> List[tuple]:
+    """统计一批文本中出现最多的汉字n-gram（不限于词典），用于发现词典未覆盖的高频说法"""
+    if n < 1:
+        raise ValueError(f"n必须为正整数: {n}")
+    joined = '\n'.join(texts)
+    if len(joined) < n:
+        return []
+    codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+    cjk = (codes >= 0x4E00) & (codes <= 0x9FFF)
+    # 长度为n的滑动窗口全部是汉字才计数；按行对窗口内的码位去重，不做算术打包，任意n都不会溢出
+    windows = np.lib.stride_tricks.sliding_window_view(codes, n)
+    mask = np.lib.stride_tricks.sliding_window_view(cjk, n).all(axis=1)
+    if not mask.any():
+        return []
+    values, counts = np.unique(windows[mask], axis=0, return_counts=True)
+    top = np.argsort(counts)[::-1][:k]
+    return [(''.join(map(chr, values[i].tolist())), int(counts[i])) for i in top.tolist()]
+
+
+def backfill(db_reader, scorer: SentimentScorer, product_id: Optional[str] = None, batch_size: int = 2000) -> int:
+    """为数据库中已有评论计算并写入情感分，返回处理的评论数"""
+    if product_id:
+        product_ids = [product_id]
+    else:
+        with db_reader.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT product_id FROM comments")
+            product_ids = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+
+    total = 0
+    for pid in product_ids:
+        batch = []
+        for comment in db_reader.iter_comments(pid, ['id', 'content'], batch_size=batch_size):
+            batch.append(comment)
+            if len(batch) >= batch_size:
+                total += db_reader.update_comment_sentiment(batch, scorer)
+                batch = []
+        if batch:
+            total += db_reader.update_comment_sentiment(batch, scorer)
+        print(f"🧠 {pid}: 已打分")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地情感与关键词打分')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    score_parser = subparsers.add_parser('score', help='对快照存储中某商品的评论打分')
+    score_parser.add_argument('product_id')
+    score_parser.add_argument('--ambiguous', action='store_true', help='输出需要远程复核的评论')
+
+    backfill_parser = subparsers.add_parser('backfill', help='为数据库中已有评论补写情感分')
+    backfill_parser.add_argument('--product-id', help='只处理指定商品，默认全部商品')
+    args = parser.parse_args()
+
+    scorer = SentimentScorer.from_env() or SentimentScorer()
+    if args.command == 'score':
+        from snapshot_store import DEFAULT_SNAPSHOT_DIR, SnapshotStore
+        comments = SnapshotStore(os.getenv('SNAPSHOT_DIR') or DEFAULT_SNAPSHOT_DIR).load(args.product_id)
+        ambiguous = scorer.annotate(comments)
+        labels = {}
+        for comment in comments:
+            labels[comment.sentiment['label']] = labels.get(comment.sentiment['label'], 0) + 1
+        texts = [comment.content for comment in comments]
+        print(f"📊 {len(comments)} 条评论: {labels}，需要远程复核 {ambiguous} 条")
+        print(f"🔑 关键词: {scorer.top_keywords(texts, 15)}")
+        print(f"🔤 高频二字组: {frequent_ngrams(texts, 2, 15)}")
+        if args.ambiguous:
+            for comment in comments:
+                if comment.sentiment['ambiguous']:
+                    print(json.dumps({'content': comment.content, 'sentiment': comment.sentiment}, ensure_ascii=False))
+    elif args.command == 'backfill':
+        from database_reader import DatabaseReader
+        total = backfill(DatabaseReader(), scorer, args.product_id)
+        print(f"✅ 情感分回填完成: {total} 条评论")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+多账号会话池 - 每个账号（一组cookies）独立的HTTP会话、mtop令牌、限速器和健康状态，翻页请求在健康账号间轮转
+使用方法:
+    python3 session_pool.py            # 查看spider_configs中可用的账号
+
+被限流的账号进入冷却期（连续限流时冷却时间翻倍），冷却结束后自动回到轮转；
+令牌过期且无法从会话cookies刷新的账号视为登录态失效，移出轮转直到重新加载配置。
+每个账号各自限速，总吞吐随健康账号数线性增长。
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+from rate_limiter import RateLimiter
+from token_manager import TokenManager
+
+HEALTHY = 'healthy'
+COOLING = 'cooling'
+EXPIRED = 'expired'
+
+
+def parse_cookie_string(cookie_string: str) -> Dict[str, str]:
+    """解析"k1=v1; k2=v2"格式的cookie字符串"""
+    cookies = {}
+    if cookie_string:
+        for item in cookie_string.split('; '):
+            if '=' in item:
+                key, value = item.split('=', 1)
+                cookies[key] = value
+    return cookies
+
+
+class AccountSession:
+    """单个账号：独立的requests会话（连接池和cookies）、令牌、限速器和健康状态"""
+
+    def __init__(self, name: str, cookies: str, rate: Optional[float] = None):
+        self.name = name
+        self.cookies_str = cookies
+        self.session = requests.Session()
+        parsed = parse_cookie_string(cookies)
+        if parsed:
+            self.session.cookies.update(parsed)
+        self.tokens = TokenManager(self.session, parsed)
+        self.limiter = RateLimiter(rate)
+        self.pool_maxsize = 10
+
+        self.state = HEALTHY
+        self.cooldown_until = 0.0
+        # 连续限流次数，决定下一次冷却时长
+        self.strikes = 0
+        self.last_error = ''
+        self.stats = {'requests': 0, 'successes': 0, 'throttled': 0, 'errors': 0, 'cooldowns': 0}
+
+    def ensure_pool_size(self, size: int):
+        """保证连接池足够容纳并发请求"""
+        if size <= self.pool_maxsize:
+            return
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.pool_maxsize = size
+
+    def to_dict(self) -> Dict:
+        cooldown = max(0.0, self.cooldown_until - time.monotonic()) if self.state == COOLING else 0.0
+        return dict(self.stats, name=self.name, state=self.state, cooldown=round(cooldown, 1),
+                    token_refreshes=self.tokens.refresh_count, last_error=self.last_error)
+
+
+class SessionPool:
+    """账号会话池：acquire按轮转顺序取一个健康账号，请求结束后用report_*回报结果以更新健康状态"""
+
+    def __init__(self, accounts: Iterable[AccountSession], cooldown: float = 60.0, max_cooldown: float = 900.0):
+        self.accounts = list(accounts)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_cookies(cls, cookie_strings: Iterable[str], rate: Optional[float] = None, **kwargs) -> 'SessionPool':
+        """按cookies建池，相同的cookies只保留一个账号，账号名为cookies的短哈希"""
+        accounts = []
+        seen = set()
+        for cookies in cookie_strings:
+            cookies = (cookies or '').strip()
+            if not cookies or cookies in seen:
+                continue
+            seen.add(cookies)
+            name = hashlib.md5(cookies.encode('utf-8')).hexdigest()[:8]
+            accounts.append(AccountSession(name, cookies, rate))
+        return cls(accounts, **kwargs)
+
+    @classmethod
+    def from_configs(cls, configs: Iterable[Dict], rate: Optional[float] = None, extra_cookies: Iterable[str] = (),
+                     **kwargs) -> 'SessionPool':
+        """从spider_configs的记录（如get_all_spider_configs的结果）建池，跳过未启用的配置"""
+        cookie_strings = [config.get('cookies') for config in configs
+                          if config.get('is_active') is None or config.get('is_active')]
+        return cls.from_cookies(list(extra_cookies) + cookie_strings, rate, **kwargs)
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def _refresh_states(self, now: float):
+        """冷却期结束的账号回到轮转（调用方持有锁）"""
+        for account in self.accounts:
+            if account.state == COOLING and account.cooldown_until <= now:
+                account.state = HEALTHY
+                print(f"🔄 账号 {account.name} 冷却结束，重新加入轮转")
+
+    def healthy_count(self) -> int:
+        with self._lock:
+            self._refresh_states(time.monotonic())
+            return sum(1 for account in self.accounts if account.state == HEALTHY)
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[AccountSession]:
+        """按轮转顺序取一个健康账号并占用它的一个限速令牌
+
+        所有账号都在冷却时等待最早结束冷却的账号（最多timeout秒）；
+        没有可用账号（全部失效或等待超时）时返回None。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refresh_states(now)
+                account = None
+                for offset in range(len(self.accounts)):
+                    candidate = self.accounts[(self._next + offset) % len(self.accounts)]
+                    if candidate.state == HEALTHY:
+                        account = candidate
+                        self._next = (self._next + offset + 1) % len(self.accounts)
+                        break
+                if account is None:
+                    cooling = [a.cooldown_until for a in self.accounts if a.state == COOLING]
+                    if not cooling:
+                        return None
+                    wait = min(cooling) - now
+                    if deadline is not None:
+                        if now >= deadline:
+                            return None
+                        wait = min(wait, deadline - now)
+            if account is not None:
+                account.limiter.acquire()
+                with self._lock:
+                    account.stats['requests'] += 1
+                return account
+            with metrics.timer('session_pool_wait_seconds'):
+                time.sleep(max(wait, 0.01))
+
+    def report_success(self, account: AccountSession):
+        with self._lock:
+            account.stats['successes'] += 1
+            account.strikes = 0
+
+    def report_error(self, account: AccountSession, error: str = ''):
+        """网络异常、5xx等与账号无关的错误只计数，不影响健康状态"""
+        with self._lock:
+            account.stats['errors'] += 1
+            account.last_error = error
+
+    def report_throttle(self, account: AccountSession, error: str = ''):
+        """账号被限流：进入冷却期，连续限流时冷却时间翻倍（不超过max_cooldown）"""
+        with self._lock:
+            account.stats['throttled'] += 1
+            account.last_error = error
+            # 并发在途的请求可能同时被限流，已在冷却中的账号不重复加倍冷却时间
+            if account.state != HEALTHY:
+                return
+            account.strikes += 1
+            duration = min(self.max_cooldown, self.cooldown * (2 ** (account.strikes - 1)))
+            account.state = COOLING
+            account.cooldown_until = time.monotonic() + duration
+            account.stats['cooldowns'] += 1
+        metrics.inc('session_pool_cooldowns_total', account=account.name)
+        print(f"🧊 账号 {account.name} 被限流，冷却 {duration:.0f}s")
+
+    def report_expired(self, account: AccountSession, error: str = ''):
+        """令牌过期且无法刷新：登录态失效，移出轮转"""
+        with self._lock:
+            if account.state == EXPIRED:
+                return
+            account.state = EXPIRED
+            account.last_error = error
+        metrics.inc('session_pool_expired_total', account=account.name)
+        print(f"⛔ 账号 {account.name} 登录态失效，已移出轮转: {error}")
+
+    def ensure_pool_size(self, size: int):
+        for account in self.accounts:
+            account.ensure_pool_size(size)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._refresh_states(time.monotonic())
+            accounts = [account.to_dict() for account in self.accounts]
+        return {
+            'accounts': len(accounts),
+            'healthy': sum(1 for account in accounts if account['state'] == HEALTHY),
+            'cooling': sum(1 for account in accounts if account['state'] == COOLING),
+            'expired': sum(1 for account in accounts if account['state'] == EXPIRED),
+            'per_account': accounts
+        }
+
+
+def load_session_pool(db_reader=None, extra_cookies: Iterable[str] = (), rate: Optional[float] = None,
+                      enabled: Optional[bool] = None) -> Optional[SessionPool]:
+    """按环境变量建池：SESSION_POOL=true（或enabled=True）时启用，账号来自spider_configs中的全部cookies和extra_cookies
+
+    rate为每个账号的每秒请求数（None表示不限速），SESSION_COOLDOWN为首次限流的冷却秒数（默认60），
+    SESSION_MAX_COOLDOWN为冷却上限（默认900）。不足一个账号时返回None。
+    """
+    if enabled is None:
+        enabled = os.getenv('SESSION_POOL', 'false').lower() == 'true'
+    if not enabled:
+        return None
+    configs: List[Dict] = []
+    if db_reader is not None:
+        try:
+            configs = db_reader.get_all_spider_configs()
+        except Exception as e:
+            print(f"⚠️ 读取账号配置失败: {e}")
+    pool = SessionPool.from_configs(
+        configs, rate=rate, extra_cookies=extra_cookies,
+        cooldown=float(os.getenv('SESSION_COOLDOWN', '60')),
+        max_cooldown=float(os.getenv('SESSION_MAX_COOLDOWN', '900'))
+    )
+    if not len(pool):
+        print("⚠️ 没有可用的账号cookies，不启用会话池")
+        return None
+    print(f"👥 会话池已启用: {len(pool)} 个账号")
+    return pool
+
+
+def main():
+    from database_reader import DatabaseReader
+
+    pool = load_session_pool(DatabaseReader(), [os.getenv('COOKIES', '')], enabled=True)
+    if pool is None:
+        return
+    for account in pool.accounts:
+        print(f"   - {account.name}: cookies长度 {len(account.cookies_str)}，"
+              f"令牌{'已设置' if account.tokens.token else '缺失'}")
+
+
+if __name__ == "__main__":
+    main()
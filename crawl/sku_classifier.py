@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+SKU品类分类器 - 把各品类的关键词编译成一个Aho-Corasick自动机，一次扫描SKU文本即可得到所有品类的命中
+使用方法:
+    python3 sku_classifier.py "黑拉丝礼盒装送火石" "金竖条礼盒送火石+200ml毫升气体"
+
+品类配置来自SKU_CATEGORIES_FILE指定的JSON文件、数据库sku_categories表或内置的sku_categories.json，
+格式为 [{"category": "打火机", "product_name": "打火机商品", "keywords": {"打火机": 3, "火石": 2}}, ...]。
+按页累加（CategoryTally），爬取结束时根据全部评论给出品类和置信度。
+"""
+
+import argparse
+import json
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_CATEGORIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sku_categories.json')
+DEFAULT_PRODUCT_NAME = '商品'
+
+
+class AhoCorasick:
+    """多模式串匹配自动机：构建后对任意文本一次线性扫描，报告所有（可重叠的）模式串命中"""
+
+    def __init__(self, patterns: Iterable[str]):
+        # goto[state]: {字符: 下一状态}；outputs[state]: 在该状态结束的模式串编号
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [()]
+        self.patterns = []
+        for pattern in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append(())
+                state = next_state
+            self.outputs[state] += (len(self.patterns),)
+            self.patterns.append(pattern)
+
+        # 按层次遍历设置失败指针，并把失败链上的输出合并到每个状态；
+        # 同时把失败链展开成完整的转移表delta，扫描时每个字符只需一次字典查找
+        self.delta = [dict(self.goto[0])] + [None] * (len(self.goto) - 1)
+        queue = deque(self.goto[0].values())
+        for state in queue:
+            self.delta[state] = dict(self.delta[0])
+            self.delta[state].update(self.goto[state])
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] += self.outputs[self.fail[next_state]]
+                self.delta[next_state] = dict(self.delta[self.fail[next_state]])
+                self.delta[next_state].update(self.goto[next_state])
+
+    def iter_matches(self, text: str):
+        """逐个产出text中命中的模式串编号（同一模式串出现多次时产出多次）"""
+        delta, outputs = self.delta, self.outputs
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                yield from outputs[state]
+
+    def matches(self, text: str) -> set:
+        """text中命中的模式串编号集合"""
+        delta, outputs = self.delta, self.outputs
+        found = set()
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+
+class Classification:
+    """分类结果：品类、对应的商品名称、置信度（0~1）和各品类得分"""
+
+    __slots__ = ('category', 'product_name', 'confidence', 'scores', 'comments')
+
+    def __init__(self, category: Optional[str], product_name: str, confidence: float, scores: Dict[str, float],
+                 comments: int):
+        self.category = category
+        self.product_name = product_name
+        self.confidence = confidence
+        self.scores = scores
+        self.comments = comments
+
+    def to_dict(self) -> Dict:
+        return {
+            'category': self.category,
+            'product_name': self.product_name,
+            'confidence': self.confidence,
+            'scores': self.scores,
+            'comments': self.comments
+        }
+
+    def __repr__(self):
+        return f"Classification({self.to_dict()!r})"
+
+
+class SkuClassifier:
+    """按SKU（和评论内容）文本给商品归类
+
+    每条评论对每个品类的得分为命中的不同关键词权重之和，评论内容的命中乘以content_weight；
+    品类总分为所有评论得分之和。置信度 = 最高分占全部得分的比例 × 有命中的评论中命中该品类的比例
+    × 证据量系数（1 - 0.5^有命中的评论数）× 证据强度系数（命中评论的平均得分 / evidence_floor，不超过1），
+    没有SKU也没有关键词的评论不影响置信度；只命中弱关键词（如"拉丝"）时证据强度不足，不会给出高置信度。
+    """
+
+    def __init__(self, categories: List[Dict], min_confidence: float = 0.2, content_weight: float = 0.3,
+                 evidence_floor: float = 2.0):
+        self.categories = [category['category'] for category in categories]
+        self.product_names = {category['category']: category.get('product_name') or f"{category['category']}商品"
+                              for category in categories}
+        self.min_confidence = min_confidence
+        self.content_weight = content_weight
+        self.evidence_floor = evidence_floor
+        # 同一关键词可属于多个品类，自动机中每个关键词只出现一次
+        keyword_targets = {}
+        for index, category in enumerate(categories):
+            for keyword, weight in category['keywords'].items():
+                keyword_targets.setdefault(keyword, []).append((index, float(weight)))
+        self.automaton = AhoCorasick(keyword_targets)
+        self._targets = [tuple(keyword_targets[keyword]) for keyword in self.automaton.patterns]
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_CATEGORIES_FILE, **kwargs) -> 'SkuClassifier':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict], **kwargs) -> 'SkuClassifier':
+        """从sku_categories表的行（category, product_name, keyword, weight）构建"""
+        categories = {}
+        for row in rows:
+            category = categories.setdefault(row['category'], {
+                'category': row['category'], 'product_name': row.get('product_name'), 'keywords': {}
+            })
+            category['keywords'][row['keyword']] = float(row.get('weight') or 1)
+        return cls(list(categories.values()), **kwargs)
+
+    def score_text(self, text: str, weight: float, scores: List[float]) -> bool:
+        """把一段文本的命中得分累加到scores（按品类下标），返回是否有命中"""
+        if not text:
+            return False
+        matched = False
+        targets = self._targets
+        for pattern in self.automaton.matches(text):
+            for index, keyword_weight in targets[pattern]:
+                scores[index] += keyword_weight * weight
+                matched = True
+        return matched
+
+    def tally(self) -> 'CategoryTally':
+        return CategoryTally(self)
+
+    def classify(self, comments: Iterable) -> Classification:
+        """对一批评论一次性分类"""
+        tally = self.tally()
+        tally.add(comments)
+        return tally.result()
+
+    def classify_skus(self, skus: Iterable[str]) -> Classification:
+        """只根据SKU文本分类（如接口原始rateList的skuValueStr）"""
+        return self.classify({'sku_info': sku} for sku in skus)
+
+
+class CategoryTally:
+    """跨页累加的品类得分：每页评论到达时调用add，随时可用result读取当前结果（线程安全）"""
+
+    def __init__(self, classifier: SkuClassifier):
+        self.classifier = classifier
+        self.scores = [0.0] * len(classifier.categories)
+        self.hits = [0] * len(classifier.categories)
+        self.comments = 0
+        self.matched = 0
+        self._lock = threading.Lock()
+
+    def add(self, comments: Iterable) -> None:
+        classifier = self.classifier
+        size = len(classifier.categories)
+        scores = [0.0] * size
+        hits = [0] * size
+        count = matched = 0
+        for comment in comments:
+            count += 1
+            comment_scores = [0.0] * size
+            found = classifier.score_text(comment.get('sku_info') or '', 1.0, comment_scores)
+            if classifier.content_weight:
+                found = classifier.score_text(comment.get('content') or '', classifier.content_weight,
+                                              comment_scores) or found
+            if not found:
+                continue
+            matched += 1
+            for index, score in enumerate(comment_scores):
+                if score:
+                    scores[index] += score
+                    hits[index] += 1
+        with self._lock:
+            self.comments += count
+            self.matched += matched
+            for index in range(size):
+                self.scores[index] += scores[index]
+                self.hits[index] += hits[index]
+
+    def result(self) -> Classification:
+        classifier = self.classifier
+        with self._lock:
+            scores = list(self.scores)
+            hits = list(self.hits)
+            comments = self.comments
+            matched = self.matched
+        total = sum(scores)
+        named = {classifier.categories[i]: round(score, 2) for i, score in enumerate(scores) if score}
+        if not total or not matched:
+            return Classification(None, DEFAULT_PRODUCT_NAME, 0.0, named, comments)
+        best = max(range(len(scores)), key=scores.__getitem__)
+        # 相对占比之外还要求绝对证据：命中该品类的评论平均得分达到evidence_floor才不打折扣
+        strength = min(1.0, scores[best] / hits[best] / classifier.evidence_floor) if classifier.evidence_floor else 1.0
+        confidence = round(scores[best] / total * hits[best] / matched * (1 - 0.5 ** matched) * strength, 4)
+        if confidence < classifier.min_confidence:
+            return Classification(None, DEFAULT_PRODUCT_NAME, confidence, named, comments)
+        category = classifier.categories[best]
+        return Classification(category, classifier.product_names[category], confidence, named, comments)
+
+
+_default_lock = threading.Lock()
+_default_cache = {}
+
+
+def load_classifier(db_reader=None) -> SkuClassifier:
+    """按配置加载分类器：SKU_CATEGORIES_FILE > 数据库sku_categories表 > 内置sku_categories.json
+
+    文件按修改时间、数据库按DatabaseReader的配置缓存复用已构建的分类器。
+    """
+    options = {
+        'min_confidence': float(os.getenv('SKU_MIN_CONFIDENCE', '0.2')),
+        'content_weight': float(os.getenv('SKU_CONTENT_WEIGHT', '0.3')),
+        'evidence_floor': float(os.getenv('SKU_EVIDENCE_FLOOR', '2'))
+    }
+    path = os.getenv('SKU_CATEGORIES_FILE')
+    if not path and db_reader is not None:
+        rows = db_reader.get_sku_categories()
+        if rows:
+            with _default_lock:
+                cached = _default_cache.get('db')
+                if cached is None or cached[0] is not rows:
+                    cached = _default_cache['db'] = (rows, SkuClassifier.from_rows(rows, **options))
+            return cached[1]
+    path = path or DEFAULT_CATEGORIES_FILE
+    key = (path, os.path.getmtime(path))
+    with _default_lock:
+        classifier = _default_cache.get(key)
+        if classifier is None:
+            classifier = _default_cache[key] = SkuClassifier.from_file(path, **options)
+    return classifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SKU品类分类器')
+    parser.add_argument('skus', nargs='+', help='SKU文本')
+    parser.add_argument('--file', help='品类配置JSON文件，默认按SKU_CATEGORIES_FILE或内置配置')
+    args = parser.parse_args()
+
+    classifier = SkuClassifier.from_file(args.file) if args.file else load_classifier()
+    print(json.dumps(classifier.classify_skus(args.skus).to_dict(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+评论快照存储 - 每个商品一个只追加的压缩数据文件和一个定长索引文件，取代output/下每次运行一个的JSON文件
+使用方法:
+    python3 snapshot_store.py migrate [--remove]        # 把output/comments_*.json迁移到快照存储
+    python3 snapshot_store.py stats                     # 查看各商品的评论数和磁盘占用
+    python3 snapshot_store.py export 842926327290 --since 2025-09-01 --until 2025-09-30
+
+文件格式（<商品ID>.snap / <商品ID>.idx）:
+    .snap  由数据块顺序组成，每块为 4字节长度 + zlib压缩的JSON数组，数组元素为按FIELDS顺序排列的评论字段
+    .idx   每条评论一个31字节的定长记录: 自然键MD5(16) + 日期YYYYMMDD(4) + 评分(1) + 块偏移(8) + 块内序号(2)
+追加时按自然键去重，跨运行重复的评论只保存一次；按日期读取时只解压命中的数据块。
+块内序号为2字节，一次追加超过65535条评论时拆分为多个数据块。
+"""
+
+import argparse
+import fcntl
+import glob
+import json
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from comment_record import CommentRecord, json_default
+from database_reader import comment_key
+from watermark import date_key
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output', 'snapshots')
+
+FIELDS = CommentRecord.FIELDS
+_BLOCK_HEADER = struct.Struct('<I')
+_INDEX_ENTRY = struct.Struct('<16sIBQH')
+# 块内序号为无符号2字节，每个数据块最多容纳的评论数
+_MAX_BLOCK_ROWS = 0xFFFF
+_CAPTURE_PATTERN = re.compile(r'comments_(\d+)_(\d+)\.json$')
+
+
+class IndexEntry:
+    """索引中的一条评论"""
+
+    __slots__ = ('digest', 'date', 'rating', 'offset', 'position')
+
+    def __init__(self, digest: bytes, date: int, rating: int, offset: int, position: int):
+        self.digest = digest
+        self.date = date
+        self.rating = rating
+        self.offset = offset
+        self.position = position
+
+
+class _ProductIndex:
+    """单个商品已加载到内存的索引"""
+
+    def __init__(self):
+        self.entries = []
+        self.digests = set()
+        self.loaded_bytes = 0
+
+
+class SnapshotStore:
+    """按商品分文件的只追加快照存储（线程安全；多进程追加同一商品时用文件锁串行化）"""
+
+    def __init__(self, directory: str = DEFAULT_SNAPSHOT_DIR, compress_level: int = 6):
+        self.directory = directory
+        self.compress_level = compress_level
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, product_id: str):
+        base = os.path.join(self.directory, str(product_id))
+        return base + '.snap', base + '.idx'
+
+    def products(self) -> List[str]:
+        """已有快照的商品ID"""
+        return sorted(os.path.basename(path)[:-5] for path in glob.glob(os.path.join(self.directory, '*.snap')))
+
+    def _refresh_index(self, product_id: str) -> _ProductIndex:
+        """读取索引文件中尚未加载的部分（其他进程可能追加过）"""
+        index = self._indexes.get(product_id)
+        if index is None:
+            index = self._indexes[product_id] = _ProductIndex()
+        snap_path, idx_path = self._paths(product_id)
+        try:
+            with open(idx_path, 'rb') as f:
+                f.seek(index.loaded_bytes)
+                data = f.read()
+        except FileNotFoundError:
+            return index
+        # 只处理完整的记录，并忽略指向数据文件末尾之外的记录（写数据成功但索引未写完时崩溃）
+        usable = len(data) - len(data) % _INDEX_ENTRY.size
+        snap_size = os.path.getsize(snap_path) if os.path.exists(snap_path) else 0
+        for values in _INDEX_ENTRY.iter_unpack(data[:usable]):
+            entry = IndexEntry(*values)
+            if entry.offset < snap_size and entry.digest not in index.digests:
+                index.digests.add(entry.digest)
+                index.entries.append(entry)
+        index.loaded_bytes += usable
+        return index
+
+    def append(self, product_id: str, comments: Iterable[Dict]) -> int:
+        """追加评论，已存在的评论（按自然键）跳过，返回新写入的条数"""
+        product_id = str(product_id)
+        os.makedirs(self.directory, exist_ok=True)
+        snap_path, idx_path = self._paths(product_id)
+        with self._lock, open(snap_path, 'ab') as snap:
+            fcntl.flock(snap, fcntl.LOCK_EX)
+            try:
+                index = self._refresh_index(product_id)
+                rows = []
+                digests = []
+                seen = set()
+                for comment in comments:
+                    digest = bytes.fromhex(comment_key(product_id, comment))
+                    if digest in index.digests or digest in seen:
+                        continue
+                    seen.add(digest)
+                    digests.append(digest)
+                    rows.append([comment.get(field) for field in FIELDS])
+                if not rows:
+                    return 0
+
+                # 先压缩数据块并打包全部索引记录，出错时数据文件保持不变，不会留下没有索引的数据块
+                blocks = []
+                entries = []
+                records = []
+                offset = snap.seek(0, os.SEEK_END)
+                for start in range(0, len(rows), _MAX_BLOCK_ROWS):
+                    block_rows = rows[start:start + _MAX_BLOCK_ROWS]
+                    payload = zlib.compress(
+                        json.dumps(block_rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                        self.compress_level)
+                    for position, (digest, row) in enumerate(zip(digests[start:], block_rows)):
+                        entry = IndexEntry(digest, date_key(row[3] or ''), max(0, min(255, int(row[2] or 0))),
+                                           offset, position)
+                        entries.append(entry)
+                        records.append(_INDEX_ENTRY.pack(entry.digest, entry.date, entry.rating,
+                                                         entry.offset, entry.position))
+                    blocks.append(_BLOCK_HEADER.pack(len(payload)) + payload)
+                    offset += len(blocks[-1])
+
+                snap.write(b''.join(blocks))
+                snap.flush()
+                with open(idx_path, 'ab') as idx:
+                    # 丢弃上次崩溃留下的不完整记录，保证记录对齐
+                    idx.truncate(index.loaded_bytes)
+                    idx.write(b''.join(records))
+                index.entries.extend(entries)
+                index.digests.update(digests)
+                index.loaded_bytes += len(records) * _INDEX_ENTRY.size
+                return len(rows)
+            finally:
+                fcntl.flock(snap, fcntl.LOCK_UN)
+
+    def index(self, product_id: str) -> List[IndexEntry]:
+        """商品的全部索引记录（按写入顺序）"""
+        with self._lock:
+            return list(self._refresh_index(str(product_id)).entries)
+
+    def count(self, product_id: str) -> int:
+        return len(self.index(product_id))
+
+    def load(self, product_id: str, since: Optional[str] = None, until: Optional[str] = None,
+             ratings: Optional[Iterable[int]] = None) -> List[CommentRecord]:
+        """读取评论，可按日期闭区间（如"2025-09-01"或"2025年9月1日"）和评分过滤，只解压命中的数据块"""
+        since_key = date_key(since) if since else 0
+        until_key = date_key(until) if until else 0
+        ratings = set(ratings) if ratings is not None else None
+        wanted = {}
+        for entry in self.index(product_id):
+            if since_key and entry.date < since_key:
+                continue
+            if until_key and entry.date > until_key:
+                continue
+            if ratings is not None and entry.rating not in ratings:
+                continue
+            wanted.setdefault(entry.offset, []).append(entry.position)
+
+        comments = []
+        if not wanted:
+            return comments
+        snap_path, _ = self._paths(str(product_id))
+        with open(snap_path, 'rb') as snap:
+            for offset in sorted(wanted):
+                snap.seek(offset)
+                (length,) = _BLOCK_HEADER.unpack(snap.read(_BLOCK_HEADER.size))
+                rows = json.loads(zlib.decompress(snap.read(length)))
+                for position in wanted[offset]:
+                    comments.append(CommentRecord(*rows[position]))
+        return comments
+
+    def disk_usage(self, product_id: str) -> int:
+        return sum(os.path.getsize(path) for path in self._paths(str(product_id)) if os.path.exists(path))
+
+
+def _read_capture(path: str) -> List[Dict]:
+    """读取旧的抓取文件：评论数组，或包含comments字段的完整输出"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('comments', []) if isinstance(data, dict) else data
+
+
+def migrate(output_dir: str, store: SnapshotStore, remove: bool = False) -> Dict:
+    """把output/comments_<id>_<ts>.json按时间顺序追加到快照存储，返回迁移统计"""
+    captures = []
+    for path in glob.glob(os.path.join(output_dir, 'comments_*.json')):
+        match = _CAPTURE_PATTERN.search(os.path.basename(path))
+        if match:
+            captures.append((int(match.group(2)), match.group(1), path))
+
+    summary = {'files': 0, 'failed': 0, 'comments': 0, 'stored': 0, 'json_bytes': 0}
+    migrated = []
+    for _, product_id, path in sorted(captures):
+        try:
+            comments = _read_capture(path)
+        except (OSError, ValueError) as e:
+            print(f"❌ 跳过 {os.path.basename(path)}: {e}")
+            summary['failed'] += 1
+            continue
+        stored = store.append(product_id, comments)
+        summary['files'] += 1
+        summary['comments'] += len(comments)
+        summary['stored'] += stored
+        summary['json_bytes'] += os.path.getsize(path)
+        migrated.append(path)
+        print(f"📦 {os.path.basename(path)}: {len(comments)} 条，新增 {stored} 条")
+
+    summary['snapshot_bytes'] = sum(store.disk_usage(product_id) for product_id in store.products())
+    if remove:
+        for path in migrated:
+            os.remove(path)
+    summary['removed'] = len(migrated) if remove else 0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评论快照存储')
+    parser.add_argument('--dir', default=os.getenv('SNAPSHOT_DIR') or DEFAULT_SNAPSHOT_DIR, help='快照目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help='迁移output/下的comments_*.json')
+    migrate_parser.add_argument('--output-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output'))
+    migrate_parser.add_argument('--remove', action='store_true', help='迁移成功后删除原JSON文件')
+
+    subparsers.add_parser('stats', help='各商品的评论数和磁盘占用')
+
+    export_parser = subparsers.add_parser('export', help='按日期范围导出评论JSON')
+    export_parser.add_argument('product_id')
+    export_parser.add_argument('--since', help='起始日期（含），如2025-09-01')
+    export_parser.add_argument('--until', help='截止日期（含）')
+    export_parser.add_argument('--rating', type=int, action='append', help='只导出指定评分，可重复')
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.dir)
+    if args.command == 'migrate':
+        summary = migrate(args.output_dir, store, remove=args.remove)
+        print(f"\n✅ 迁移完成: {summary['files']} 个文件，{summary['comments']} 条评论，去重后 {summary['stored']} 条")
+        print(f"   JSON文件 {summary['json_bytes'] / 1024:.1f}KB → 快照 {summary['snapshot_bytes'] / 1024:.1f}KB")
+        if summary['removed']:
+            print(f"   已删除 {summary['removed']} 个原JSON文件")
+        elif summary['files']:
+            print("   原JSON文件已保留，确认无误后可使用 --remove 删除")
+    elif args.command == 'stats':
+        for product_id in store.products():
+            print(f"{product_id}: {store.count(product_id)} 条评论，{store.disk_usage(product_id) / 1024:.1f}KB")
+    elif args.command == 'export':
+        comments = store.load(args.product_id, args.since, args.until, args.rating)
+        json.dump(comments, sys.stdout, ensure_ascii=False, indent=2, default=json_default)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,63 @@
 """
 淘宝/天猫商品评论爬虫 - 主程序
 使用方法: python3 spider.py
+
+每次爬取都会启动一个新进程，启动开销计入每次爬取：NumPy（本地情感打分）、mysql.connector（数据库）、
+fake_useragent、Pillow（缩略图）都在用到时才导入，启动耗时见 benchmarks/bench_startup.py。
 """
 
 import requests
 import time
 import json
 import urllib.parse
-import re
 import hashlib
+import math
 import os
-from fake_useragent import UserAgent
+import random
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from checkpoint import CheckpointStore
+from comment_record import json_default
 from database_reader import DatabaseReader
+from image_store import ImageFetcher
+from metrics import metrics
+from mtop_response import decode_jsonp, format_comments
+from pipeline import Pipeline
+from rate_limiter import AdaptiveRateLimiter, RateLimiter
+from session_pool import load_session_pool, parse_cookie_string
+from sku_classifier import load_classifier
+from snapshot_store import DEFAULT_SNAPSHOT_DIR, SnapshotStore
+from token_manager import TokenManager, is_token_error, parse_token
+from watermark import Watermark
 
 
 class TmallCommentSpider:
     """天猫商品评论爬虫"""
     
-    def __init__(self, cookies=None):
+    DEFAULT_BASE_URL = "https://h5api.m.tmall.com/h5/mtop.taobao.rate.detaillist.get/6.0/"
+
+    def __init__(self, cookies=None, base_url=None, rate_limiter=None, session_pool=None):
         self.session = requests.Session()
-        self.ua = UserAgent()
-        self.base_url = "https://h5api.m.tmall.com/h5/mtop.taobao.rate.detaillist.get/6.0/"
+        self._ua = None
+        # base_url可指向本地的mtop模拟服务，便于测试和基准测试
+        self.base_url = base_url or self.DEFAULT_BASE_URL
         self.cookies_str = cookies
+        # 可选的共享限速器，所有get_comments请求都会经过它
+        self.rate_limiter = rate_limiter
+        # 可选的多账号会话池，启用后每次请求从池中轮转取一个健康账号的会话和令牌
+        self.session_pool = session_pool
+        self._pool_maxsize = 10
+        # 从评论SKU推断商品品类的分类器，crawl_product可传入按数据库配置加载的分类器
+        self.sku_classifier = load_classifier()
+        
+        # 重试策略和请求统计
+        self.max_retries = int(os.getenv('MAX_RETRIES', '3'))
+        self.retry_backoff = float(os.getenv('RETRY_BACKOFF', '0.5'))
+        self.retry_backoff_max = 10.0
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'failures': 0, 'token_refreshes': 0}
+        self._stats_lock = threading.Lock()
         
         # 设置请求头
         self.headers = {
@@ -43,28 +79,23 @@ class TmallCommentSpider:
             'x-requested-with': 'XMLHttpRequest'
         }
         
-        # 设置cookies
-        if cookies:
-            self.session.cookies.update(self._parse_cookies(cookies))
+        # 设置cookies，_m_h5_tk令牌只在这里解析一次
+        parsed_cookies = self._parse_cookies(cookies)
+        if parsed_cookies:
+            self.session.cookies.update(parsed_cookies)
+        self.tokens = TokenManager(self.session, parsed_cookies)
+    
+    @property
+    def ua(self):
+        """随机User-Agent生成器；请求头使用固定的user-agent，只有显式访问时才导入fake_useragent并加载浏览器数据"""
+        if self._ua is None:
+            from fake_useragent import UserAgent
+            self._ua = UserAgent()
+        return self._ua
     
     def _parse_cookies(self, cookie_string):
         """解析cookie字符串为字典"""
-        cookies = {}
-        if cookie_string:
-            for item in cookie_string.split('; '):
-                if '=' in item:
-                    key, value = item.split('=', 1)
-                    cookies[key] = value
-        return cookies
-    
-    def _extract_token(self, cookies_str):
-        """从cookies中提取_m_h5_tk token"""
-        match = re.search(r'_m_h5_tk=([^;]+)', cookies_str)
-        if match:
-            token_with_timestamp = match.group(1)
-            token = token_with_timestamp.split('_')[0] if '_' in token_with_timestamp else token_with_timestamp
-            return token
-        return ""
+        return parse_cookie_string(cookie_string)
     
     def _generate_signature(self, timestamp, data_str, token=""):
         """生成签名"""
@@ -75,57 +106,29 @@ class TmallCommentSpider:
             sign_str = f"{token}&{timestamp}&{app_key}&{data_str}"
         return hashlib.md5(sign_str.encode('utf-8')).hexdigest()
     
-    def _parse_jsonp_response(self, response_text):
-        """解析JSONP响应"""
-        match = re.search(r'mtopjsonp\d+\((.*)\)', response_text)
-        if match:
-            json_str = match.group(1)
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError as e:
-                print(f"JSON解析错误: {e}")
-                return None
-        return None
+    def _parse_jsonp_response(self, response_body):
+        """解析JSONP响应，response_body可以是response.content（bytes）或response.text"""
+        try:
+            with metrics.timer('spider_parse_seconds'):
+                return decode_jsonp(response_body)
+        except ValueError as e:
+            print(f"JSON解析错误: {e}")
+            return None
     
     def _format_comments(self, raw_data):
         """格式化评论数据"""
         if not raw_data or 'data' not in raw_data:
             return []
         
-        comments = []
         try:
-            # 获取评论列表
-            rate_list = raw_data['data'].get('rateList', [])
-            
-            for rate in rate_list:
-                comment = {
-                    'user_nick': rate.get('userNick', rate.get('reduceUserNick', '')),
-                    'content': rate.get('feedback', ''),
-                    'rating': int(rate.get('userStar', 0)),
-                    'date': rate.get('feedbackDate', rate.get('createTime', '')),
-                    'useful_count': 0,
-                    'reply': rate.get('reply', ''),
-                    'sku_info': rate.get('skuValueStr', ''),
-                    'pics': []
-                }
-                
-                # 提取点赞数
-                if 'interactInfo' in rate and isinstance(rate['interactInfo'], dict):
-                    comment['useful_count'] = int(rate['interactInfo'].get('likeCount', 0))
-                
-                # 提取图片
-                if 'feedPicPathList' in rate and isinstance(rate['feedPicPathList'], list):
-                    comment['pics'] = rate['feedPicPathList']
-                
-                comments.append(comment)
-                
+            with metrics.timer('spider_format_seconds'):
+                return format_comments(raw_data['data'].get('rateList', []))
         except Exception as e:
             print(f"数据格式化错误: {e}")
-        
-        return comments
+            return []
     
     def get_product_info_from_comments(self, comments):
-        """从评论数据中推断商品信息"""
+        """从评论数据中推断商品信息（按全部评论的SKU和内容分类）"""
         if not comments or len(comments) == 0:
             return {
                 'success': True,
@@ -134,42 +137,21 @@ class TmallCommentSpider:
                 'shop_name': ''
             }
         
-        # 从评论的SKU信息推断商品类型
-        sku_keywords = []
-        for comment in comments[:3]:  # 只检查前3条评论
-            sku_info = comment.get('sku_info', '')
-            if sku_info:
-                sku_keywords.append(sku_info)
-        
-        # 根据SKU关键词推断商品类型
-        product_name = '商品'
-        if any('打火机' in sku or '火石' in sku for sku in sku_keywords):
-            product_name = '打火机商品'
-        elif any('礼盒' in sku for sku in sku_keywords):
-            product_name = '礼盒商品'
-        elif any('笔记本' in sku or '本子' in sku for sku in sku_keywords):
-            product_name = '笔记本商品'
-        elif any('手机' in sku for sku in sku_keywords):
-            product_name = '手机商品'
-        elif any('衣服' in sku or '服装' in sku for sku in sku_keywords):
-            product_name = '服装商品'
-        elif any('鞋子' in sku or '鞋' in sku for sku in sku_keywords):
-            product_name = '鞋类商品'
-        elif any('包' in sku for sku in sku_keywords):
-            product_name = '包类商品'
-        
+        classification = self.sku_classifier.classify(comments)
         return {
             'success': True,
-            'product_name': product_name,
+            'product_name': classification.product_name,
             'product_url': '',
-            'shop_name': ''
+            'shop_name': '',
+            'category': classification.category,
+            'category_confidence': classification.confidence
         }
 
-    def get_product_info(self, product_id):
-        """获取商品基本信息"""
+    def get_product_info(self, product_id, first_page=None):
+        """获取商品基本信息，传入已获取的第1页结果时不再重复请求"""
         try:
             # 先尝试获取评论数据
-            result = self.get_comments(product_id, page_no=1, page_size=3)
+            result = first_page if first_page is not None else self.get_comments(product_id, page_no=1, page_size=3)
             
             if result['success'] and 'comments' in result:
                 # 从评论数据中推断商品信息
@@ -204,17 +186,11 @@ class TmallCommentSpider:
                 if product_name == f'商品ID: {product_id}' and 'rateList' in data:
                     rate_list = data['rateList']
                     if rate_list and len(rate_list) > 0:
-                        # 从第一个评论的SKU信息推断商品类型
-                        first_comment = rate_list[0]
-                        sku_info = first_comment.get('skuValueStr', '')
-                        if sku_info:
-                            # 根据SKU信息推断商品类型
-                            if '打火机' in sku_info or '火石' in sku_info:
-                                product_name = f'打火机商品 - {product_id}'
-                            elif '礼盒' in sku_info:
-                                product_name = f'礼盒商品 - {product_id}'
-                            else:
-                                product_name = f'商品 - {product_id}'
+                        # 根据全部评论的SKU信息推断商品类型
+                        classification = self.sku_classifier.classify_skus(
+                            rate.get('skuValueStr', '') for rate in rate_list
+                        )
+                        product_name = f'{classification.product_name} - {product_id}'
                 
                 return {
                     'success': True,
@@ -239,8 +215,97 @@ class TmallCommentSpider:
                 'shop_name': ''
             }
 
-    def get_comments(self, product_id, page_no=1, page_size=20):
-        """获取商品评论"""
+    # mtop返回码中表示被限流/风控的关键字，遇到时降速并重试
+    THROTTLE_CODES = ('FAIL_SYS_FLOWLIMIT', 'FAIL_SYS_USER_VALIDATE', 'RGV587_ERROR', 'FAIL_SYS_TRAFFIC_LIMIT')
+    # 可重试的临时错误
+    TRANSIENT_CODES = ('FAIL_SYS_SERVICE_UNAVAILABLE', 'FAIL_SYS_SERVICE_TIMEOUT', 'FAIL_SYS_INTERNAL_FAULT')
+
+    def get_comments(self, product_id, page_no=1, page_size=20, order_type=""):
+        """获取商品评论，order_type为"feedbackdate"时按评论时间倒序
+
+        临时性错误（网络异常、5xx、限流）按抖动指数退避重试，最多重试max_retries次；
+        令牌过期时换用服务端下发的新令牌重新签名，立即重试；令牌已被其他并发请求刷新时直接用当前令牌重试。
+        启用会话池时每次请求轮转取一个账号：被限流的账号进入冷却、令牌无法刷新的账号移出轮转，
+        随后立即换下一个健康账号重试，不计入重试次数。
+        """
+        product_label = str(product_id)
+        pool = self.session_pool
+        with metrics.timer('spider_get_comments_seconds', product=product_label):
+            attempt = 0
+            token_retries = 0
+            switches = 0
+            while True:
+                account = None
+                if pool is not None:
+                    account = pool.acquire()
+                    if account is None:
+                        result = {'success': False, 'error': '会话池中没有可用的账号'}
+                        break
+                result = self._request_comments(product_id, page_no, page_size, order_type, account)
+                if account is not None:
+                    self._report_account(account, result)
+                if result['success']:
+                    break
+            
+                tokens = account.tokens if account is not None else self.tokens
+                refresh_failed = False
+                if result.get('token_error'):
+                    # 签名用的令牌已不是当前令牌：其他请求已经刷新过，用当前令牌重新签名即可，不计入刷新次数
+                    if result['signed_with'] != tokens.raw:
+                        continue
+                    if token_retries < 2 and tokens.refresh(result['signed_with']):
+                        token_retries += 1
+                        self._count('token_refreshes')
+                        print(f"🔑 令牌已刷新，重新签名第 {page_no} 页请求")
+                        continue
+                    refresh_failed = token_retries < 2
+                
+                if account is not None and switches < len(pool):
+                    if result.get('token_error'):
+                        # 只有签名令牌仍是账号的当前令牌且刷新失败才说明登录态失效，刷新次数用完时只换账号重试
+                        if refresh_failed and result['signed_with'] == tokens.raw:
+                            pool.report_expired(account, result['error'])
+                        else:
+                            pool.report_error(account, result['error'])
+                    if (result.get('token_error') or result.get('throttled')) and pool.healthy_count():
+                        switches += 1
+                        token_retries = 0
+                        continue
+            
+                if not result.get('retryable') or attempt >= self.max_retries:
+                    break
+                attempt += 1
+                self._count('retries')
+                # full jitter：在[0, min(上限, 基数*2^n)]之间随机等待
+                backoff = min(self.retry_backoff_max, self.retry_backoff * (2 ** (attempt - 1)))
+                with metrics.timer('spider_retry_backoff_seconds'):
+                    time.sleep(random.uniform(0, backoff))
+        
+        if result['success']:
+            metrics.inc('spider_pages_total', product=product_label)
+            metrics.inc('spider_comments_total', len(result['comments']), product=product_label)
+        else:
+            self._count('failures')
+            metrics.inc('spider_errors_total', product=product_label)
+        result.pop('retryable', None)
+        result.pop('token_error', None)
+        result.pop('signed_with', None)
+        result.pop('throttled', None)
+        return result
+
+    def _report_account(self, account, result):
+        """把一次请求的结果回报给会话池，更新账号健康状态"""
+        if result['success']:
+            self.session_pool.report_success(account)
+        elif result.get('throttled'):
+            self.session_pool.report_throttle(account, result['error'])
+        elif not result.get('token_error'):
+            self.session_pool.report_error(account, result['error'])
+
+    def _request_comments(self, product_id, page_no, page_size, order_type, account=None):
+        """发送一次评论请求，失败时通过retryable标记是否值得重试，account为会话池中的账号"""
+        session = account.session if account is not None else self.session
+        tokens = account.tokens if account is not None else self.tokens
         # 构建请求参数
         t = str(int(time.time() * 1000))
         
@@ -249,7 +314,7 @@ class TmallCommentSpider:
             "auctionNumId": product_id,
             "pageNo": page_no,
             "pageSize": page_size,
-            "orderType": "",
+            "orderType": order_type,
             "searchImpr": "-8",
             "expression": "",
             "skuVids": "",
@@ -259,9 +324,9 @@ class TmallCommentSpider:
         
         data_str = json.dumps(data_params, separators=(',', ':'))
         
-        # 生成签名
-        token = self._extract_token(self.cookies_str) if self.cookies_str else ""
-        signature = self._generate_signature(t, data_str, token)
+        # 生成签名（签名包含毫秒时间戳，每次请求都不同，只缓存令牌本身）
+        signed_with = tokens.raw
+        signature = self._generate_signature(t, data_str, parse_token(signed_with))
         
         # URL参数
         url_params = {
@@ -282,134 +347,751 @@ class TmallCommentSpider:
         }
         
         url = f"{self.base_url}?{urllib.parse.urlencode(url_params)}"
+        limiter = self.rate_limiter
         
         try:
-            response = self.session.get(url, headers=self.headers, timeout=10)
+            if limiter:
+                limiter.acquire()
+            self._count('requests')
+            started = time.monotonic()
+            response = session.get(url, headers=self.headers, timeout=10)
+            latency = time.monotonic() - started
+            metrics.inc('spider_response_bytes_total', len(response.content))
+            
+            if response.status_code == 429 or response.status_code >= 500:
+                if response.status_code == 429:
+                    self._count('throttled')
+                    if limiter:
+                        limiter.record_throttle()
+                elif limiter:
+                    limiter.record_error()
+                return {'success': False, 'error': f'HTTP {response.status_code}', 'retryable': True,
+                        'throttled': response.status_code == 429}
             response.raise_for_status()
             
-            json_data = self._parse_jsonp_response(response.text)
+            json_data = self._parse_jsonp_response(response.content)
             
-            if json_data:
-                return {
-                    'success': True,
-                    'comments': self._format_comments(json_data),
-                    'total': json_data.get('data', {}).get('total', 0)
-                }
-            else:
-                return {'success': False, 'error': '响应解析失败'}
+            if not json_data:
+                if limiter:
+                    limiter.record_error()
+                return {'success': False, 'error': '响应解析失败', 'retryable': True}
+            
+            # 检查mtop返回码
+            ret = ';'.join(json_data.get('ret') or [])
+            if ret and not ret.startswith('SUCCESS'):
+                if is_token_error(ret):
+                    return {'success': False, 'error': ret, 'token_error': True, 'signed_with': signed_with}
+                if any(code in ret for code in self.THROTTLE_CODES):
+                    self._count('throttled')
+                    if limiter:
+                        limiter.record_throttle()
+                    return {'success': False, 'error': ret, 'retryable': True, 'throttled': True}
+                if any(code in ret for code in self.TRANSIENT_CODES):
+                    if limiter:
+                        limiter.record_error()
+                    return {'success': False, 'error': ret, 'retryable': True}
+                return {'success': False, 'error': ret}
+            
+            if limiter:
+                limiter.record_success(latency)
+            return {
+                'success': True,
+                'comments': self._format_comments(json_data),
+                'total': json_data.get('data', {}).get('total', 0)
+            }
                 
+        except requests.RequestException as e:
+            if limiter:
+                limiter.record_error()
+            return {'success': False, 'error': str(e), 'retryable': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
+
+    def token_states(self):
+        """当前令牌状态（启用会话池时包括每个账号），用于写入断点"""
+        states = {'': self.tokens.state()}
+        if self.session_pool:
+            for account in self.session_pool.accounts:
+                states[account.name] = account.tokens.state()
+        return states
+
+    def restore_tokens(self, states):
+        """从断点恢复令牌，返回恢复的令牌数"""
+        managers = {'': self.tokens}
+        if self.session_pool:
+            managers.update((account.name, account.tokens) for account in self.session_pool.accounts)
+        return sum(1 for name, state in (states or {}).items()
+                   if name in managers and managers[name].restore(state))
+
+    def _count(self, name, value=1):
+        """累加请求统计"""
+        with self._stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + value
+        metrics.inc(f'spider_{name}_total', value)
+
+    def get_stats(self):
+        """返回请求统计和当前限速器速率"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        if self.rate_limiter:
+            stats['rate_limiter'] = self.rate_limiter.stats()
+        if self.session_pool:
+            stats['session_pool'] = self.session_pool.stats()
+        return stats
     
-    def get_multiple_pages(self, product_id, max_pages=3, page_size=20, delay=2):
-        """获取多页评论"""
+    def get_multiple_pages(self, product_id, max_pages=3, page_size=20, delay=2,
+                           concurrency=1, rate_limit=None):
+        """获取多页评论，concurrency > 1 时启用并发模式，rate_limit为每秒请求数上限"""
         all_comments = []
-        
-        for page in range(1, max_pages + 1):
-            print(f"正在获取第 {page} 页评论...")
+        for _, comments in self.iter_pages(product_id, max_pages, page_size, delay,
+                                           concurrency, rate_limit):
+            all_comments.extend(comments)
+        return all_comments
+
+    def iter_pages(self, product_id, max_pages=3, page_size=20, delay=2,
+                   concurrency=1, rate_limit=None, order_type="", first_page=None, start_page=1, progress=None):
+        """逐页获取评论，每获取到一页就产出(页码, 评论列表)，遇到空页或失败页即停止
+
+        first_page为已获取的第1页结果时直接复用，不再重复请求；
+        第1页返回的total用于规划页数，避免请求最后的空页。
+        start_page > 1时（从断点恢复）first_page只用于规划页数，从start_page开始获取；
+        progress为字典时，因请求失败而停止会记录失败的页码progress['failed_page']和错误信息progress['error']。
+        """
+        if concurrency > 1:
+            yield from self._iter_pages_concurrently(product_id, max_pages, page_size, concurrency, rate_limit,
+                                                     order_type, first_page, start_page, progress)
+            return
+
+        planned_pages = max_pages
+        if start_page > 1 and first_page is not None:
+            planned_pages = self._plan_pages(first_page.get('total'), max_pages, page_size)
+        page = max(1, start_page)
+        while page <= planned_pages:
+            if page == 1 and first_page is not None:
+                result = first_page
+            else:
+                print(f"正在获取第 {page} 页评论...")
+                result = self.get_comments(product_id, page_no=page, page_size=page_size, order_type=order_type)
             
-            result = self.get_comments(product_id, page_no=page, page_size=page_size)
+            if page == 1 and result['success']:
+                planned_pages = self._plan_pages(result.get('total'), max_pages, page_size)
             
             if result['success']:
                 comments = result['comments']
                 if comments:
-                    all_comments.extend(comments)
                     print(f"第 {page} 页获取到 {len(comments)} 条评论")
+                    yield page, comments
                 else:
                     print(f"第 {page} 页没有更多评论")
                     break
             else:
                 print(f"第 {page} 页获取失败: {result['error']}")
+                if progress is not None:
+                    progress.update(failed_page=page, error=result['error'])
                 break
             
-            if page < max_pages:
-                time.sleep(delay)
-        
-        return all_comments
-    
+            if page < planned_pages:
+                with metrics.timer('spider_page_delay_seconds'):
+                    time.sleep(delay)
+            page += 1
 
+    def _plan_pages(self, total, max_pages, page_size):
+        """根据评论总数规划需要获取的页数"""
+        try:
+            total = int(total or 0)
+        except (TypeError, ValueError):
+            total = 0
+        if total <= 0 or page_size <= 0:
+            return max_pages
+        return max(1, min(max_pages, math.ceil(total / page_size)))
 
-def main():
-    """主程序"""
-    print("🛒 淘宝/天猫商品评论爬虫")
-    print("=" * 50)
-    
-    # 从环境变量获取参数
-    product_id = os.getenv('PRODUCT_ID', '933910033859')
-    max_pages = int(os.getenv('MAX_PAGES', '3'))
-    use_database = os.getenv('USE_DATABASE', 'true').lower() == 'true'
-    
-    print(f"🎯 商品ID: {product_id}")
-    print(f"📄 最大页数: {max_pages}")
-    print(f"🗄️ 使用数据库: {use_database}")
-    
-    # 初始化数据库读取器
-    db_reader = None
-    if use_database:
+    def _ensure_pool_size(self, size):
+        """保证连接池足够容纳并发请求，避免连接被反复丢弃重建"""
+        if size <= self._pool_maxsize:
+            return
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._pool_maxsize = size
+        if self.session_pool:
+            self.session_pool.ensure_pool_size(size)
+
+    def _iter_pages_concurrently(self, product_id, max_pages, page_size, concurrency, rate_limit,
+                                 order_type="", first_page=None, start_page=1, progress=None):
+        """并发获取多页评论，按页码顺序产出，遇到第一个空页或失败页即停止"""
+        limiter = RateLimiter(rate_limit) if rate_limit else None
+
+        def fetch(page):
+            if limiter:
+                limiter.acquire()
+            return self.get_comments(product_id, page_no=page, page_size=page_size, order_type=order_type)
+
+        if first_page is not None:
+            first = first_page
+        else:
+            print(f"正在获取第 1 页评论...")
+            first = fetch(1)
+        if start_page <= 1:
+            if not first['success']:
+                print(f"第 1 页获取失败: {first['error']}")
+                if progress is not None:
+                    progress.update(failed_page=1, error=first['error'])
+                return
+            if not first['comments']:
+                print(f"第 1 页没有更多评论")
+                return
+
+            print(f"第 1 页获取到 {len(first['comments'])} 条评论")
+            yield 1, first['comments']
+            start_page = 2
+
+        planned_pages = self._plan_pages(first.get('total'), max_pages, page_size)
+        if planned_pages < start_page:
+            return
+
+        print(f"📑 计划并发获取第 {start_page}-{planned_pages} 页，并发数: {concurrency}")
+        self._ensure_pool_size(concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [(page, executor.submit(fetch, page)) for page in range(start_page, planned_pages + 1)]
+            try:
+                for page, future in futures:
+                    result = future.result()
+                    if not result['success']:
+                        print(f"第 {page} 页获取失败: {result['error']}")
+                        if progress is not None:
+                            progress.update(failed_page=page, error=result['error'])
+                        break
+                    if not result['comments']:
+                        print(f"第 {page} 页没有更多评论")
+                        break
+                    print(f"第 {page} 页获取到 {len(result['comments'])} 条评论")
+                    yield page, result['comments']
+            finally:
+                # 提前停止时取消尚未开始的请求，已在途的请求结果直接丢弃
+                for _, pending in futures:
+                    pending.cancel()
+
+    def iter_new_pages(self, product_id, watermark, pages=None, **kwargs):
+        """增量获取评论：按时间倒序翻页，只产出水位线之后的新评论，遇到已有评论即停止
+
+        pages为已打开的按时间倒序的页流（如带断点的页流）时直接在其上过滤。
+        """
+        if pages is None:
+            kwargs['order_type'] = 'feedbackdate'
+            pages = self.iter_pages(product_id, **kwargs)
         try:
-            db_reader = DatabaseReader()
-            print("✅ 数据库连接成功")
-        except Exception as e:
-            print(f"❌ 数据库连接失败: {e}")
-            print("⚠️ 将使用环境变量参数")
-            use_database = False
+            for page, comments in pages:
+                new_comments, reached = watermark.filter_new(comments)
+                if new_comments:
+                    yield page, new_comments
+                if reached:
+                    print(f"🔖 第 {page} 页已到达上次爬取的位置，停止翻页")
+                    break
+        finally:
+            pages.close()
     
-    # 获取配置参数
-    cookies = ""
-    actual_max_pages = max_pages
+
+
+def resolve_crawl_config(product_id, db_reader, max_pages, default_cookies=''):
+    """确定爬取参数：优先使用数据库配置，否则使用传入的默认值，返回(cookies, max_pages, product_name)"""
+    cookies = default_cookies or ''
     product_name = f"商品ID: {product_id}"
     
-    if use_database and db_reader:
+    if db_reader:
         # 从数据库获取配置
         print("🔍 正在从数据库获取配置...")
         config = db_reader.get_spider_config_by_product_id(product_id)
         
         if config:
             cookies = config.get('cookies', '')
-            actual_max_pages = config.get('max_pages', max_pages)
+            max_pages = config.get('max_pages', max_pages)
             product_name = config.get('product_name', product_name)
             print(f"✅ 从数据库获取配置成功:")
             print(f"   - cookies长度: {len(cookies)}")
-            print(f"   - maxPages: {actual_max_pages}")
+            print(f"   - maxPages: {max_pages}")
             print(f"   - 商品名称: {product_name}")
         else:
             print("❌ 数据库中未找到该商品的配置，使用默认参数")
-            cookies = os.getenv('COOKIES', '')
     else:
         # 使用环境变量参数
-        cookies = os.getenv('COOKIES', '')
         print("⚠️ 使用环境变量参数")
     
-    # 创建爬虫实例
-    spider = TmallCommentSpider(cookies=cookies)
+    return cookies, max_pages, product_name
+
+
+def _resolve_product_name(spider, product_id, product_name=None, first_page=None):
+    """确定商品名称：优先使用数据库中的名称，没有时才使用从评论推断的名称"""
+    default_name = f'商品ID: {product_id}'
+    product_name = product_name or default_name
     
     print(f"📡 开始获取商品信息...")
     
-    # 获取商品信息
-    product_info = spider.get_product_info(product_id)
+    # 获取商品信息（复用已获取的第1页）
+    product_info = spider.get_product_info(product_id, first_page=first_page)
     if product_info.get('success'):
         # 优先使用数据库中的商品名称，只有在数据库中没有时才使用API返回的名称
         api_product_name = product_info.get('product_name', '')
-        if api_product_name and api_product_name != f'商品ID: {product_id}' and product_name == f'商品ID: {product_id}':
+        if api_product_name and api_product_name != default_name and product_name == default_name:
             product_name = api_product_name
             print(f"🔍 使用API返回的商品名称: {product_name}")
         else:
             print(f"🔍 保持数据库中的商品名称: {product_name}")
     print(f"📦 商品信息: {product_info}")
+    return product_name
+
+
+def _open_page_stream(spider, product_id, db_reader=None, incremental=False, checkpoint=None, **page_kwargs):
+    """打开逐页评论流，第1页只请求一次，返回(迭代器, 水位线, 第1页结果, 进度)
+
+    第1页结果同时用于推断商品信息、估算总页数和评论流本身；
+    增量模式下只产出水位线之后的新评论。
+    传入checkpoint（CrawlCheckpoint）时每完成一页就落盘；存在有效断点时恢复令牌，
+    先重放已完成的页，再从下一页继续请求。
+    进度字典在评论流因请求失败而停止时记录failed_page和error，评论流结束后据此判断本次爬取是否完整。
+    """
+    watermark = None
+    if incremental:
+        watermark = Watermark.from_record(product_id, db_reader.get_watermark(product_id)) if db_reader else None
+        if watermark:
+            print(f"🔖 增量模式，水位线日期: {watermark.newest_date}，最近评论数: {len(watermark.recent_keys)}")
+        else:
+            print("🔖 增量模式，尚无水位线，本次全量爬取并建立水位线")
+            watermark = Watermark(product_id)
     
-    print(f"📡 开始获取评论数据...")
+    order_type = 'feedbackdate' if watermark else ''
+    progress = checkpoint.progress if checkpoint is not None else {}
+    if checkpoint is not None and checkpoint.load():
+        restored = spider.restore_tokens(checkpoint.tokens)
+        print(f"♻️ 从断点恢复: 已完成 {checkpoint.completed} 页，从第 {checkpoint.completed + 1} 页继续"
+              f"{f'（恢复 {restored} 个令牌）' if restored else ''}")
+        first_page = checkpoint.first_page()
+        pages = spider.iter_pages(product_id, first_page=first_page, order_type=order_type,
+                                  start_page=checkpoint.completed + 1, progress=progress,
+                                  **page_kwargs)
+        pages = checkpoint.wrap(pages, checkpoint.saved_pages(), first_page.get('total'), spider.token_states)
+    else:
+        print(f"正在获取第 1 页评论...")
+        first_page = spider.get_comments(product_id, page_no=1, page_size=page_kwargs.get('page_size', 20),
+                                         order_type=order_type)
+        pages = spider.iter_pages(product_id, first_page=first_page, order_type=order_type,
+                                  progress=progress, **page_kwargs)
+        if checkpoint is not None:
+            pages = checkpoint.wrap(pages, total=first_page.get('total'), tokens=spider.token_states)
+    if watermark:
+        pages = spider.iter_new_pages(product_id, watermark, pages=pages)
+    return pages, watermark, first_page, progress
+
+
+def _page_stages(product_id, tally, sentiment=None, images=None, db_reader=None, snapshot=None):
+    """逐页处理的两个阶段：analyze（情感打分、图片下载、品类累加）和write（写数据库、快照），
+    write输出(页码, 评论列表, 是否写入成功)"""
+    def analyze(item):
+        page, comments = item
+        _score_comments(sentiment, product_id, comments)
+        _fetch_images(images, product_id, comments)
+        _classify_page(tally, comments)
+        return page, comments
+
+    def write(item):
+        page, comments = item
+        # 按自然键幂等写入，逐页保存即可
+        saved = bool(db_reader.save_comments(product_id, comments)) if db_reader else True
+        _save_snapshot(snapshot, product_id, comments)
+        return page, comments, saved
+
+    return [('analyze', analyze), ('write', write)]
+
+
+def _run_stages(pages, stages):
+    """未启用流水线时在当前线程中依次执行各阶段"""
+    for item in pages:
+        for _, func in stages:
+            item = func(item)
+        yield item
+
+
+def _finish_checkpoint(checkpoint, saved=True):
+    """爬取结束：评论已保存且没有因请求失败中断时删除断点，否则保留供下次恢复"""
+    if checkpoint is None:
+        return
+    if not saved:
+        print(f"💾 评论写入数据库失败，保留断点（已完成 {checkpoint.completed} 页）")
+        return
+    checkpoint.finish()
+
+
+def _open_checkpoint(checkpoints, product_id, page_size, incremental):
+    """为本次爬取打开断点，未启用断点时返回None"""
+    if checkpoints is None:
+        return None
+    return checkpoints.open(product_id, page_size, 'feedbackdate' if incremental else '')
+
+
+def _save_watermark(db_reader, product_id, watermark, new_count):
+    """保存推进后的水位线"""
+    if db_reader and watermark:
+        db_reader.save_watermark(product_id, watermark.newest_date, watermark.recent_keys, new_count)
+
+
+def _save_snapshot(snapshot, product_id, comments):
+    """把评论追加到快照存储（按自然键去重）"""
+    if snapshot is None or not comments:
+        return
+    try:
+        stored = snapshot.append(product_id, comments)
+        print(f"🗃️ 快照新增 {stored} 条评论")
+    except Exception as e:
+        # 快照只是本地副本，保存失败不影响爬取和数据库写入
+        print(f"⚠️ 快照保存失败: {e}")
+
+
+class _BackgroundInit:
+    """在后台线程中构造对象，与启动后第一个请求的网络等待重叠；第一次访问其属性时等待构造完成"""
+
+    def __init__(self, factory):
+        self._value = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(factory,), name='background-init', daemon=True)
+        self._thread.start()
+
+    def _run(self, factory):
+        try:
+            self._value = factory()
+        except Exception as e:
+            self._error = e
+
+    def get(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def _load_sentiment():
+    """本地情感打分器：导入NumPy和编译词典正则约需数十毫秒，放到后台线程中进行；默认关闭，LOCAL_SENTIMENT=true时才导入"""
+    if os.getenv('LOCAL_SENTIMENT', 'false').lower() != 'true':
+        return None
+
+    def create():
+        from sentiment import SentimentScorer
+        return SentimentScorer.from_env()
+
+    return _BackgroundInit(create)
+
+
+def _score_comments(sentiment, product_id, comments):
+    """本地情感打分，结果写入每条评论的sentiment字段，返回需要远程复核的条数"""
+    if sentiment is None or not comments:
+        return 0
+    with metrics.timer('spider_sentiment_seconds'):
+        ambiguous = sentiment.annotate(comments)
+    metrics.inc('spider_sentiment_scored_total', len(comments), product=product_id)
+    metrics.inc('spider_sentiment_ambiguous_total', ambiguous, product=product_id)
+    return ambiguous
+
+
+def _fetch_images(images, product_id, comments):
+    """下载评论图片并把内容哈希引用写入每条评论的images字段，返回保存的图片数"""
+    if images is None or not comments:
+        return 0
+    with metrics.timer('spider_images_seconds'):
+        stored = images.attach(comments)
+    metrics.inc('spider_images_total', stored, product=product_id)
+    return stored
+
+
+def _classify_page(tally, comments):
+    """把一页评论的SKU品类得分累加到tally"""
+    with metrics.timer('spider_classify_seconds'):
+        tally.add(comments)
+
+
+def _apply_classification(product_info, tally, product_id, configured_name):
+    """用全部评论的品类结果补全商品信息；数据库中配置了商品名称时保持不变"""
+    classification = tally.result()
+    product_info['category'] = classification.category
+    product_info['category_confidence'] = classification.confidence
+    if classification.category and configured_name in (None, '', f'商品ID: {product_id}'):
+        product_info['product_name'] = classification.product_name
+    print(f"🏷️ 商品品类: {classification.category or '未知'}（置信度 {classification.confidence}）")
+    return product_info
+
+
+def crawl_product(spider, product_id, product_name=None, max_pages=3, page_size=20, delay=2,
+                  concurrency=1, rate_limit=None, db_reader=None, incremental=False, snapshot=None,
+                  sentiment=None, classifier=None, images=None, checkpoints=None, pipeline=0):
+    """爬取单个商品的评论并（可选）保存到数据库和快照存储，返回供Node.js使用的结果数据
     
-    # 测试单页获取
-    print(f"🔍 测试获取第1页数据...")
-    test_result = spider.get_comments(product_id, page_no=1, page_size=20)
-    print(f"📊 测试结果: {test_result}")
+    传入sentiment（SentimentScorer）时先对全部评论做本地情感打分，分数随评论一起保存和输出。
+    classifier为SKU品类分类器（默认使用spider.sku_classifier），每页到达时累加品类得分。
+    传入images（ImageFetcher）时下载评论图片，引用写入评论的images字段。
+    传入checkpoints（CheckpointStore）时每页落盘，中断后重新爬取同一商品从最后完成的页继续。
+    pipeline > 0时以此为队列长度启用流水线：抓取、分析、写入三个阶段各占一个线程重叠执行，
+    每页分析完即写入数据库和快照；为0时先获取全部页面，再整体打分和写入。
+    返回的success表示全部页面获取完成、没有因请求失败而中断，增量爬取没有新评论时同样为True；
+    中断时error为失败原因，已获取的评论照常保存并返回。
+    """
+    print(f"📡 开始获取评论数据...")
     
-    # 获取评论数据
-    comments = spider.get_multiple_pages(product_id, max_pages=actual_max_pages, page_size=20)
+    # 获取评论数据，第1页同时用于推断商品信息
+    checkpoint = _open_checkpoint(checkpoints, product_id, page_size, incremental)
+    pages, watermark, first_page, progress = _open_page_stream(
+        spider, product_id, db_reader, incremental, checkpoint, max_pages=max_pages, page_size=page_size,
+        delay=delay, concurrency=concurrency, rate_limit=rate_limit
+    )
+    configured_name = product_name
+    product_name = _resolve_product_name(spider, product_id, product_name, first_page)
+    tally = (classifier or spider.sku_classifier).tally()
+    comments = []
+    saved = True
+    if pipeline:
+        flow = Pipeline(pages, _page_stages(product_id, tally, sentiment, images, db_reader, snapshot),
+                        maxsize=pipeline)
+        for _, page_comments, page_saved in flow:
+            comments.extend(page_comments)
+            saved = page_saved and saved
+        print(flow.report())
+    else:
+        for _, page_comments in pages:
+            _classify_page(tally, page_comments)
+            comments.extend(page_comments)
+    if watermark:
+        _save_watermark(db_reader, product_id, watermark.merge(comments), len(comments))
     
     if comments:
         print(f"\n🎉 成功获取 {len(comments)} 条评论")
+        if pipeline:
+            if db_reader:
+                print("✅ 评论数据已逐页保存到数据库" if saved else "❌ 部分页面保存评论数据失败")
+        else:
+            if sentiment is not None:
+                ambiguous = _score_comments(sentiment, product_id, comments)
+                print(f"🧠 本地情感打分完成，{ambiguous} 条需要远程复核")
+            if images is not None:
+                stored = _fetch_images(images, product_id, comments)
+                print(f"🖼️ 评论图片已保存 {stored} 张")
+            
+            # 保存到数据库
+            if db_reader:
+                print("💾 正在保存评论数据到数据库...")
+                save_success = db_reader.save_comments(product_id, comments)
+                saved = bool(save_success)
+                if save_success:
+                    print("✅ 评论数据已保存到数据库")
+                else:
+                    print("❌ 保存评论数据失败")
+            _save_snapshot(snapshot, product_id, comments)
+    elif progress.get('failed_page'):
+        print("❌ 未获取到任何评论数据")
+    else:
+        print("ℹ️ 水位线之后没有新评论" if incremental else "ℹ️ 该商品暂无评论")
+    if comments and progress.get('failed_page'):
+        print(f"⚠️ 第 {progress['failed_page']} 页获取失败，本次爬取不完整")
+    _finish_checkpoint(checkpoint, saved)
+    
+    product_info = {
+        "success": True,
+        "product_name": product_name,
+        "product_url": "",
+        "shop_name": ""
+    }
+    result = {
+        "success": not progress.get('failed_page'),
+        "comments": comments,
+        "total": len(comments),
+        "product_info": _apply_classification(product_info, tally, product_id, configured_name)
+    }
+    if progress.get('failed_page'):
+        result["error"] = f"第 {progress['failed_page']} 页获取失败: {progress.get('error', '')}"
+    if pipeline:
+        result["pipeline"] = flow.utilization()
+    return result
+
+
+def stream_product(spider, product_id, emit, product_name=None, max_pages=3, page_size=20, delay=2,
+                   concurrency=1, rate_limit=None, db_reader=None, unit='page', incremental=False,
+                   snapshot=None, sentiment=None, classifier=None, images=None, checkpoints=None, pipeline=0):
+    """流式爬取单个商品：每获取一页立即通过emit输出记录并写库，最后输出汇总记录
+
+    unit为'page'时每页输出一条记录，为'comment'时每条评论输出一条记录。
+    评论不在内存中累积，峰值内存与爬取页数无关。
+    pipeline > 0时抓取、分析、写入、输出重叠执行，队列长度即相邻阶段之间最多缓冲的页数。
+    汇总记录的success含义与crawl_product相同：全部页面获取完成即为True，与新评论条数无关。
+    """
+    print(f"📡 开始流式获取评论数据...")
+    checkpoint = _open_checkpoint(checkpoints, product_id, page_size, incremental)
+    pages_iter, watermark, first_page, progress = _open_page_stream(
+        spider, product_id, db_reader, incremental, checkpoint, max_pages=max_pages, page_size=page_size,
+        delay=delay, concurrency=concurrency, rate_limit=rate_limit
+    )
+    configured_name = product_name
+    product_name = _resolve_product_name(spider, product_id, product_name, first_page)
+    tally = (classifier or spider.sku_classifier).tally()
+    product_info = {
+        "success": True,
+        "product_name": product_name,
+        "product_url": "",
+        "shop_name": ""
+    }
+    
+    total = 0
+    pages = 0
+    saved = True
+    # 过滤始终基于本次开始时的水位线，推进后的水位线在结束时统一保存
+    next_watermark = watermark
+    stages = _page_stages(product_id, tally, sentiment, images, db_reader, snapshot)
+    flow = Pipeline(pages_iter, stages, maxsize=pipeline) if pipeline else _run_stages(pages_iter, stages)
+    for page, comments, page_saved in flow:
+        saved = page_saved and saved
+        if unit == 'comment':
+            for comment in comments:
+                emit({"type": "comment", "page": page, "comment": comment})
+        else:
+            emit({"type": "page", "page": page, "count": len(comments), "comments": comments})
+        total += len(comments)
+        pages += 1
+        if watermark:
+            next_watermark = next_watermark.merge(comments)
+    
+    if pipeline:
+        print(flow.report())
+    if watermark:
+        _save_watermark(db_reader, product_id, next_watermark, total)
+    _finish_checkpoint(checkpoint, saved)
+    
+    summary = {
+        "type": "summary",
+        "success": not progress.get('failed_page'),
+        "total": total,
+        "pages": pages,
+        "product_info": _apply_classification(product_info, tally, product_id, configured_name)
+    }
+    if progress.get('failed_page'):
+        summary["error"] = f"第 {progress['failed_page']} 页获取失败: {progress.get('error', '')}"
+    if db_reader:
+        summary["saved"] = saved
+    if pipeline:
+        summary["pipeline"] = flow.utilization()
+    emit(summary)
+    return summary
+
+
+def _export_metrics():
+    """运行结束时导出指标（未设置METRICS_FILE时什么都不做）"""
+    try:
+        if metrics.export():
+            print(f"📏 指标已导出: {metrics.path}")
+    except OSError as e:
+        print(f"⚠️ 指标导出失败: {e}")
+
+
+def main():
+    """主程序"""
+    # NDJSON模式下stdout只输出数据记录，日志全部转到stderr
+    output_format = os.getenv('OUTPUT_FORMAT', 'json').lower()
+    data_out = sys.stdout
+    if output_format == 'ndjson':
+        sys.stdout = sys.stderr
+    
+    print("🛒 淘宝/天猫商品评论爬虫")
+    print("=" * 50)
+    
+    # 从环境变量获取参数
+    product_id = os.getenv('PRODUCT_ID', '933910033859')
+    max_pages = int(os.getenv('MAX_PAGES', '3'))
+    concurrency = int(os.getenv('CONCURRENCY', '1'))
+    rate_limit = float(os.getenv('RATE_LIMIT', '2'))
+    page_delay = float(os.getenv('PAGE_DELAY', '2'))
+    incremental = os.getenv('INCREMENTAL', 'false').lower() == 'true'
+    adaptive = os.getenv('ADAPTIVE_RATE', 'false').lower() == 'true'
+    # 爬取结果追加到output/snapshots下的快照存储，SNAPSHOT_DIR设为空字符串时不保存
+    snapshot_dir = os.getenv('SNAPSHOT_DIR', DEFAULT_SNAPSHOT_DIR)
+    snapshot = SnapshotStore(snapshot_dir) if snapshot_dir else None
+    # 本地情感打分，LOCAL_SENTIMENT=true时开启
+    sentiment = _load_sentiment()
+    # 设置IMAGE_DIR时下载评论图片并按内容哈希保存
+    images = ImageFetcher.from_env()
+    # 每页落盘的断点，进程被杀后重新运行从最后完成的页继续；CHECKPOINT_DIR设为空字符串时关闭
+    checkpoints = CheckpointStore.from_env()
+    # PIPELINE=true时抓取、分析、写入重叠执行，PIPELINE_QUEUE_SIZE为相邻阶段之间最多缓冲的页数
+    pipeline = int(os.getenv('PIPELINE_QUEUE_SIZE', '2')) if os.getenv('PIPELINE', 'false').lower() == 'true' else 0
+    use_database = os.getenv('USE_DATABASE', 'true').lower() == 'true'
+
+    print(f"🎯 商品ID: {product_id}")
+    print(f"📄 最大页数: {max_pages}")
+    print(f"⚡ 并发数: {concurrency}")
+    print(f"🗄️ 使用数据库: {use_database}")
+    
+    # 初始化数据库读取器
+    db_reader = None
+    if use_database:
+        try:
+            db_reader = DatabaseReader()
+            print("✅ 数据库连接成功")
+        except Exception as e:
+            print(f"❌ 数据库连接失败: {e}")
+            print("⚠️ 将使用环境变量参数")
+            use_database = False
+    
+    # 获取配置参数
+    cookies, actual_max_pages, product_name = resolve_crawl_config(
+        product_id, db_reader if use_database else None, max_pages, os.getenv('COOKIES', '')
+    )
+    
+    # SESSION_POOL=true时把spider_configs中的全部账号cookies组成会话池，翻页请求在健康账号间轮转
+    # 每个账号按SESSION_POOL_RATE（默认RATE_LIMIT）各自限速，不再使用全局限速和固定间隔
+    session_pool = load_session_pool(db_reader if use_database else None, [cookies],
+                                     rate=float(os.getenv('SESSION_POOL_RATE') or rate_limit))
+    if session_pool:
+        concurrency = max(concurrency, len(session_pool))
+        page_delay = 0
+        rate_limit = None
+    
+    # 创建爬虫实例
+    spider = TmallCommentSpider(cookies=cookies, base_url=os.getenv('SPIDER_BASE_URL') or None,
+                                session_pool=session_pool)
+    # 品类关键词优先使用数据库sku_categories表中的配置
+    classifier = load_classifier(db_reader if use_database else None)
+    if adaptive:
+        # 自适应限速取代固定的翻页间隔，从RATE_LIMIT起步，按响应情况在[MIN_RATE, MAX_RATE]内调整
+        spider.rate_limiter = AdaptiveRateLimiter(
+            rate=rate_limit,
+            min_rate=float(os.getenv('MIN_RATE', '0.2')),
+            max_rate=float(os.getenv('MAX_RATE', '10'))
+        )
+        page_delay = 0
+        rate_limit = None
+    
+    if output_format == 'ndjson':
+        def emit(record):
+            data_out.write(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=json_default) + '\n')
+            data_out.flush()
         
+        stream_product(
+            spider, product_id, emit, product_name=product_name, max_pages=actual_max_pages,
+            delay=page_delay, concurrency=concurrency, rate_limit=rate_limit,
+            db_reader=db_reader if use_database else None,
+            unit=os.getenv('NDJSON_UNIT', 'page'), incremental=incremental, snapshot=snapshot,
+            sentiment=sentiment, classifier=classifier, images=images, checkpoints=checkpoints,
+            pipeline=pipeline
+        )
+        print(f"📈 请求统计: {spider.get_stats()}")
+        _export_metrics()
+        return
+    
+    output_data = crawl_product(
+        spider, product_id, product_name=product_name, max_pages=actual_max_pages, delay=page_delay,
+        concurrency=concurrency, rate_limit=rate_limit,
+        db_reader=db_reader if use_database else None, incremental=incremental, snapshot=snapshot,
+        sentiment=sentiment, classifier=classifier, images=images, checkpoints=checkpoints,
+        pipeline=pipeline
+    )
+    comments = output_data['comments']
+    
+    if comments:
         # 显示前3条评论
         print(f"\n📝 评论预览:")
         for i, comment in enumerate(comments[:3], 1):
@@ -421,49 +1103,15 @@ def main():
             if comment['useful_count'] > 0:
                 print(f"   点赞: {comment['useful_count']}")
         
-        # 保存到数据库
-        if use_database and db_reader:
-            print("💾 正在保存评论数据到数据库...")
-            save_success = db_reader.save_comments(product_id, comments)
-            if save_success:
-                print("✅ 评论数据已保存到数据库")
-            else:
-                print("❌ 保存评论数据失败")
-        
         print(f"\n✅ 爬取完成！")
-        
-        # 输出JSON格式的数据供Node.js使用
-        output_data = {
-            "success": True,
-            "comments": comments,
-            "total": len(comments),
-            "product_info": {
-                "success": True,
-                "product_name": product_name,
-                "product_url": "",
-                "shop_name": ""
-            }
-        }
-        print(f"\n📊 JSON_DATA_START")
-        print(json.dumps(output_data, ensure_ascii=False, indent=2))
-        print(f"📊 JSON_DATA_END")
-    else:
-        print("❌ 未获取到任何评论数据")
-        # 输出空的JSON数据
-        output_data = {
-            "success": False,
-            "comments": [],
-            "total": 0,
-            "product_info": {
-                "success": True, 
-                "product_name": product_name, 
-                "product_url": "", 
-                "shop_name": ""
-            }
-        }
-        print(f"\n📊 JSON_DATA_START")
-        print(json.dumps(output_data, ensure_ascii=False, indent=2))
-        print(f"📊 JSON_DATA_END")
+    
+    print(f"📈 请求统计: {spider.get_stats()}")
+    _export_metrics()
+    
+    # 输出JSON格式的数据供Node.js使用
+    print(f"\n📊 JSON_DATA_START")
+    print(json.dumps(output_data, ensure_ascii=False, indent=2, default=json_default))
+    print(f"📊 JSON_DATA_END")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+常驻爬虫进程 - 通过JSON行协议接收爬取任务，复用会话和数据库连接
+使用方法:
+    python3 spider_daemon.py                        # 从stdin读取任务，结果写到stdout
+    python3 spider_daemon.py --socket /tmp/spider.sock  # 监听本地Unix socket
+
+任务格式（每行一个JSON）:
+    {"id": "1", "product_id": "933910033859", "max_pages": 3}
+可选字段: cookies, page_size, delay, concurrency, rate_limit, use_database, incremental, pipeline（队列长度，0为不启用）
+每个任务返回一行JSON: {"id": "1", "type": "result", "success": true, "comments": [...], ...}
+socket模式下同一商品的任务逐个执行，不同商品的任务并发执行
+设置METRICS_FILE环境变量后定期导出运行指标（见metrics.py）
+设置SESSION_POOL=true后所有任务共享多账号会话池（见session_pool.py），SESSION_POOL_RATE为每个账号的每秒请求数
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from comment_record import json_default
+from checkpoint import CheckpointStore
+from database_reader import DatabaseReader
+from image_store import ImageFetcher
+from metrics import metrics
+from session_pool import load_session_pool
+from sku_classifier import load_classifier
+from spider import TmallCommentSpider, crawl_product, resolve_crawl_config
+
+
+class SpiderDaemon:
+    """常驻爬虫：按cookies缓存爬虫实例，保持HTTP连接和数据库读取器常驻"""
+
+    def __init__(self, use_database=True, base_url=None, max_spiders=32):
+        self.use_database = use_database
+        self.base_url = base_url
+        self.max_spiders = max_spiders
+        self._spiders = OrderedDict()
+        self._lock = threading.Lock()
+        # 断点按商品ID保存，同一商品的任务逐个执行，避免并发连接互相覆盖断点
+        self._product_locks = {}
+        # 本地情感打分默认关闭，LOCAL_SENTIMENT=true时才导入NumPy
+        self.sentiment = None
+        if os.getenv('LOCAL_SENTIMENT', 'false').lower() == 'true':
+            from sentiment import SentimentScorer
+            self.sentiment = SentimentScorer.from_env()
+        self.images = ImageFetcher.from_env()
+        self.checkpoints = CheckpointStore.from_env()
+        # 任务未指定pipeline时的默认值，PIPELINE=true时启用流水线
+        self.pipeline = int(os.getenv('PIPELINE_QUEUE_SIZE', '2')) if os.getenv('PIPELINE', 'false').lower() == 'true' else 0
+        self.db_reader = None
+        if use_database:
+            try:
+                self.db_reader = DatabaseReader()
+                print("✅ 数据库连接成功")
+            except Exception as e:
+                print(f"❌ 数据库连接失败: {e}")
+        rate = os.getenv('SESSION_POOL_RATE')
+        self.session_pool = load_session_pool(self.db_reader, rate=float(rate) if rate else None)
+
+    def get_spider(self, cookies):
+        """获取（或创建）对应cookies的爬虫实例，超出上限时淘汰最久未使用的实例"""
+        with self._lock:
+            spider = self._spiders.pop(cookies, None)
+            if spider is None:
+                spider = TmallCommentSpider(cookies=cookies, base_url=self.base_url, session_pool=self.session_pool)
+            self._spiders[cookies] = spider
+            while len(self._spiders) > self.max_spiders:
+                _, evicted = self._spiders.popitem(last=False)
+                evicted.session.close()
+            return spider
+
+    @contextmanager
+    def product_lock(self, product_id):
+        """独占某个商品的爬取，同一商品的其他任务在此等待；无人使用的锁随即释放"""
+        with self._lock:
+            entry = self._product_locks.setdefault(product_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._product_locks[product_id]
+
+    def handle_job(self, job):
+        """执行一个爬取任务，返回结果记录"""
+        job_id = job.get('id')
+        product_id = str(job.get('product_id') or '')
+        if not product_id:
+            return {'id': job_id, 'type': 'error', 'success': False, 'error': '商品ID不能为空'}
+
+        started = time.time()
+        try:
+            db_reader = self.db_reader if job.get('use_database', True) else None
+            cookies, max_pages, product_name = resolve_crawl_config(
+                product_id, db_reader, int(job.get('max_pages', 3)), job.get('cookies', '')
+            )
+            spider = self.get_spider(cookies)
+            with self.product_lock(product_id):
+                data = crawl_product(
+                    spider, product_id, product_name=product_name, max_pages=max_pages,
+                    page_size=int(job.get('page_size', 20)),
+                    delay=float(job.get('delay', 2)),
+                    concurrency=int(job.get('concurrency', 1)),
+                    rate_limit=float(job['rate_limit']) if job.get('rate_limit') is not None else None,
+                    db_reader=db_reader,
+                    incremental=bool(job.get('incremental', False)),
+                    sentiment=self.sentiment,
+                    classifier=load_classifier(db_reader),
+                    images=self.images,
+                    checkpoints=self.checkpoints,
+                    pipeline=int(job.get('pipeline', self.pipeline))
+                )
+        except Exception as e:
+            metrics.inc('daemon_jobs_total', status='error')
+            return {'id': job_id, 'type': 'error', 'success': False, 'error': str(e)}
+
+        metrics.inc('daemon_jobs_total', status='success' if data['success'] else 'failed')
+        metrics.observe('daemon_job_seconds', time.time() - started)
+        data.update({'id': job_id, 'type': 'result', 'elapsed': round(time.time() - started, 3)})
+        return data
+
+    def handle_line(self, line):
+        """解析一行任务并执行，返回要写回的JSON行"""
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            return json.dumps({'type': 'error', 'success': False, 'error': f'任务解析失败: {e}'},
+                              ensure_ascii=False)
+        return json.dumps(self.handle_job(job), ensure_ascii=False, default=json_default)
+
+    def serve_stdin(self, output):
+        """逐行读取stdin中的任务，结果逐行写到output"""
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            output.write(self.handle_line(line) + '\n')
+            output.flush()
+
+    def serve_socket(self, path):
+        """监听本地Unix socket，每个连接上按行收发任务"""
+        daemon = self
+
+        class JobHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    line = raw.decode('utf-8').strip()
+                    if not line:
+                        continue
+                    self.wfile.write((daemon.handle_line(line) + '\n').encode('utf-8'))
+                    self.wfile.flush()
+
+        if os.path.exists(path):
+            os.remove(path)
+        with socketserver.ThreadingUnixStreamServer(path, JobHandler) as server:
+            server.daemon_threads = True
+            print(f"🚀 常驻爬虫已启动，监听: {path}")
+            try:
+                server.serve_forever()
+            finally:
+                os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻爬虫进程')
+    parser.add_argument('--socket', help='监听的Unix socket路径，不指定则使用stdin/stdout')
+    parser.add_argument('--no-database', action='store_true', help='不使用数据库')
+    args = parser.parse_args()
+
+    # 协议数据独占stdout，爬虫的日志输出全部转到stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    use_database = not args.no_database and os.getenv('USE_DATABASE', 'true').lower() == 'true'
+    daemon = SpiderDaemon(use_database=use_database, base_url=os.getenv('SPIDER_BASE_URL') or None)
+    # 设置了METRICS_FILE时每METRICS_INTERVAL秒导出一次指标，退出时再导出一次
+    exporter = metrics.start_exporter()
+    try:
+        if args.socket:
+            daemon.serve_socket(args.socket)
+        else:
+            daemon.serve_stdin(protocol_out)
+    finally:
+        if exporter:
+            exporter.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+mtop令牌管理 - 解析并缓存_m_h5_tk，令牌过期时从会话cookies中取回服务端下发的新令牌
+"""
+
+import threading
+from typing import Dict, Optional
+
+TOKEN_COOKIE = '_m_h5_tk'
+TOKEN_ENC_COOKIE = '_m_h5_tk_enc'
+
+# 表示令牌过期或签名非法的mtop返回码
+TOKEN_ERROR_CODES = (
+    'FAIL_SYS_TOKEN_EXOIRED',
+    'FAIL_SYS_TOKEN_EXPIRED',
+    'FAIL_SYS_TOKEN_EMPTY',
+    'FAIL_SYS_TOKEN_ILLEGAL',
+    'FAIL_SYS_ILLEGAL_ACCESS',
+    'FAIL_SYS_ILLEGAL_SIGN',
+)
+
+
+def is_token_error(ret: str) -> bool:
+    """mtop返回码是否表示令牌过期或签名非法"""
+    return any(code in ret for code in TOKEN_ERROR_CODES)
+
+
+def parse_token(raw_value: str) -> str:
+    """_m_h5_tk的值形如"<token>_<过期时间戳>"，签名只需要token部分"""
+    if not raw_value:
+        return ""
+    return raw_value.split('_')[0]
+
+
+class TokenManager:
+    """单个会话的mtop令牌：初始化时解析一次，过期后从会话cookies中刷新"""
+
+    def __init__(self, session, cookies: Optional[Dict[str, str]] = None):
+        self.session = session
+        self.raw = (cookies or {}).get(TOKEN_COOKIE, '')
+        self.token = parse_token(self.raw)
+        self.refresh_count = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, signed_with: Optional[str] = None) -> bool:
+        """从会话cookies中取回服务端通过Set-Cookie下发的新令牌，取到新令牌时返回True
+
+        signed_with为请求签名时使用的_m_h5_tk：并发请求同时遇到令牌过期时，令牌可能已被其他线程刷新，
+        此时直接返回True，用当前令牌重新签名即可，不再重复刷新。
+        """
+        with self._lock:
+            if signed_with is not None and signed_with != self.raw:
+                return True
+            jar = self.session.cookies
+            candidates = [cookie for cookie in jar if cookie.name == TOKEN_COOKIE]
+            fresh = [cookie for cookie in candidates if cookie.value != self.raw]
+            if not fresh:
+                return False
+            chosen = fresh[-1]
+
+            # 清理旧令牌，避免同名cookie同时发送导致服务端读到过期值
+            for cookie in candidates:
+                if cookie is not chosen:
+                    jar.clear(cookie.domain, cookie.path, cookie.name)
+            enc_cookies = [cookie for cookie in jar if cookie.name == TOKEN_ENC_COOKIE]
+            if any(cookie.domain == chosen.domain for cookie in enc_cookies):
+                for cookie in enc_cookies:
+                    if cookie.domain != chosen.domain:
+                        jar.clear(cookie.domain, cookie.path, cookie.name)
+
+            self.raw = chosen.value
+            self.token = parse_token(self.raw)
+            self.refresh_count += 1
+            return True
+
+    def restore(self, state: Optional[Dict]) -> bool:
+        """恢复state()保存的令牌（如断点中记录的已刷新令牌），与当前令牌相同或为空时返回False"""
+        raw = (state or {}).get(TOKEN_COOKIE)
+        if not raw or raw == self.raw:
+            return False
+        with self._lock:
+            jar = self.session.cookies
+            for cookie in [cookie for cookie in jar if cookie.name == TOKEN_COOKIE]:
+                jar.clear(cookie.domain, cookie.path, cookie.name)
+            jar.set(TOKEN_COOKIE, raw)
+            if state.get(TOKEN_ENC_COOKIE):
+                for cookie in [cookie for cookie in jar if cookie.name == TOKEN_ENC_COOKIE]:
+                    jar.clear(cookie.domain, cookie.path, cookie.name)
+                jar.set(TOKEN_ENC_COOKIE, state[TOKEN_ENC_COOKIE])
+            self.raw = raw
+            self.token = parse_token(raw)
+            return True
+
+    def state(self) -> Dict:
+        """当前令牌状态，用于持久化和统计"""
+        jar = self.session.cookies
+        enc = next((cookie.value for cookie in jar if cookie.name == TOKEN_ENC_COOKIE), '')
+        return {TOKEN_COOKIE: self.raw, TOKEN_ENC_COOKIE: enc, 'refresh_count': self.refresh_count}
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+增量爬取水位线 - 记录每个商品已爬取到的最新评论日期和最近评论的自然键
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database_reader import comment_key, date_key
+
+
+class Watermark:
+    """单个商品的增量水位线（不可变，merge返回新的水位线）"""
+
+    def __init__(self, product_id: str, newest_date: str = '', recent_keys: Optional[Iterable[str]] = None,
+                 max_keys: int = 200):
+        self.product_id = str(product_id)
+        self.newest_date = newest_date or ''
+        self.newest_key = date_key(self.newest_date)
+        self.recent_keys = list(recent_keys or [])[:max_keys]
+        self._key_set = set(self.recent_keys)
+        self.max_keys = max_keys
+
+    @classmethod
+    def from_record(cls, product_id: str, record: Optional[Dict]) -> Optional['Watermark']:
+        """从数据库记录构建水位线，没有记录时返回None"""
+        if not record:
+            return None
+        return cls(product_id, record.get('newest_date', ''), record.get('recent_keys') or [])
+
+    def is_seen(self, comment: Dict) -> bool:
+        """评论是否已经爬取过：自然键在最近评论中，或日期早于水位线日期"""
+        if comment_key(self.product_id, comment) in self._key_set:
+            return True
+        key = date_key(comment.get('date', ''))
+        return bool(self.newest_key and key and key < self.newest_key)
+
+    def filter_new(self, comments: List[Dict]) -> Tuple[List[Dict], bool]:
+        """过滤出新评论，返回(新评论列表, 是否已到达旧评论)"""
+        new_comments = [comment for comment in comments if not self.is_seen(comment)]
+        return new_comments, len(new_comments) < len(comments)
+
+    def merge(self, comments: List[Dict]) -> 'Watermark':
+        """合并新爬取的评论，返回推进后的水位线"""
+        if not comments:
+            return self
+        dated = sorted(comments, key=lambda c: date_key(c.get('date', '')), reverse=True)
+        newest_date = self.newest_date
+        if date_key(dated[0].get('date', '')) > self.newest_key:
+            newest_date = dated[0].get('date', '')
+        keys = []
+        seen = set()
+        for key in [comment_key(self.product_id, c) for c in dated] + self.recent_keys:
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+        return Watermark(self.product_id, newest_date, keys, self.max_keys)
+
+    def to_record(self) -> Dict:
+        return {'newest_date': self.newest_date, 'recent_keys': self.recent_keys}